@@ -1,9 +1,8 @@
 import re
 import time
-import requests
-from bs4 import BeautifulSoup
 import socket
-import urllib.parse
+
+from util.file_util import FileUtil
 
 # 获取域名对应的IP地址
 def get_all_ips_from_domain(domain, attempts=5, interval=2):
@@ -21,47 +20,8 @@ def get_all_ips_from_domain(domain, attempts=5, interval=2):
             print(f"Error querying DNS for {domain}: {e}")
         time.sleep(interval)
     return list(all_ips)
-# 获取网页托管的域名
-def get_domains_from_url(url, headers = None) :
-    if headers is None:
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
-        }
-
-    try:
-        # 步骤 1: 获取网页内容
-        response = requests.get(url, headers=headers)
-        response.raise_for_status()  # 检查请求是否成功
-        html_content = response.text
-
-        # 步骤 2: 解析HTML内容
-        soup = BeautifulSoup(html_content, 'html.parser')
-
-        # 步骤 3: 提取所有链接
-        links = []
-        for link in soup.find_all('a', href=True):
-            links.append(link['href'])
-
-        # 步骤 4: 提取域名
-        domains = set()
-        for link in links:
-            try:
-                parsed_url = urllib.parse.urlparse(link)
-                domain = parsed_url.netloc
-                if domain:
-                    domains.add(domain)
-            except Exception as e:
-                print(f"Error parsing URL {link}: {e}")
-
-        return domains
-    except requests.RequestException as e:
-        print(f"Error fetching URL {url}: {e}")
-        return set()
-
 def read_domains_from_file(file_path):
-    with open(file_path, 'r') as file:
-        domains = [line.strip() for line in file if line.strip()]
-    return domains
+    return FileUtil.read_list_from_file(file_path)
 
 def write_to_file(kv_pairs, output_file):
     """将键值对写入文件，其中值为列表形式"""
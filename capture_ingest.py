@@ -0,0 +1,165 @@
+#  批量解析抓包文件：发现 output_*.pcap，通过清单对应到 URL，用进程池并行提取 IP，合并写入 capture_ip_map.json
+#  清单 capture_manifest.json 为 {抓包文件: URL}，不存在时按文件名里的编号对应 domain.txt 的第几行（从 0 开始）生成
+#  每个文件的结果按 (大小, mtime, SHA-1, 是否包含 IPv6) 缓存在 capture_cache.json，重复运行时跳过没有变化的抓包
+#  --flows 时同时输出每次抓包按远端 IP/端口聚合的流统计（util/flow_stats.py），存成按列的 .npz
+#  用法: python capture_ingest.py --pattern 'output_*.pcap' --processes 4 --flows capture_flows.npz
+
+import argparse
+import glob
+import hashlib
+import multiprocessing
+import os
+import re
+
+from util.file_util import FileUtil
+from util.flow_stats import FlowTable, flow_stats
+from util.pcap_reader import extract_ips
+
+CAPTURE_NUMBER = re.compile(r'output_(\d+)\.pcap$')
+
+
+def capture_number(pcap_file):
+    match = CAPTURE_NUMBER.search(os.path.basename(pcap_file))
+    return int(match.group(1)) if match else None
+
+
+def discover_captures(pattern='output_*.pcap'):
+    """按编号排序的抓包文件列表，编号可以不连续"""
+    files = glob.glob(pattern)
+    return sorted(files, key=lambda f: (capture_number(f) is None, capture_number(f) or 0, f))
+
+
+def build_manifest(pcap_files, urls):
+    """output_{i}.pcap 对应 urls[i]，没有对应 URL 的文件跳过"""
+    manifest = {}
+    for pcap_file in pcap_files:
+        i = capture_number(pcap_file)
+        if i is not None and i < len(urls):
+            manifest[pcap_file] = urls[i]
+        else:
+            print(f"No url for {pcap_file}, skipped")
+    return manifest
+
+
+def load_manifest(manifest_file, pcap_files, url_file='domain.txt'):
+    """读取清单，不存在时生成并保存，方便手动修改"""
+    if os.path.exists(manifest_file):
+        return FileUtil.read_from_file(manifest_file)
+    manifest = build_manifest(pcap_files, FileUtil.read_list_from_file(url_file))
+    FileUtil.write_to_file(manifest, manifest_file)
+    return manifest
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    digest = hashlib.sha1()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cached_ips(cache, pcap_file, ipv6=False):
+    """缓存命中返回 IP 列表，否则返回 None；大小和 mtime 没变直接命中，mtime 变了再比较哈希
+
+    缓存条目记录提取时是否包含 IPv6，和本次的 ipv6 不一致时视为未命中（没有记录的旧条目按不含 IPv6 处理）。
+    """
+    entry = cache.get(pcap_file)
+    if not entry or entry.get('ipv6', False) != ipv6:
+        return None
+    stat = os.stat(pcap_file)
+    if entry['size'] != stat.st_size:
+        return None
+    if entry['mtime'] != stat.st_mtime and entry['sha1'] != file_sha1(pcap_file):
+        return None
+    entry['mtime'] = stat.st_mtime
+    return entry['ips']
+
+
+def _extract(task):
+    # 在子进程里运行：提取 IP 并计算缓存需要的文件信息
+    pcap_file, ipv6 = task
+    stat = os.stat(pcap_file)
+    ips = sorted(extract_ips(pcap_file, ipv6=ipv6))
+    return pcap_file, {'size': stat.st_size, 'mtime': stat.st_mtime, 'sha1': file_sha1(pcap_file), 'ipv6': ipv6,
+                       'ips': ips}
+
+
+def ingest_captures(manifest, cache, processes=None, ipv6=False):
+    """返回 {URL: IP 列表}，只对缓存未命中的抓包启动进程池，cache 原地更新"""
+    results = {}
+    pending = []
+    for pcap_file in manifest:
+        if not os.path.exists(pcap_file):
+            print(f"Missing capture {pcap_file}, skipped")
+            continue
+        ips = cached_ips(cache, pcap_file, ipv6)
+        if ips is None:
+            pending.append(pcap_file)
+        else:
+            results[pcap_file] = ips
+    if pending:
+        processes = min(processes or os.cpu_count() or 1, len(pending))
+        with multiprocessing.Pool(processes) as pool:
+            for pcap_file, entry in pool.imap_unordered(_extract, [(f, ipv6) for f in pending]):
+                cache[pcap_file] = entry
+                results[pcap_file] = entry['ips']
+    print(f"{len(pending)} captures extracted, {len(results) - len(pending)} from cache")
+
+    # 同一个 URL 有多个抓包时合并 IP
+    capture_ip_map = {}
+    for pcap_file in manifest:
+        if pcap_file in results:
+            capture_ip_map.setdefault(manifest[pcap_file], set()).update(results[pcap_file])
+    return {url: sorted(ips) for url, ips in capture_ip_map.items()}
+
+
+def _flows(task):
+    pcap_file, url, local_addresses = task
+    return flow_stats(pcap_file, name=url, local_addresses=local_addresses)
+
+
+def ingest_flows(manifest, processes=None, local_addresses=None):
+    """并行统计每个抓包的流，拼成一张 FlowTable，capture 列对应清单里的顺序
+
+    local_addresses 为抓包机器的 IP 列表，不给时每个抓包自动识别。
+    """
+    tasks = [(pcap_file, url, local_addresses) for pcap_file, url in manifest.items() if os.path.exists(pcap_file)]
+    if not tasks:
+        return FlowTable.empty()
+    with multiprocessing.Pool(min(processes or os.cpu_count() or 1, len(tasks))) as pool:
+        return FlowTable.concat(pool.map(_flows, tasks))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Extract IPs from capture files in parallel')
+    parser.add_argument('--pattern', default='output_*.pcap')
+    parser.add_argument('--manifest', default='capture_manifest.json')
+    parser.add_argument('--urls', default='domain.txt', help='used to build the manifest when it does not exist')
+    parser.add_argument('--cache', default='capture_cache.json')
+    parser.add_argument('--output', default='capture_ip_map.json')
+    parser.add_argument('--processes', type=int, default=None)
+    parser.add_argument('--ipv6', action='store_true', help='also collect IPv6 addresses')
+    parser.add_argument('--flows', default=None, help='also write per-flow statistics to this .npz file')
+    parser.add_argument('--local-addresses', nargs='+', default=None,
+                        help='IP addresses of the capturing host, detected per address family when omitted')
+    parser.add_argument('--replace', action='store_true', help='overwrite the output instead of merging into it')
+    args = parser.parse_args()
+
+    manifest = load_manifest(args.manifest, discover_captures(args.pattern), args.urls)
+    cache = FileUtil.read_from_file(args.cache) if os.path.exists(args.cache) else {}
+    capture_ip_map = ingest_captures(manifest, cache, args.processes, args.ipv6)
+    FileUtil.write_to_file(cache, args.cache)
+
+    merged = {} if args.replace or not os.path.exists(args.output) else FileUtil.read_from_file(args.output)
+    merged.update(capture_ip_map)
+    FileUtil.write_to_file(merged, args.output)
+    print(f"{len(capture_ip_map)} urls written to {args.output}")
+
+    if args.flows:
+        flows = ingest_flows(manifest, args.processes, args.local_addresses)
+        flows.save(args.flows)
+        print(f"{len(flows)} flows from {len(flows.names)} captures written to {args.flows}")
+
+
+if __name__ == '__main__':
+    main()
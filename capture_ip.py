@@ -3,8 +3,9 @@ from selenium import webdriver
 from selenium.webdriver.chrome.service import Service
 from selenium.webdriver.chrome.options import Options
 import subprocess
-import json
 from util.file_util import FileUtil
+from util.pcap_reader import extract_ips
+from capture_ingest import build_manifest, discover_captures, ingest_captures
 
 def start_tshark(output_file):
 
@@ -29,6 +30,12 @@ def stop_tshark(tshark_process):
         print(f'Tshark stopped and data saved to {output_file}')
 
 def extract_ips_from_pcap(pcap_file):
+    # 直接解析 pcap/pcapng 文件头部，不再依赖 tshark；与原来 tshark 的 ip.src/ip.dst 一致，只统计 IPv4
+    return list(extract_ips(pcap_file, ipv6=False))
+
+
+# 旧的 tshark 实现，保留做对照
+def extract_ips_from_pcap_tshark(pcap_file):
     result = subprocess.run(['tshark', '-r', pcap_file, '-T', 'fields', '-e', 'ip.src', '-e', 'ip.dst'],
                             capture_output=True, text=True)
     # 将每行的IP地址对转换为元组，并去除空值
@@ -76,9 +83,7 @@ def visit_website(url, output_file):
         driver.quit()
 
 def read_domains_from_file(file_path):
-    with open(file_path, 'r') as file:
-        domains = [line.strip() for line in file if line.strip()]
-    return domains
+    return FileUtil.read_list_from_file(file_path)
 
 
 
@@ -86,15 +91,12 @@ def read_domains_from_file(file_path):
 if __name__ == '__main__':
     # 访问域名并使用Wireshark抓取对应的IP地址
     urls = read_domains_from_file('domain.txt')
-    capture_ip_map = {}
-    for i, url in enumerate(urls):
-        output_file = f'output_{i}.pcap'
-        # visit_website(url, output_file)
-        ips = extract_ips_from_pcap(output_file)
-        capture_ip_map[url] = ips
+    # for i, url in enumerate(urls):
+    #     visit_website(url, f'output_{i}.pcap')
+    # 抓包文件编号不连续，按文件名里的编号对应 URL，并行解析
+    manifest = build_manifest(discover_captures(), urls)
+    capture_ip_map = ingest_captures(manifest, {})
     output_file = 'capture_ip_map.json'
     FileUtil.write_to_file(capture_ip_map, output_file)
     read_kv_pairs = FileUtil.read_from_file(output_file)
     print(read_kv_pairs)
-
-
@@ -0,0 +1,419 @@
+#  并行抓包：复用一组无头浏览器会话同时访问多个网站，页面加载完成且网络空闲后立即停止抓包，不再固定等待 5 秒
+#  隔离方式（--isolation）:
+#    ports      所有会话共用一个抓包进程，访问期间记录浏览器进程使用的本地端口，结束后按端口和时间窗口把包拆到各自的抓包文件
+#    interface  每个会话在自己的网卡上抓包，例如每个会话运行在独立的 network namespace 里，--interfaces 给出对应的网卡
+#    none       和原来的 visit_website 一样每次访问单独抓包，只能使用一个会话
+#  网卡默认 macOS 为 en0，Linux 为 any
+#  --fake 用本地 HTTP 服务器和 FakeDriver 代替真实浏览器和 tshark，用来检查调度逻辑
+#  用法: python capture_orchestrator.py --sessions 4 --isolation ports
+
+import argparse
+import concurrent.futures
+import contextlib
+import http.client
+import http.server
+import os
+import platform
+import queue
+import re
+import subprocess
+import tempfile
+import threading
+import time
+import urllib.parse
+
+from util.file_util import FileUtil
+from util.pcap_reader import ip_header, iter_packets, transport_ports, write_pcap
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+CAPTURE_FILTER = 'port 80 or port 443'
+
+# 页面状态和已加载的资源数，资源数一段时间不再增加就认为网络空闲
+LOAD_STATE_SCRIPT = "return [document.readyState, performance.getEntriesByType('resource').length];"
+
+
+def default_interface():
+    return 'en0' if platform.system() == 'Darwin' else 'any'
+
+
+class TsharkCapture:
+    """一个 tshark 抓包进程，start 之后等到输出文件出现（tshark 已开始抓包）才返回"""
+
+    def __init__(self, output_file, interface=None, capture_filter=CAPTURE_FILTER):
+        self.output_file = output_file
+        self.interface = interface or default_interface()
+        self.capture_filter = capture_filter
+        self.process = None
+
+    def start(self, timeout=5.0):
+        if os.path.exists(self.output_file):
+            os.remove(self.output_file)
+        self.process = subprocess.Popen(
+            ['tshark', '-i', self.interface, '-f', self.capture_filter, '-w', self.output_file],
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.PIPE
+        )
+        deadline = time.time() + timeout
+        while not os.path.exists(self.output_file) and time.time() < deadline and self.process.poll() is None:
+            time.sleep(0.05)
+
+    def stop(self):
+        self.process.terminate()
+        _, err = self.process.communicate()
+        if self.process.returncode not in (0, -15) and err:
+            print(f'Tshark error: {err.decode()}')
+
+
+class NullCapture:
+    """不抓包，配合 FakeDriver 使用"""
+
+    def __init__(self, output_file, interface=None):
+        self.output_file = output_file
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+
+def chrome_driver(chromedriver='/usr/local/bin/chromedriver'):
+    """无头 Chrome，pageLoadStrategy=none 让 get 立即返回，由 wait_for_load 判断何时结束"""
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    chrome_options = Options()
+    chrome_options.add_argument('--headless')
+    chrome_options.add_argument('--disable-gpu')
+    chrome_options.page_load_strategy = 'none'
+    return webdriver.Chrome(service=Service(chromedriver), options=chrome_options)
+
+
+def _proc_children(root_pid):
+    # 通过 /proc/*/stat 的父进程号找出整个进程树
+    parents = {}
+    for name in os.listdir('/proc'):
+        if name.isdigit():
+            try:
+                with open(f'/proc/{name}/stat') as file:
+                    parents[int(name)] = int(file.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                pass
+    tree, frontier = {root_pid}, [root_pid]
+    while frontier:
+        pid = frontier.pop()
+        for child, parent in parents.items():
+            if parent == pid and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    return tree
+
+
+def _proc_ports(pids):
+    # 进程打开的 socket inode，再到 /proc/net/* 里找对应的本地端口
+    inodes = set()
+    for pid in pids:
+        try:
+            for fd in os.listdir(f'/proc/{pid}/fd'):
+                link = os.readlink(f'/proc/{pid}/fd/{fd}')
+                if link.startswith('socket:['):
+                    inodes.add(link[8:-1])
+        except OSError:
+            pass
+    ports = set()
+    for table in ('tcp', 'tcp6', 'udp', 'udp6'):
+        try:
+            with open(f'/proc/net/{table}') as file:
+                next(file)
+                for line in file:
+                    fields = line.split()
+                    if fields[9] in inodes:
+                        ports.add(int(fields[1].rsplit(':', 1)[1], 16))
+        except OSError:
+            pass
+    return ports
+
+
+def browser_ports(driver):
+    """浏览器（chromedriver 及其所有子进程）当前使用的本地端口"""
+    if hasattr(driver, 'local_ports'):
+        return driver.local_ports()
+    pid = driver.service.process.pid
+    if psutil is not None:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.NoSuchProcess:
+            return set()
+        ports = set()
+        for process in processes:
+            with contextlib.suppress(psutil.Error):
+                ports.update(connection.laddr.port for connection in process.connections('inet') if connection.laddr)
+        return ports
+    return _proc_ports(_proc_children(pid))
+
+
+def wait_for_load(driver, timeout=15.0, idle=0.5, poll=0.1, on_poll=None):
+    """等到 document.readyState 为 complete 且资源数 idle 秒内不再变化，超时返回 False"""
+    deadline = time.time() + timeout
+    last_count, stable_since = None, time.time()
+    while time.time() < deadline:
+        state, count = driver.execute_script(LOAD_STATE_SCRIPT)
+        if on_poll:
+            on_poll()
+        now = time.time()
+        if state == 'complete' and count == last_count:
+            if now - stable_since >= idle:
+                return True
+        else:
+            stable_since = now
+        last_count = count
+        time.sleep(poll)
+    return False
+
+
+class BrowserPool:
+    """一组可复用的浏览器会话，每次访问借出一个，访问结束归还"""
+
+    def __init__(self, driver_factory, size):
+        self.drivers = []
+        self.free = queue.Queue()
+        for i in range(size):
+            driver = driver_factory()
+            self.drivers.append(driver)
+            self.free.put((i, driver))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @contextlib.contextmanager
+    def session(self):
+        i, driver = self.free.get()
+        try:
+            yield i, driver
+        finally:
+            self.free.put((i, driver))
+
+    def close(self):
+        for driver in self.drivers:
+            with contextlib.suppress(Exception):
+                driver.quit()
+
+
+def visit(driver, url, timeout=15.0, idle=0.5):
+    """访问一个网页直到加载完成且网络空闲，返回访问记录（起止时间、期间浏览器用过的本地端口）"""
+    ports = set()
+
+    def sample():
+        ports.update(browser_ports(driver))
+
+    start = time.time()
+    driver.get(url)
+    loaded = wait_for_load(driver, timeout, idle, on_poll=sample)
+    sample()
+    end = time.time()
+    # 回到空白页，避免上一个页面的后台请求混进下一次访问
+    driver.get('about:blank')
+    return {'url': url, 'start': start, 'end': end, 'loaded': loaded, 'ports': ports}
+
+
+def split_capture(shared_file, visits, grace=1.0):
+    """把共用的抓包按每次访问的本地端口和时间窗口拆到 visit['output_file']，返回每个文件的包数"""
+    buckets = [[] for _ in visits]
+    linktype = None
+    for timestamp, packet_linktype, data in iter_packets(shared_file):
+        header = ip_header(packet_linktype, data)
+        if header is None or timestamp is None:
+            continue
+        linktype = packet_linktype
+        src_port, dst_port = transport_ports(data, header)
+        for bucket, record in zip(buckets, visits):
+            if (record['start'] <= timestamp <= record['end'] + grace
+                    and (src_port in record['ports'] or dst_port in record['ports'])):
+                bucket.append((timestamp, data))
+    return [write_pcap(record['output_file'], bucket, linktype if linktype is not None else 1)
+            for bucket, record in zip(buckets, visits) if 'output_file' in record]
+
+
+def capture_websites(urls, output_files, driver_factory=chrome_driver, sessions=4, isolation='ports',
+                     interface=None, interfaces=None, capture_factory=TsharkCapture, timeout=15.0, idle=0.5,
+                     shared_file='capture_shared.pcapng'):
+    """并行访问 urls，抓包分别写到 output_files，返回每次访问的记录"""
+    if isolation == 'none':
+        sessions = 1
+    elif isolation == 'interface':
+        if not interfaces:
+            raise ValueError("isolation='interface' needs one interface per session")
+        sessions = len(interfaces)
+    elif isolation != 'ports':
+        raise ValueError(f"unknown isolation {isolation!r}")
+
+    def run(job):
+        url, output_file = job
+        with pool.session() as (i, driver):
+            capture = None
+            if isolation != 'ports':
+                capture = capture_factory(output_file, interfaces[i] if isolation == 'interface' else interface)
+                capture.start()
+            try:
+                record = visit(driver, url, timeout, idle)
+                print(f"Visited {url} in {record['end'] - record['start']:.2f}s")
+            except Exception as e:
+                print(f'Error visiting {url}: {e}')
+                record = {'url': url, 'start': time.time(), 'end': time.time(), 'loaded': False, 'ports': set(),
+                          'error': str(e)}
+            finally:
+                if capture is not None:
+                    capture.stop()
+            record['output_file'] = output_file
+            record['session'] = i
+            return record
+
+    shared = capture_factory(shared_file, interface) if isolation == 'ports' else None
+    with BrowserPool(driver_factory, min(sessions, max(len(urls), 1))) as pool:
+        if shared is not None:
+            shared.start()
+        try:
+            with concurrent.futures.ThreadPoolExecutor(len(pool.drivers)) as executor:
+                visits = list(executor.map(run, zip(urls, output_files)))
+        finally:
+            if shared is not None:
+                shared.stop()
+    if shared is not None and os.path.exists(shared_file):
+        split_capture(shared_file, visits)
+    return visits
+
+
+class FakeDriver:
+    """模拟浏览器：后台线程用 http.client 下载页面和页面里 src 引用的资源，记录用过的本地端口
+
+    接口和 selenium WebDriver 用到的部分一致：get 立即返回，execute_script 返回 [readyState, 资源数]。
+    """
+
+    SRC = re.compile(r'src\s*=\s*["\']([^"\']+)["\']', re.I)
+
+    def __init__(self):
+        self.state = 'complete'
+        self.resources = 0
+        self.ports = set()
+        self.thread = None
+
+    def _fetch(self, url):
+        parsed = urllib.parse.urlsplit(url)
+        connection = http.client.HTTPConnection(parsed.hostname, parsed.port or 80, timeout=10)
+        try:
+            connection.connect()
+            self.ports.add(connection.sock.getsockname()[1])
+            connection.request('GET', parsed.path or '/')
+            return connection.getresponse().read().decode('utf-8', 'replace')
+        finally:
+            connection.close()
+
+    def _load(self, url):
+        try:
+            html = self._fetch(url)
+            self.state = 'interactive'
+            for src in self.SRC.findall(html):
+                self._fetch(urllib.parse.urljoin(url, src))
+                self.resources += 1
+        finally:
+            self.state = 'complete'
+
+    def get(self, url):
+        if self.thread is not None:
+            self.thread.join()
+        # 和真实浏览器离开页面一样，上一个页面的连接不再属于这次访问
+        self.ports = set()
+        if url.startswith('about:'):
+            return
+        self.state = 'loading'
+        self.resources = 0
+        self.thread = threading.Thread(target=self._load, args=(url,), daemon=True)
+        self.thread.start()
+
+    def execute_script(self, script):
+        return [self.state, self.resources]
+
+    def local_ports(self):
+        return set(self.ports)
+
+    def quit(self):
+        if self.thread is not None:
+            self.thread.join()
+
+
+def serve_fake_sites(directory, pages=8, resources=5, delay=0.05):
+    """在 directory 下生成测试网页，每页引用若干资源，启动本地 HTTP 服务器（每个请求延迟 delay 秒），返回 (server, URL 列表)"""
+    for page in range(pages):
+        body = ''.join(f'<img src="/static/{page}_{r}.png">' for r in range(resources))
+        with open(os.path.join(directory, f'page{page}.html'), 'w') as file:
+            file.write(f'<html><body>{body}</body></html>')
+    os.makedirs(os.path.join(directory, 'static'), exist_ok=True)
+    for page in range(pages):
+        for r in range(resources):
+            with open(os.path.join(directory, 'static', f'{page}_{r}.png'), 'wb') as file:
+                file.write(os.urandom(1024))
+
+    class Handler(http.server.SimpleHTTPRequestHandler):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, directory=directory, **kwargs)
+
+        def do_GET(self):
+            time.sleep(delay)
+            super().do_GET()
+
+        def log_message(self, *args):
+            pass
+
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, [f'http://127.0.0.1:{server.server_port}/page{page}.html' for page in range(pages)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Visit websites with a pool of headless browsers and capture traffic')
+    parser.add_argument('--urls', default='domain.txt')
+    parser.add_argument('--sessions', type=int, default=4)
+    parser.add_argument('--isolation', default='ports', choices=['ports', 'interface', 'none'])
+    parser.add_argument('--interface', default=None, help='capture interface, default en0 on macOS and any on Linux')
+    parser.add_argument('--interfaces', nargs='+', default=None, help='one interface per session for --isolation interface')
+    parser.add_argument('--timeout', type=float, default=15.0)
+    parser.add_argument('--idle', type=float, default=0.5, help='seconds without new resources before stopping')
+    parser.add_argument('--chromedriver', default='/usr/local/bin/chromedriver')
+    parser.add_argument('--fake', action='store_true', help='use a local HTTP server and FakeDriver instead of Chrome')
+    args = parser.parse_args()
+
+    started = time.time()
+    if args.fake:
+        with tempfile.TemporaryDirectory() as directory:
+            server, urls = serve_fake_sites(directory)
+            try:
+                visits = capture_websites(urls, [os.path.join(directory, f'{i}.pcap') for i in range(len(urls))],
+                                          driver_factory=FakeDriver, sessions=args.sessions, isolation='ports',
+                                          capture_factory=NullCapture, timeout=args.timeout, idle=args.idle,
+                                          shared_file=os.path.join(directory, 'shared.pcap'))
+            finally:
+                server.shutdown()
+    else:
+        urls = FileUtil.read_list_from_file(args.urls)
+        # 文件编号和 domain.txt 的行号（从 0 开始）一致，和 capture_ingest.py 的清单约定相同
+        visits = capture_websites(urls, [f'output_{i}.pcap' for i in range(len(urls))],
+                                  driver_factory=lambda: chrome_driver(args.chromedriver), sessions=args.sessions,
+                                  isolation=args.isolation, interface=args.interface, interfaces=args.interfaces,
+                                  timeout=args.timeout, idle=args.idle)
+    for record in visits:
+        print(f"{record['url']}: {record['end'] - record['start']:.2f}s, loaded={record['loaded']}, "
+              f"session={record['session']}, ports={len(record['ports'])}")
+    print(f"{len(visits)} visits in {time.time() - started:.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+#  紧凑的数组图结构，供 kdegree 内部使用，代替 networkx 的 dict-of-dicts
+#  节点编号为 0..n-1，边存成 CSR（indptr/indices）加一个排好序的边键数组：
+#  边 (u, v), u < v 的键为 u * n + v，查边用二分查找，也可以整批向量化查询
+#  每条边大约 24 字节，networkx.Graph 每条边要几百字节
+
+import networkx as nx
+import numpy as np
+
+
+class CompactGraph:
+    def __init__(self, n, edges=()):
+        self.n = int(n)
+        edges = np.asarray(edges, dtype=np.int64).reshape(-1, 2)
+        # 去掉自环，并把 (u, v) 和 (v, u) 视为同一条边
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        low = np.minimum(edges[:, 0], edges[:, 1])
+        high = np.maximum(edges[:, 0], edges[:, 1])
+        self.keys = np.unique(low * self.n + high)
+        low, high = np.divmod(self.keys, self.n)
+
+        # CSR：每条边在两个端点下各存一次，邻居按编号排序
+        src = np.concatenate((low, high))
+        dst = np.concatenate((high, low))
+        order = np.lexsort((dst, src))
+        self.indices = dst[order].astype(np.int32)
+        self.degrees = np.bincount(src, minlength=self.n).astype(np.int64)
+        self.indptr = np.concatenate(([0], np.cumsum(self.degrees)))
+        # 原始节点标签，从 networkx 转换时保存，转换回去时恢复
+        self.labels = None
+
+    @classmethod
+    def from_networkx(cls, G):
+        labels = list(G.nodes())
+        index = {v: i for i, v in enumerate(labels)}
+        edges = np.fromiter((index[x] for e in G.edges() for x in e), dtype=np.int64, count=2 * G.number_of_edges())
+        graph = cls(len(labels), edges)
+        # 节点本来就是 0..n-1 时不需要保存标签
+        if labels != list(range(len(labels))):
+            graph.labels = labels
+        return graph
+
+    def to_networkx(self):
+        G = nx.empty_graph(self.n)
+        G.add_edges_from(self.edge_array().tolist())
+        if self.labels is not None:
+            G = nx.relabel_nodes(G, dict(enumerate(self.labels)))
+        return G
+
+    # 和 networkx 相同的接口，kdegree 里的算法可以直接在 CompactGraph 上运行
+    def __len__(self):
+        return self.n
+
+    def number_of_nodes(self):
+        return self.n
+
+    def number_of_edges(self):
+        return np.size(self.keys)
+
+    def nodes(self):
+        return range(self.n)
+
+    def degree(self):
+        return zip(range(self.n), self.degrees.tolist())
+
+    def neighbors(self, v):
+        return self.indices[self.indptr[v]:self.indptr[v + 1]].tolist()
+
+    def edge_array(self):
+        return np.stack(np.divmod(self.keys, self.n), axis=1)
+
+    def edges(self):
+        return [tuple(e) for e in self.edge_array().tolist()]
+
+    def has_edge(self, u, v):
+        if u == v:
+            return False
+        key = min(u, v) * self.n + max(u, v)
+        i = np.searchsorted(self.keys, key)
+        return i < np.size(self.keys) and self.keys[i] == key
+
+    # 批量查边，us 和 vs 为等长数组，返回布尔数组
+    def has_edges(self, us, vs):
+        us = np.asarray(us, dtype=np.int64)
+        vs = np.asarray(vs, dtype=np.int64)
+        keys = np.minimum(us, vs) * self.n + np.maximum(us, vs)
+        if np.size(self.keys) == 0:
+            return np.zeros(np.size(keys), dtype=bool)
+        i = np.minimum(np.searchsorted(self.keys, keys), np.size(self.keys) - 1)
+        return (self.keys[i] == keys) & (us != vs)
+
+    # 占用的字节数
+    def nbytes(self):
+        return self.keys.nbytes + self.indices.nbytes + self.indptr.nbytes + self.degrees.nbytes
+
+
+# 度数组：CompactGraph 直接取数组，networkx 图按节点编号排序
+def degree_array(G):
+    if isinstance(G, CompactGraph):
+        return G.degrees
+    return np.array([d for _, d in sorted(G.degree())], dtype=np.int64)
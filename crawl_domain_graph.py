@@ -0,0 +1,47 @@
+#  从 domain.txt 的种子网页出发多层递归抓取，得到更大的 主机 -> 托管域名 映射，用于构建匿名化的域名图
+#  get_all_domain.py 只看种子网页本身（深度 0），这里按 --depth 继续跟随页面里的链接
+#  抓取过程定期写检查点，中断后用 --resume 继续，不会重复抓取已经抓过的页面
+#  用法: python crawl_domain_graph.py --depth 2 --max-pages 2000 --domain-budget 50 --checkpoint crawl_checkpoint.json
+
+import argparse
+import os
+
+from util.crawl_scheduler import CrawlScheduler
+from util.crawler import MAX_PAGE_BYTES, Crawler
+from util.file_util import FileUtil
+from util.http_cache import HTTPCache
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Crawl seed pages recursively and collect hosted domains')
+    parser.add_argument('--seeds', default='domain.txt')
+    parser.add_argument('--depth', type=int, default=2)
+    parser.add_argument('--max-pages', type=int, default=1000)
+    parser.add_argument('--domain-budget', type=int, default=50, help='max pages per registrable domain')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--bloom', type=int, default=None, help='use a Bloom filter sized for this many urls')
+    parser.add_argument('--checkpoint', default='crawl_checkpoint.json')
+    parser.add_argument('--checkpoint-every', type=int, default=50)
+    parser.add_argument('--resume', action='store_true')
+    parser.add_argument('--cache', action='store_true', help='reuse pages from the shared http_cache.db')
+    parser.add_argument('--max-page-bytes', type=int, default=MAX_PAGE_BYTES, help='skip pages larger than this')
+    parser.add_argument('--output', default='domain_graph_map.json')
+    parser.add_argument('--all-domains', default='all_domain_graph.txt')
+    args = parser.parse_args()
+
+    cache = HTTPCache() if args.cache else None
+    crawler = Crawler(concurrency=args.concurrency, cache=cache, max_bytes=args.max_page_bytes)
+    options = dict(crawler=crawler, max_depth=args.depth,
+                   max_pages=args.max_pages, domain_budget=args.domain_budget, bloom_capacity=args.bloom,
+                   checkpoint_every=args.checkpoint_every)
+    if args.resume and os.path.exists(args.checkpoint):
+        scheduler = CrawlScheduler.resume(args.checkpoint, **options)
+    else:
+        scheduler = CrawlScheduler(checkpoint_file=args.checkpoint, **options)
+        scheduler.add_seeds(FileUtil.read_list_from_file(args.seeds))
+    FileUtil.write_to_file(scheduler.run(), args.output)
+    FileUtil.write_list_to_file(scheduler.all_domains(), args.all_domains)
+
+
+if __name__ == '__main__':
+    main()
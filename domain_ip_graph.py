@@ -0,0 +1,272 @@
+#  把 domain_ip_map.json（和 domain_map.json）转换成 域名-IP 二部图，运行 k-度匿名，再把图的改动翻译回映射表的改动
+#  节点编号：0..n_domains-1 为域名（或网站），n_domains.. 为 IP，标签表 DomainIPGraph.labels 保存编号到名字的映射
+#  level='site' 时一个网站（domain_map 的主域名）是一个节点，IP 为主域名和它托管的域名解析到的所有 IP，
+#  各网站的域名必须互不重叠，否则改一个共用域名的 IP 会同时改变多个网站的度数；
+#  --shared-domains 决定被多个网站共用的域名怎么处理：first 归第一个列出它的网站（主域名总是归它自己的网站），
+#  drop 从所有网站里去掉（主域名仍留在它自己的网站里），error 直接报错
+#  匿名图里新增的 域名-IP 边是 "给域名加 IP"，消失的边是 "删除域名的 IP"
+#  mode='bipartite'（默认）只匿名化域名一侧的度数，只增删 域名-IP 边，新加的 IP 优先从同一网段和两跳邻居里选；
+#  mode='general' 把二部图当普通图匿名化，只要产生了映射表无法实现的域名-域名、IP-IP 边就视为失败
+#  匿名性报告按执行改动之后的映射表重新建图计算，不用匿名图本身
+#  用法: python domain_ip_graph.py --k 5 --changes mapping_changes.ndjson --apply anonymised_domain_ip_map.json
+
+import argparse
+import ipaddress
+import sys
+
+import numpy as np
+
+from compact_graph import CompactGraph
+from kdegree import bipartite_graph_anonymiser, graph_anonymiser, two_hop_candidates
+from kdegree_verify import anonymity_report, print_report
+from util.file_util import FileUtil
+
+
+SHARED_POLICIES = ('first', 'drop', 'error')
+
+
+# 把 domain_map 分成互不重叠的网站，返回 (网站列表, 每个网站的域名列表（主域名在最前面）, 共用域名列表)
+def site_members(domain_map, shared='first'):
+    if shared not in SHARED_POLICIES:
+        raise ValueError("shared must be one of %s, got %r" % (SHARED_POLICIES, shared))
+    sites = list(domain_map)
+    owners = {site: [site] for site in sites}
+    for site in sites:
+        for domain in domain_map[site]:
+            owner = owners.setdefault(domain, [])
+            if site not in owner:
+                owner.append(site)
+    shared_domains = [domain for domain, owner in owners.items() if len(owner) > 1]
+    if shared_domains and shared == 'error':
+        raise ValueError("%d domains belong to more than one site (e.g. %s), site-level changes cannot be "
+                         "applied to the mapping; use --shared-domains first or drop" %
+                         (len(shared_domains), shared_domains[0]))
+    members = {site: [site] for site in sites}
+    for domain, owner in owners.items():
+        if domain in members and domain == owner[0]:
+            continue
+        if len(owner) == 1 or shared == 'first':
+            members[owner[0]].append(domain)
+    return sites, [members[site] for site in sites], shared_domains
+
+
+class DomainIPGraph:
+    def __init__(self, domains, ips, graph, members=None, shared_domains=()):
+        self.domains = domains
+        self.ips = ips
+        self.graph = graph
+        self.n_domains = len(domains)
+        # level='site' 时 members[i] 为第 i 个网站包含的域名（主域名在最前面），level='domain' 时为 None
+        self.members = members
+        # level='site' 时被多个网站共用、按 shared 规则处理过的域名
+        self.shared_domains = list(shared_domains)
+
+    @property
+    def labels(self):
+        return self.domains + self.ips
+
+    def is_domain(self, v):
+        return v < self.n_domains
+
+    def label(self, v):
+        return self.domains[v] if v < self.n_domains else self.ips[v - self.n_domains]
+
+    @classmethod
+    def from_maps(cls, domain_ip_map, domain_map=None, level='domain', ips=None, shared='first'):
+        """一次遍历映射表建图：IP 按第一次出现的顺序编号，边直接收集成 numpy 数组交给 CompactGraph 去重
+
+        ips 给出时 IP 先按 ips 的顺序编号，用于按同一套编号重建改动后的图。shared 见 site_members。
+        """
+        if level not in ('domain', 'site'):
+            raise ValueError("level must be 'domain' or 'site', got %r" % level)
+        shared_domains = ()
+        if level == 'site':
+            if domain_map is None:
+                raise ValueError("level='site' needs domain_map")
+            domains, members, shared_domains = site_members(domain_map, shared)
+        else:
+            domains = list(domain_ip_map)
+            members = None
+
+        ip_index = {ip: i for i, ip in enumerate(ips or ())}
+        sources = []
+        targets = []
+        for v, domain in enumerate(domains):
+            for member in (members[v] if members else (domain,)):
+                for ip in domain_ip_map.get(member, ()):
+                    sources.append(v)
+                    targets.append(ip_index.setdefault(ip, len(ip_index)))
+        n_domains = len(domains)
+        edges = np.stack((np.array(sources, dtype=np.int64), np.array(targets, dtype=np.int64) + n_domains), axis=1)
+        graph = CompactGraph(n_domains + len(ip_index), edges)
+        return cls(domains, list(ip_index), graph, members, shared_domains)
+
+    @classmethod
+    def from_files(cls, domain_ip_map_file='domain_ip_map.json', domain_map_file=None, level='domain', shared='first'):
+        # JSON、key:v1,v2 文本和紧凑二进制格式（.cmap）都可以
+        domain_map = FileUtil.read_map(domain_map_file) if domain_map_file else None
+        return cls.from_maps(FileUtil.read_map(domain_ip_map_file), domain_map, level, shared=shared)
+
+    def locality_candidates(self, prefix_v4=24, prefix_v6=48):
+        """候选 IP：先是和域名现有 IP 同一网段（IPv4 /24、IPv6 /48）的 IP，再是两跳邻居，同一网段里度数小的优先"""
+        networks = {}
+        for u, ip in enumerate(self.ips, self.n_domains):
+            address = ipaddress.ip_address(ip)
+            network = ipaddress.ip_network((address, prefix_v4 if address.version == 4 else prefix_v6), strict=False)
+            networks.setdefault(network, []).append(u)
+        network_of = {u: network for network, members in networks.items() for u in members}
+        degrees = self.graph.degrees
+        for members in networks.values():
+            members.sort(key=lambda u: degrees[u])
+        two_hop = two_hop_candidates(self.graph, self.n_domains)
+
+        def candidates(v):
+            own = {network_of[u] for u in self.graph.neighbors(v)}
+            for network in own:
+                yield from networks[network]
+            yield from two_hop(v)
+        return candidates
+
+    def edge_diff(self, Ga):
+        """原图和匿名图（同一组节点编号）的边差异，返回 (新增边, 删除边)，均为 (u, v), u < v 的数组"""
+        if not isinstance(Ga, CompactGraph):
+            Ga = CompactGraph(self.graph.n, list(Ga.edges()))
+        added = np.setdiff1d(Ga.keys, self.graph.keys, assume_unique=True)
+        removed = np.setdiff1d(self.graph.keys, Ga.keys, assume_unique=True)
+        n = self.graph.n
+        return np.stack(np.divmod(added, n), axis=1), np.stack(np.divmod(removed, n), axis=1)
+
+
+# 把匿名图相对原图的边改动翻译成映射表改动
+# 返回 (changes, skipped)：changes 为 [{'action': 'add'|'remove', 'domain': 域名, 'ip': IP}]，
+# skipped 统计无法实现的同侧边 {'domain-domain': 个数, 'ip-ip': 个数}
+# level='site' 时加 IP 加到网站的主域名上，删 IP 从网站里所有解析到该 IP 的域名上删除
+def mapping_changes(graph, Ga, domain_ip_map=None):
+    added, removed = graph.edge_diff(Ga)
+    changes = []
+    skipped = {'domain-domain': 0, 'ip-ip': 0}
+    for action, edges in (('add', added), ('remove', removed)):
+        for u, v in edges.tolist():
+            # u < v，所以 域名-IP 边一定是 u 为域名、v 为 IP
+            if graph.is_domain(v):
+                skipped['domain-domain'] += 1
+                continue
+            if not graph.is_domain(u):
+                skipped['ip-ip'] += 1
+                continue
+            ip = graph.label(v)
+            if graph.members is None:
+                changes.append({'action': action, 'domain': graph.label(u), 'ip': ip})
+            elif action == 'add':
+                changes.append({'action': action, 'domain': graph.members[u][0], 'ip': ip, 'site': graph.label(u)})
+            else:
+                for domain in graph.members[u]:
+                    if ip in (domain_ip_map or {}).get(domain, ()):
+                        changes.append({'action': action, 'domain': domain, 'ip': ip, 'site': graph.label(u)})
+    return changes, skipped
+
+
+# 在映射表的副本上执行改动，保持原来的 IP 顺序，新加的 IP 追加在后面
+def apply_changes(domain_ip_map, changes):
+    result = {domain: list(ips) for domain, ips in domain_ip_map.items()}
+    for change in changes:
+        ips = result.setdefault(change['domain'], [])
+        if change['action'] == 'add':
+            if change['ip'] not in ips:
+                ips.append(change['ip'])
+        elif change['action'] == 'remove':
+            if change['ip'] in ips:
+                ips.remove(change['ip'])
+        else:
+            raise ValueError("unknown action %r" % change['action'])
+    return result
+
+
+# 完整流程：建图 -> 匿名化 -> 映射表改动 -> 按改动后的映射表重建图检查，返回 (changes, report)
+# 匿名化失败、有无法实现的边或者改动后的映射表不满足 k-匿名时 changes 为 None，原因在 report['error']
+# capacity 为二部图模式下每个 IP 最多对应的域名数，shared 为 level='site' 时共用域名的处理方式（见 site_members）
+def anonymise_mapping(domain_ip_map, k, domain_map=None, level='domain', mode='bipartite', noise=10,
+                      with_deletions=False, construction='fast', seed=None, max_attempts=None, capacity=None,
+                      shared='first'):
+    try:
+        graph = DomainIPGraph.from_maps(domain_ip_map, domain_map, level, shared=shared)
+    except ValueError as e:
+        return None, {'k': k, 'level': level, 'error': str(e)}
+    print("graph:", graph.n_domains, "domains,", len(graph.ips), "ips,", graph.graph.number_of_edges(), "edges")
+    if graph.shared_domains:
+        print("shared domains:", len(graph.shared_domains), "(%s)" % ('kept by the first site' if shared == 'first'
+                                                                     else 'dropped'))
+    stats = {}
+    if mode == 'bipartite':
+        Ga = bipartite_graph_anonymiser(graph.graph, graph.n_domains, k, noise, with_deletions=with_deletions,
+                                        seed=seed, candidates=graph.locality_candidates(), capacity=capacity,
+                                        max_attempts=max_attempts, stats=stats)
+        nodes = range(graph.n_domains)
+    elif mode == 'general':
+        Ga = graph_anonymiser(graph.graph, k, noise, with_deletions=with_deletions, construction=construction,
+                              seed=seed, max_attempts=max_attempts, stats=stats)
+        nodes = None
+    else:
+        raise ValueError("mode must be 'bipartite' or 'general', got %r" % mode)
+    if Ga is None:
+        return None, {'k': k, 'stats': stats, 'error': "no k-anonymous graph found"}
+    changes, skipped = mapping_changes(graph, Ga, domain_ip_map)
+    applied = DomainIPGraph.from_maps(apply_changes(domain_ip_map, changes), domain_map, level, graph.ips, shared)
+    report = anonymity_report(applied.graph, k, graph.graph, nodes)
+    report.update(stats=stats, mode=mode, level=level, domains=graph.n_domains, ips=len(graph.ips), skipped_edges=skipped,
+                  mapping_changes=len(changes))
+    if level == 'site':
+        report.update(shared_policy=shared, shared_domains=len(graph.shared_domains))
+    if skipped['domain-domain'] or skipped['ip-ip']:
+        report['error'] = "the anonymised graph has edges the mapping cannot express: %s" % skipped
+        return None, report
+    if not report['is_k_anonymous']:
+        report['error'] = "the changed mapping is not %d-anonymous" % k
+        return None, report
+    return changes, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description='k-degree anonymise the domain-IP mapping')
+    parser.add_argument('--domain-ip-map', default='domain_ip_map.json')
+    parser.add_argument('--domain-map', default='domain_map.json', help='used with --level site')
+    parser.add_argument('--level', default='domain', choices=['domain', 'site'])
+    parser.add_argument('--shared-domains', default='first', choices=SHARED_POLICIES,
+                        help='domains listed under several sites: keep in the first site, drop, or fail')
+    parser.add_argument('--mode', default='bipartite', choices=['bipartite', 'general'],
+                        help='bipartite: anonymise domain degrees with domain-IP edges only')
+    parser.add_argument('--k', type=int, default=5)
+    parser.add_argument('--noise', type=int, default=10)
+    parser.add_argument('--with-deletions', action='store_true')
+    parser.add_argument('--construction', default='fast', choices=['priority', 'fast'], help='general mode only')
+    parser.add_argument('--capacity', type=int, default=None, help='max domains per IP in bipartite mode')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--max-attempts', type=int, default=50)
+    parser.add_argument('--changes', default='mapping_changes.ndjson', help='one mapping change per line')
+    parser.add_argument('--report', default=None, help='write the anonymity report as JSON')
+    parser.add_argument('--apply', default=None, help='write the changed domain-IP map here')
+    args = parser.parse_args()
+
+    domain_ip_map = FileUtil.read_map(args.domain_ip_map)
+    domain_map = FileUtil.read_map(args.domain_map) if args.level == 'site' else None
+    changes, report = anonymise_mapping(domain_ip_map, args.k, domain_map, args.level, args.mode, args.noise,
+                                        args.with_deletions, args.construction, args.seed, args.max_attempts,
+                                        args.capacity, args.shared_domains)
+    if changes is None:
+        print(report['error'])
+        if args.report:
+            FileUtil.write_to_file(report, args.report)
+        sys.exit(1)
+    print_report(report)
+    print("mapping changes:", len(changes))
+    with FileUtil.open_ndjson_writer(args.changes) as writer:
+        for change in changes:
+            writer.write(change)
+    if args.report:
+        FileUtil.write_to_file(report, args.report)
+    if args.apply:
+        FileUtil.write_to_file(apply_changes(domain_ip_map, changes), args.apply)
+
+
+if __name__ == '__main__':
+    main()
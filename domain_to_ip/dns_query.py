@@ -0,0 +1,202 @@
+#  直接向上游 DNS 服务器发送 UDP 查询，绕过系统缓存
+#  不再需要每次查询前用 sudo 清空本机 DNS 缓存，可以高速采样域名的 IP 轮换，同时拿到每条记录的 TTL
+#  响应设置了 TC（被截断）标志时改用 TCP 重新查询；timeout 是一次查询（包括 TCP 重试）的总时间
+
+import random
+import socket
+import struct
+import time
+
+TYPE_A = 1
+TYPE_CNAME = 5
+TYPE_AAAA = 28
+CLASS_IN = 1
+
+FLAG_TC = 0x0200
+# 域名最多 255 字节，一个合法的报文不需要更多的压缩指针跳转
+MAX_NAME_LENGTH = 255
+MAX_POINTER_HOPS = 32
+
+
+class DNSQueryError(Exception):
+    pass
+
+
+class MalformedResponse(DNSQueryError):
+    """响应报文格式错误（长度不够、偏移越界、压缩指针循环）"""
+
+
+class ResponseIDMismatch(DNSQueryError):
+    """响应 ID 和查询不一致，不是本次查询的响应"""
+
+
+class TruncatedResponse(DNSQueryError):
+    """UDP 响应设置了 TC 标志，需要用 TCP 重新查询"""
+
+
+class ServerError(DNSQueryError):
+    def __init__(self, rcode):
+        super().__init__("server returned rcode %d" % rcode)
+        self.rcode = rcode
+
+
+class QueryTimeout(DNSQueryError):
+    pass
+
+
+# 构造查询报文：头部 + 一个问题，设置 RD（递归查询）标志
+def build_query(domain, qtype, query_id):
+    header = struct.pack('!HHHHHH', query_id, 0x0100, 1, 0, 0, 0)
+    qname = b''.join(bytes([len(label)]) + label for label in domain.rstrip('.').encode('idna').split(b'.'))
+    return header + qname + b'\x00' + struct.pack('!HH', qtype, CLASS_IN)
+
+
+# 读取（可能被压缩的）域名，返回 (域名, 域名之后的偏移)
+# 所有偏移都检查报文长度，压缩指针最多跳 MAX_POINTER_HOPS 次，域名总长不超过 MAX_NAME_LENGTH
+def read_name(message, offset):
+    labels = []
+    end = None
+    hops = 0
+    name_length = 0
+    while True:
+        if offset >= len(message):
+            raise MalformedResponse("name runs past the end of the message")
+        length = message[offset]
+        if length & 0xC0 == 0xC0:
+            # 压缩指针：后续内容在报文的其他位置
+            if offset + 2 > len(message):
+                raise MalformedResponse("truncated compression pointer")
+            hops += 1
+            if hops > MAX_POINTER_HOPS:
+                raise MalformedResponse("name compression loop")
+            if end is None:
+                end = offset + 2
+            offset = struct.unpack_from('!H', message, offset)[0] & 0x3FFF
+        elif length & 0xC0:
+            raise MalformedResponse("unsupported label type 0x%02x" % length)
+        elif length == 0:
+            return '.'.join(labels), (end if end is not None else offset + 1)
+        else:
+            if offset + 1 + length > len(message):
+                raise MalformedResponse("label runs past the end of the message")
+            name_length += length + 1
+            if name_length > MAX_NAME_LENGTH:
+                raise MalformedResponse("name longer than %d bytes" % MAX_NAME_LENGTH)
+            labels.append(message[offset + 1:offset + 1 + length].decode('ascii', 'replace'))
+            offset += 1 + length
+
+
+# 解析响应报文，返回 [(类型, 地址或别名, TTL)]
+def parse_response(message, query_id):
+    if len(message) < 12:
+        raise MalformedResponse("response shorter than the header")
+    response_id, flags, qdcount, ancount = struct.unpack_from('!HHHH', message, 0)
+    if response_id != query_id:
+        raise ResponseIDMismatch("response id mismatch")
+    if flags & FLAG_TC:
+        raise TruncatedResponse("truncated response")
+    rcode = flags & 0x000F
+    if rcode == 3:
+        return []
+    if rcode:
+        raise ServerError(rcode)
+    offset = 12
+    for _ in range(qdcount):
+        _, offset = read_name(message, offset)
+        offset += 4
+    answers = []
+    for _ in range(ancount):
+        _, offset = read_name(message, offset)
+        if offset + 10 > len(message):
+            raise MalformedResponse("truncated resource record")
+        rtype, rclass, ttl, rdlength = struct.unpack_from('!HHIH', message, offset)
+        offset += 10
+        if offset + rdlength > len(message):
+            raise MalformedResponse("record data runs past the end of the message")
+        rdata = message[offset:offset + rdlength]
+        if rtype == TYPE_A and rdlength == 4:
+            answers.append((rtype, socket.inet_ntop(socket.AF_INET, rdata), ttl))
+        elif rtype == TYPE_AAAA and rdlength == 16:
+            answers.append((rtype, socket.inet_ntop(socket.AF_INET6, rdata), ttl))
+        elif rtype == TYPE_CNAME:
+            answers.append((rtype, read_name(message, offset)[0], ttl))
+        offset += rdlength
+    return answers
+
+
+def _remaining(deadline):
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise QueryTimeout("timed out")
+    return remaining
+
+
+def _recv_exact(sock, size, deadline):
+    data = b''
+    while len(data) < size:
+        sock.settimeout(_remaining(deadline))
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise MalformedResponse("connection closed before the full response")
+        data += chunk
+    return data
+
+
+def _query_udp(message, query_id, server, family, deadline):
+    with socket.socket(family, socket.SOCK_DGRAM) as sock:
+        sock.connect(server)
+        sock.send(message)
+        while True:
+            sock.settimeout(_remaining(deadline))
+            response = sock.recv(4096)
+            try:
+                return parse_response(response, query_id)
+            except ResponseIDMismatch:
+                # 丢弃不属于本次查询的响应，继续等待
+                continue
+
+
+# TCP 查询：报文前面加两个字节的长度
+def _query_tcp(message, query_id, server, family, deadline):
+    with socket.socket(family, socket.SOCK_STREAM) as sock:
+        sock.settimeout(_remaining(deadline))
+        sock.connect(server)
+        sock.sendall(struct.pack('!H', len(message)) + message)
+        length = struct.unpack('!H', _recv_exact(sock, 2, deadline))[0]
+        return parse_response(_recv_exact(sock, length, deadline), query_id)
+
+
+# 向 server 发送一次查询，返回 [(类型, 值, TTL)]；UDP 响应被截断时用 TCP 重新查询
+# deadline 为 time.monotonic() 的截止时间，不给时为 timeout 秒之后，超时抛出 QueryTimeout
+def query(domain, qtype=TYPE_A, server=('8.8.8.8', 53), timeout=2.0, deadline=None):
+    deadline = time.monotonic() + timeout if deadline is None else deadline
+    query_id = random.getrandbits(16)
+    family = socket.AF_INET6 if ':' in server[0] else socket.AF_INET
+    message = build_query(domain, qtype, query_id)
+    try:
+        try:
+            return _query_udp(message, query_id, server, family, deadline)
+        except TruncatedResponse:
+            return _query_tcp(message, query_id, server, family, deadline)
+    except socket.timeout:
+        raise QueryTimeout("no response from %s:%d for %s" % (server[0], server[1], domain)) from None
+
+
+# 查询 A 和 AAAA 记录，返回 {IP: TTL}；两次查询共用 timeout 秒
+def query_addresses(domain, server=('8.8.8.8', 53), timeout=2.0):
+    deadline = time.monotonic() + timeout
+    addresses = {}
+    for qtype in (TYPE_A, TYPE_AAAA):
+        for rtype, value, ttl in query(domain, qtype, server, deadline=deadline):
+            if rtype == qtype:
+                addresses[value] = ttl
+    return addresses
+
+
+# 返回一个可以传给 dns_resolver.resolve_domains 的 resolver，直接查询上游服务器，结果为 {IP: TTL}
+# resolver.timeout 表示它自己保证在 timeout 秒内返回，调用方不需要再套一层超时
+def direct_resolver(server=('8.8.8.8', 53), timeout=2.0):
+    def resolver(domain):
+        return query_addresses(domain, server, timeout)
+    resolver.timeout = timeout
+    return resolver
@@ -0,0 +1,70 @@
+#  并发的域名解析，代替逐个域名串行调用 get_all_ips_from_domain
+#  每个域名解析 attempts 次（间隔 interval 秒）收集轮换的 IP，同时最多 concurrency 个查询在进行
+#  单次查询超时 timeout 秒，失败后重试 retries 次；resolver 可以替换成任意 "域名 -> IP 列表 或 {IP: TTL}" 的函数，方便测试
+#  给出 server 时直接向该上游服务器发 UDP 查询（见 dns_query），不经过系统缓存，也不需要清空缓存，同时拿到 TTL
+
+import asyncio
+import socket
+from concurrent.futures import ThreadPoolExecutor
+
+from dns_query import direct_resolver
+
+
+# 默认的解析函数：使用系统的 getaddrinfo，同时返回 IPv4 和 IPv6 地址
+def getaddrinfo_resolver(domain):
+    return {result[-1][0] for result in socket.getaddrinfo(domain, None)}
+
+
+# 单次查询，返回 {IP: TTL}（resolver 不提供 TTL 时为 None），超时或出错时重试，全部失败返回空字典
+# resolver 带 timeout 属性时（例如 dns_query.direct_resolver）由它自己控制超时，不再套 wait_for
+async def _query(domain, resolver, executor, semaphore, timeout, retries):
+    loop = asyncio.get_running_loop()
+    if getattr(resolver, 'timeout', None) is not None:
+        timeout = None
+    for attempt in range(retries + 1):
+        async with semaphore:
+            try:
+                result = await asyncio.wait_for(loop.run_in_executor(executor, resolver, domain), timeout)
+                return dict(result) if isinstance(result, dict) else dict.fromkeys(result)
+            except asyncio.TimeoutError:
+                error = "timed out after %ss" % timeout
+            except Exception as e:
+                error = e
+        print(f"DNS resolution error for {domain} (try {attempt + 1}/{retries + 1}): {error}")
+    return {}
+
+
+# 对一个域名采样 attempts 次，合并所有出现过的 IP，同一个 IP 保留最近一次的 TTL
+async def _sample_domain(domain, attempts, interval, resolver, executor, semaphore, timeout, retries):
+    all_ips = {}
+    for attempt in range(attempts):
+        if attempt and interval:
+            # 等待期间不占用并发名额，其他域名的查询可以继续
+            await asyncio.sleep(interval)
+        all_ips.update(await _query(domain, resolver, executor, semaphore, timeout, retries))
+    return domain, all_ips
+
+
+async def resolve_domains_async(domains, attempts=5, interval=0, concurrency=32, timeout=5.0, retries=2,
+                                resolver=None, server=None, with_ttl=False):
+    if resolver is None:
+        resolver = getaddrinfo_resolver if server is None else direct_resolver(server, timeout)
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        tasks = [_sample_domain(domain, attempts, interval, resolver, executor, semaphore, timeout, retries)
+                 for domain in domains]
+        domain_ip_map = {}
+        for done in asyncio.as_completed(tasks):
+            domain, ips = await done
+            domain_ip_map[domain] = ips if with_ttl else list(ips)
+            print(f"The IP addresses for {domain} are: {list(ips)}")
+    # 保持和输入相同的域名顺序
+    return {domain: domain_ip_map[domain] for domain in domains if domain in domain_ip_map}
+
+
+# 并发解析所有域名，返回 {域名: IP 列表}，格式和 domain_ip_map.json 相同
+# with_ttl=True 时返回 {域名: {IP: TTL}}，可以直接交给 DomainIPStore.upsert_map
+def resolve_domains(domains, attempts=5, interval=0, concurrency=32, timeout=5.0, retries=2, resolver=None,
+                    server=None, with_ttl=False):
+    return asyncio.run(resolve_domains_async(list(dict.fromkeys(domains)), attempts, interval, concurrency,
+                                             timeout, retries, resolver, server, with_ttl))
@@ -1,9 +1,21 @@
-import json
+import argparse
+import os
 import socket
+import sys
 import time
 import subprocess
 import platform
 
+from dns_resolver import resolve_domains
+
+# util 包在上一级目录
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from util.domain_ip_store import DomainIPStore
+from util.file_util import FileUtil
+
+# 直接查询的上游 DNS 服务器
+DNS_SERVER = ('114.114.114.114', 53)
+
 # 获取域名对应的IP地址，一个域名对应多个IP
 def clear_dns_cache(password):
     system = platform.system()
@@ -51,22 +63,40 @@ def get_all_ips_from_domain(domain, attempts=20, interval=5):
 
 
 
+# 逐行读取，不把整个域名列表读进内存
 def read_domains_from_file(file_path):
     with open(file_path, 'r') as file:
-        domains = [line.strip() for line in file if line.strip()]
-    return domains
+        for line in file:
+            line = line.strip()
+            if line:
+                yield line
+
+
+# 解析结果连同每条记录的 TTL 写入 DomainIPStore，只更新这次出现的映射，库是唯一的数据来源；
+# 需要 JSON 的脚本用 --export domain_ip_map.json 导出当前（未过期）映射，默认不导出
+def main():
+    parser = argparse.ArgumentParser(description='Resolve domains and record the mappings with their TTLs')
+    parser.add_argument('--domains', default='all_domain.txt')
+    parser.add_argument('--store', default='domain_ip_store.db')
+    parser.add_argument('--export', default=None, help='also export the live mappings as JSON, e.g. domain_ip_map.json')
+    parser.add_argument('--attempts', type=int, default=5)
+    parser.add_argument('--max-age', type=float, default=None, help='also evict mappings not seen for this many seconds')
+    parser.add_argument('--min-ttl', type=int, default=DomainIPStore.MIN_TTL,
+                        help='keep each mapping at least this many seconds, even with TTL 0')
+    args = parser.parse_args()
+
+    # 并发解析，每个域名采样 attempts 次，直接查询上游 DNS 服务器，不需要清空本机缓存
+    domain_ip_map = resolve_domains(read_domains_from_file(args.domains), attempts=args.attempts, interval=0,
+                                    server=DNS_SERVER, with_ttl=True)
+    with DomainIPStore(args.store, args.min_ttl) as store:
+        store.upsert_map(domain_ip_map)
+        print(f"{len(domain_ip_map)} domains recorded in {args.store}, {store.evict(max_age=args.max_age)} "
+              f"expired mappings evicted")
+        if args.export:
+            FileUtil.write_to_file(store.to_map(), args.export)
+            print(f"Domain-IP map written to {args.export}")
 
-def write_domain_ip_map_to_file(domain_ip_map, filename="domain_ip_map.json"):
-    with open(filename, "w") as file:
-        json.dump(domain_ip_map, file, indent=4)
-    print(f"Domain-IP map written to {filename}")
 
 if __name__ == '__main__':
-    domain_ip_map = {}
-    domains = read_domains_from_file('all_domain.txt')
-    for domain in domains:
-        iplist = get_all_ips_from_domain(domain, 5, 0)
-        domain_ip_map[domain] = iplist
-        print(f"The IP addresses for {domain} are: {iplist}")
-    write_domain_ip_map_to_file(domain_ip_map, "domain_ip_map.json")
+    main()
 
@@ -0,0 +1,86 @@
+import numpy as np
+
+from util.crawler import process_url
+from util.file_util import FileUtil
+
+# 每个字节中 1 的个数，用于位集合的 popcount
+POPCOUNT = np.array([bin(i).count('1') for i in range(256)], dtype=np.int32)
+
+
+class WebsiteIdentifier:
+    """根据抓包得到的 IP 集合识别访问的网站
+
+    每个网站有两组 IP：主域名解析到的 IP，和页面托管的次级域名解析到的 IP。
+    所有 IP 组成一个词表，每个网站的两组 IP 存成位集合（np.packbits），
+    一次抓包和所有网站的交集用按位与 + popcount 一次向量化算出。
+    权重 = main_weight * 主域名 IP 命中比例 + hosted_weight * 次级域名 IP 命中比例，
+    require_main=True 时只保留主域名 IP 至少命中一个的网站（先匹配主域名，再按次级域名计算权重）。
+    """
+
+    def __init__(self, domain_map, domain_ip_map, main_weight=1.0, hosted_weight=1.0, require_main=True):
+        self.sites = list(domain_map)
+        self.main_weight = main_weight
+        self.hosted_weight = hosted_weight
+        self.require_main = require_main
+
+        main_sets = [set(domain_ip_map.get(site, [])) for site in self.sites]
+        hosted_sets = [{ip for domain in domain_map[site] for ip in domain_ip_map.get(domain, [])} - main
+                       for site, main in zip(self.sites, main_sets)]
+        self.vocabulary = {ip: i for i, ip in enumerate(sorted(set().union(*main_sets, *hosted_sets)))}
+        self.main_bits = self._pack_rows(main_sets)
+        self.hosted_bits = self._pack_rows(hosted_sets)
+        self.main_sizes = np.array([len(s) for s in main_sets], dtype=np.float64)
+        self.hosted_sizes = np.array([len(s) for s in hosted_sets], dtype=np.float64)
+
+    @classmethod
+    def from_files(cls, domain_map_file='domain_map.json', domain_ip_map_file='domain_ip_map.json', **kwargs):
+        # JSON、key:v1,v2 文本和紧凑二进制格式（.cmap）都可以
+        return cls(FileUtil.read_map(domain_map_file), FileUtil.read_map(domain_ip_map_file), **kwargs)
+
+    def _pack_rows(self, ip_sets):
+        rows = np.zeros((len(ip_sets), len(self.vocabulary)), dtype=bool)
+        for row, ips in enumerate(ip_sets):
+            rows[row, [self.vocabulary[ip] for ip in ips if ip in self.vocabulary]] = True
+        return np.packbits(rows, axis=1)
+
+    def _weights(self, capture_bits):
+        # capture_bits: (抓包数, 字节数)，返回 (抓包数, 网站数) 的命中数和权重
+        main_hits = POPCOUNT[capture_bits[:, None, :] & self.main_bits[None, :, :]].sum(axis=2)
+        hosted_hits = POPCOUNT[capture_bits[:, None, :] & self.hosted_bits[None, :, :]].sum(axis=2)
+        weights = (self.main_weight * main_hits / np.maximum(self.main_sizes, 1)
+                   + self.hosted_weight * hosted_hits / np.maximum(self.hosted_sizes, 1))
+        if self.require_main:
+            weights = np.where(main_hits > 0, weights, 0.0)
+        return main_hits, hosted_hits, weights
+
+    def _ranked(self, main_hits, hosted_hits, weights, top):
+        order = np.argsort(-weights, kind='stable')[:top]
+        return [(self.sites[i], float(weights[i]), int(main_hits[i]), int(hosted_hits[i]))
+                for i in order if weights[i] > 0]
+
+    def identify(self, capture_ips, top=5):
+        """对一次抓包打分，返回按权重排序的 [(网站, 权重, 主域名命中数, 次级域名命中数)]"""
+        return self.identify_batch({None: capture_ips}, top)[None]
+
+    def identify_batch(self, capture_ip_map, top=5, chunk_size=64):
+        """批量打分，capture_ip_map 为 {抓包名: IP 列表}，按 chunk_size 分块避免中间数组过大"""
+        names = list(capture_ip_map)
+        captures = self._pack_rows([capture_ip_map[name] for name in names])
+        results = {}
+        for start in range(0, len(names), chunk_size):
+            main_hits, hosted_hits, weights = self._weights(captures[start:start + chunk_size])
+            for row, name in enumerate(names[start:start + chunk_size]):
+                results[name] = self._ranked(main_hits[row], hosted_hits[row], weights[row], top)
+        return results
+
+
+if __name__ == '__main__':
+    identifier = WebsiteIdentifier.from_files()
+    capture_ip_map = FileUtil.read_from_file('capture_ip_map.json')
+    results = identifier.identify_batch(capture_ip_map, top=3)
+    correct = 0
+    for url, candidates in results.items():
+        best = candidates[0][0] if candidates else None
+        correct += best == process_url(url)
+        print(f"{url} -> {best}  {[(site, round(weight, 3)) for site, weight, _, _ in candidates]}")
+    print(f"identified {correct}/{len(results)} captures")
@@ -1,9 +1,14 @@
 #  Based on Liu & Terzi's k-degree anonymity:
 # [1] https://dl.acm.org/doi/10.1145/1376616.1376629
 
+import itertools
 import networkx as nx
 import numpy as np
 import random as rn
+import time
+
+from compact_graph import CompactGraph, degree_array
+from kdegree_verify import anonymity_report, is_k_anonymous, print_report
 
 def sort_dv(dv):
     dv.sort(reverse=True)
@@ -33,90 +38,122 @@ def assignment_cost_additions_deletions(degree_sequence):
 
 
 # Precomputation of the anonymisation cost, as described in Section 4 of [1]
+# C[i, j]表示将度序列从第 i 个节点到第 j 个节点之间的序列调整到满足k-匿名性的最小成本。
+# DP 只会读取 j in [i+k-1, i+2k) 这一条带，所以只存 n*(k+1) 的带状矩阵，不再分配 n*n 的稠密矩阵
 def anonymisation_cost_precomputation(degree_sequence, k, with_deletions):
-    n = np.size(degree_sequence)
-    # C[i, j]表示将度序列从第 i 个节点到第 j 个节点之间的序列调整到满足k-匿名性的最小成本。
-    # 具体来说，C[i, j]存储了将子序列 degree_sequence[i,j] 调整到满足 k-匿名性的总成本。
-    # 递推公式 C[i, j] = C[i, j - 1] + (i,j)节点匿名的成本
-    C = np.full([n, n], np.inf)
-    for i in range(n - 1):
-        # j从 i+k-1是确保子序列至少i+k-1个节点才能组成k匿名
-        for j in range(i + k - 1, np.min([i + 2 * k, n])):
-            if with_deletions:
-                if C[i, j - 1] == np.inf:
-                    C[i, j] = assignment_cost_additions_deletions(degree_sequence[i:j + 1])
-                else:
-                    C[i, j] = C[i, j - 1] + median(degree_sequence[i:j + 1]) - degree_sequence[j]
-            else:
-                if C[i, j - 1] == np.inf:
-                    C[i, j] = assignment_cost_additions_only(degree_sequence[i:j + 1])
-                else:
-                    C[i, j] = C[i, j - 1] + degree_sequence[i] - degree_sequence[j]
-    return C
+    return BandedCostMatrix(degree_sequence, k, with_deletions)
+
+
+# 带状代价矩阵：band[i, j - (i + k - 1)] = C[i, j]，带外的位置视为 np.inf
+# 基于降序度序列的前缀和，每个 C[i, j] 都可以 O(1) 算出
+class BandedCostMatrix:
+    def __init__(self, degree_sequence, k, with_deletions):
+        self.degree_sequence = np.asarray(degree_sequence, dtype=np.int64)
+        self.k = k
+        self.with_deletions = with_deletions
+        self.n = np.size(self.degree_sequence)
+        # prefix[i] = degree_sequence[0] + ... + degree_sequence[i-1]
+        self.prefix = np.concatenate(([0], np.cumsum(self.degree_sequence)))
+        i = np.arange(self.n)[:, None]
+        j = i + (k - 1) + np.arange(k + 1)[None, :]
+        valid = j < self.n
+        self.band = np.where(valid, self.segment_cost(i, np.where(valid, j, i)), np.inf)
+
+    # 子序列 degree_sequence[i:j+1] 的组度数：只加边时取最大值，可删边时取中位数
+    def group_degree(self, i, j):
+        if self.with_deletions:
+            return self.segment_median(i, j)
+        return self.degree_sequence[i]
+
+    # median of the sorted segment degree_sequence[i:j+1], same rounding as median()
+    def segment_median(self, i, j):
+        ds = self.degree_sequence
+        length = j - i + 1
+        mid = i + length // 2
+        lower = ds[np.maximum(mid - 1, i)]
+        return np.where(length % 2 == 1, ds[mid], (lower + ds[mid]) // 2)
+
+    # "degree anonymization cost" of degree_sequence[i:j+1], vectorized over i and j
+    def segment_cost(self, i, j):
+        i = np.asarray(i)
+        j = np.asarray(j)
+        length = j - i + 1
+        total = self.prefix[j + 1] - self.prefix[i]
+        if not self.with_deletions:
+            # Section 4: 所有节点补到组内最大度数 degree_sequence[i]
+            return (length * self.degree_sequence[i] - total).astype(np.float64)
+        # Section 8: 降序序列中前一半 >= 中位数，后一半 <= 中位数，用前缀和求 sum|md - d|
+        md = self.segment_median(i, j)
+        half = length // 2
+        upper = self.prefix[i + half] - self.prefix[i]
+        lower = total - upper
+        return (upper - half * md + (length - half) * md - lower).astype(np.float64)
+
+    def __getitem__(self, index):
+        i, j = index
+        offset = np.asarray(j) - np.asarray(i) - (self.k - 1)
+        inside = (offset >= 0) & (offset <= self.k) & (np.asarray(j) < self.n)
+        if np.ndim(inside) == 0:
+            return self.band[i, offset] if inside else np.inf
+        i = np.clip(i, 0, self.n - 1)
+        return np.where(inside, self.band[i, np.clip(offset, 0, self.k)], np.inf)
 
 
 # The dynamic programming algorithm described in Section 4 of [1]
+# 自底向上迭代：Da[m] 为前 m 个节点匿名化的最小代价，start[m] 记录最后一组的起点（0 表示整体一组），
+# 只保存代价表和回溯指针，最后一次性回溯出匿名度序列，时间 O(n*k)，内存 O(n*k)
 def dp_degree_anonymiser(degree_sequence, k, with_deletions=False):
     C = anonymisation_cost_precomputation(degree_sequence, k, with_deletions)
     n = np.size(degree_sequence)
-    Da = np.full(n, np.inf)
-    sequences = [None] * n
-    cost, anonymised_sequence = dp_degree_anonymiser_recursion(degree_sequence, k, C, n, Da, sequences, with_deletions)
+    Da = np.full(n + 1, np.inf)
+    start = np.zeros(n + 1, dtype=np.int64)
+    # all nodes of the prefix in one group: C[0, m-1]，只有 k <= m <= 2k 时在带内
+    all_in_one_group_cost = np.full(n + 1, np.inf)
+    m = np.arange(k, np.min([2 * k, n]) + 1)
+    all_in_one_group_cost[m] = C.band[0, m - k]
+    Da[:2 * k] = all_in_one_group_cost[:2 * k]
+    width = np.arange(k)
+    # Da[m] 只依赖 Da[m-2k+1 .. m-k]，所以连续 k 个 m 互不依赖，可以按块向量化求解
+    for block in range(2 * k, n + 1, k):
+        m = np.arange(block, np.min([block + k, n + 1]))
+        rows = np.arange(np.size(m))
+        # number of candidates optimised according to Eq. 4 in [1]
+        # originally: range(k-1,m-k)
+        t = np.maximum(k - 1, m - 2 * k)[:, None] + width
+        candidate = t < (m - k)[:, None]
+        t = np.where(candidate, t, m[:, None] - k - 1)
+        # C[t+1, m-1] 在带里的列号是 (m-1) - (t+1) - (k-1)
+        costs = np.where(candidate, Da[t + 1] + C.band[t + 1, m[:, None] - t - k - 1], np.inf)
+        # argmin 取第一个最小值，和原来递归版本 "cost < min_cost" 的选择一致
+        best = np.argmin(costs, axis=1)
+        best_cost = costs[rows, best]
+        split = best_cost < all_in_one_group_cost[m]
+        Da[m] = np.where(split, best_cost, all_in_one_group_cost[m])
+        start[m] = np.where(split, t[rows, best] + 1, 0)
+
+    # 回溯：从最后一组往前，每组填入组度数
+    anonymised_sequence = np.empty(n, dtype=np.asarray(degree_sequence).dtype)
+    end = n
+    while end > 0:
+        begin = start[end]
+        anonymised_sequence[begin:end] = C.group_degree(begin, end - 1)
+        end = begin
     return anonymised_sequence
 
 
-# The dynamic programming algorithm described in Section 4 of [1] - recursion part
-def dp_degree_anonymiser_recursion(degree_sequence, k, C, n, Da, sequences, with_deletions):
-    group_degree = None
-    if with_deletions:
-        group_degree = median(degree_sequence)
-    else:
-        group_degree = degree_sequence[0]
-    all_in_one_group_sequence = np.full(n, group_degree)
-    all_in_one_group_cost = C[0, n - 1]
-
-    if n < 2 * k:
-        return all_in_one_group_cost, all_in_one_group_sequence
-    else:
-
-        min_cost = np.inf
-        min_cost_sequence = np.empty(0)
-        # number of recursions optimised according to Eq. 4 in [1]
-        # originally: range(k-1,n-k)
-        for t in range(np.max([k - 1, n - 2 * k]), n - k):
-            # this IF-ELSE is to avoid recomputing cost and sequence for the same value of t more than once
-            if Da[t] == np.inf:
-                cost, sequence = dp_degree_anonymiser_recursion(degree_sequence[0:t + 1], k, C, t + 1, Da, sequences,
-                                                                with_deletions)
-                Da[t] = cost
-                sequences[t] = sequence
-            else:
-                cost = Da[t]
-                sequence = sequences[t]
-            cost = cost + C[t + 1, n - 1]
-            if cost < min_cost:
-                min_cost = cost
-                if with_deletions:
-                    min_cost_sequence = np.concatenate(
-                        (sequence, np.full(np.size(degree_sequence[t + 1:]), median(degree_sequence[t + 1:]))))
-                else:
-                    min_cost_sequence = np.concatenate(
-                        (sequence, np.full(np.size(degree_sequence[t + 1:]), degree_sequence[t + 1])))
-        to_return = (min_cost, min_cost_sequence) if min_cost < all_in_one_group_cost else (
-        all_in_one_group_cost, all_in_one_group_sequence)
-        return to_return
-
-
 # Section 6.2 in [1]
-# 输入(度序列，原始图)
-def priority(degree_sequence, original_G):
+# 输入(度序列，原始图)，rng 为随机数发生器（默认使用全局的 random 模块）
+def priority(degree_sequence, original_G, rng=None):
+    rng = rn if rng is None else rng
     n = len(degree_sequence)
     # 如果度序列的总数是奇数，那么该序列不可实现
     # if the sum of the degree sequence is odd, the degree sequence isn't realisable
     if np.sum(degree_sequence) % 2 != 0:
         return None
 
-    G = nx.empty_graph(n)  # 创建一个空图G
+    # 新图的边和邻接集合，不依赖 networkx，最后由 new_graph 转成和原图相同的图结构
+    edges = []
+    adjacency = [set() for _ in range(n)]
     # transform list of degrees in list of (vertex, degree)
     vd = [(v, d) for v, d in enumerate(degree_sequence)]  # 返回枚举对象，v为序，d为度
 
@@ -138,7 +175,7 @@ def priority(degree_sequence, original_G):
         # 当在度序列里的所有边都已经被添加，图G已经创建好了
         # 如果总度数==0，返回图G
         if tot_degree == 0:
-            return G
+            return new_graph(original_G, n, edges)
 
         # gather all the vertices that need more edges
         # 收集所有需要更多边的顶点
@@ -146,9 +183,11 @@ def priority(degree_sequence, original_G):
         remaining_vertices = [i for i, vertex in enumerate(vd) if vertex[1] > 0]
         # pick a random one
         # 随机取出其中的一个点
-        idx = remaining_vertices[rn.randrange(len(remaining_vertices))]
+        idx = remaining_vertices[rng.randrange(len(remaining_vertices))]
         # 此处v代表该点在vd中的序号
         v = vd[idx][0]
+        # v 在原始图中的邻居，每次查边都是一次集合查找
+        original_neighbours = set(original_G.neighbors(v))
         # 遍历所有图里面的边，取出他们的soure和target作为u和v
         # iterate over all the degree-sorted vertices u such that (u,v) is an edge in the original graph
         for i, u in enumerate(vd):
@@ -163,12 +202,12 @@ def priority(degree_sequence, original_G):
                 continue
             # 确保我们不会添加两条相同的边
             # make sure we're not adding the same edge twice..
-            if G.has_edge(u[0], v):
+            if u[0] in adjacency[v]:
                 continue
             # 如果原始图里存在该条边，并且该点在vd的度大于0，则添加该条边
             # add the edge if this exists also in the original graph
-            if original_G.has_edge(v, u[0]) and u[1] > 0:
-                G.add_edge(v, u[0])
+            if u[0] in original_neighbours and u[1] > 0:
+                add_edge(edges, adjacency, v, u[0])
                 # decrease the degree of the connected vertex
                 # 减少target和source的度
                 vd[i] = (u[0], u[1] - 1)
@@ -189,62 +228,302 @@ def priority(degree_sequence, original_G):
                 continue
             # 保证不会添加两条相同的边
             # make sure we're not adding the same edge twice..
-            if G.has_edge(v, u[0]):
+            if u[0] in adjacency[v]:
                 continue
             # 现在添加不在原始图中的边
             # now add edges that are not in the original graph
-            if not original_G.has_edge(v, u[0]):
-                G.add_edge(v, u[0])
+            if u[0] not in original_neighbours:
+                add_edge(edges, adjacency, v, u[0])
                 # decrease the degree of the connected vertex
                 vd[i] = (u[0], u[1] - 1)
                 # keep track of how many edges we added
                 vd[idx] = (v, vd[idx][1] - 1)
 
-# 度数最低的noise节点度数+1
-def probing(dv, noise):
+# Section 6.2 in [1], 用度数桶实现的快速版本
+# 语义与 priority 相同：随机取一个还需要边的点 v，先连原图中存在的边，再连原图中不存在的边，
+# 每次都优先连剩余度数最大的点；剩余度数按桶存放，更新 O(1)，不再每轮重新排序
+def priority_fast(degree_sequence, original_G, rng=None):
+    rng = rn if rng is None else rng
+    n = len(degree_sequence)
+    residual = [int(d) for d in degree_sequence]
+    # if the sum of the degree sequence is odd or a degree is negative, the degree sequence isn't realisable
+    if sum(residual) % 2 != 0 or any(d < 0 for d in residual):
+        return None
+
+    # 已经添加的边，adjacency[v] 为 v 在新图中的邻居
+    edges = []
+    adjacency = [set() for _ in range(n)]
+    max_degree = max(residual, default=0)
+    # buckets[d] 是剩余度数为 d 的点集合
+    buckets = [set() for _ in range(max_degree + 1)]
+    # active 保存剩余度数 > 0 的点，position 用于 O(1) 删除和随机抽取
+    active = []
+    position = [-1] * n
+    for v, d in enumerate(residual):
+        if d > 0:
+            buckets[d].add(v)
+            position[v] = len(active)
+            active.append(v)
+
+    def decrease(u):
+        buckets[residual[u]].discard(u)
+        residual[u] -= 1
+        if residual[u] > 0:
+            buckets[residual[u]].add(u)
+        else:
+            last = active.pop()
+            if last != u:
+                active[position[u]] = last
+                position[last] = position[u]
+            position[u] = -1
+
+    while active:
+        # pick a random vertex that needs more edges
+        v = active[rng.randrange(len(active))]
+        need = residual[v]
+        original_neighbours = set(original_G.neighbors(v))
+        # (u,v) is an edge in the original graph, highest residual degree first
+        targets = sorted((u for u in original_neighbours if u != v and residual[u] > 0 and u not in adjacency[v]),
+                         key=lambda u: residual[u], reverse=True)[:need]
+        # (u,v) is NOT an edge in the original graph
+        if len(targets) < need:
+            chosen = set(targets)
+            while max_degree > 0 and not buckets[max_degree]:
+                max_degree -= 1
+            for d in range(max_degree, 0, -1):
+                for u in buckets[d]:
+                    if u == v or u in chosen or u in adjacency[v] or u in original_neighbours:
+                        continue
+                    targets.append(u)
+                    chosen.add(u)
+                    if len(targets) == need:
+                        break
+                if len(targets) == need:
+                    break
+        # 没有足够的点可以连，度序列无法实现
+        if len(targets) < need:
+            return None
+        for u in targets:
+            edges.append((v, u))
+            adjacency[v].add(u)
+            adjacency[u].add(v)
+            decrease(u)
+            decrease(v)
+    return new_graph(original_G, n, edges)
+
+
+# 图的构造方法，graph_anonymiser 通过 construction 参数选择
+CONSTRUCTION_ENGINES = {
+    'priority': priority,
+    'fast': priority_fast,
+}
+
+
+def add_edge(edges, adjacency, u, v):
+    edges.append((u, v))
+    adjacency[u].add(v)
+    adjacency[v].add(u)
+
+
+# 用构造出的边建图，和原始图使用同一种图结构（networkx.Graph 或 CompactGraph）
+# CompactGraph 同时带上原图的节点标签，compact=True 时转换回 networkx 能恢复调用方的标签
+def new_graph(original_G, n, edges):
+    if isinstance(original_G, CompactGraph):
+        G = CompactGraph(n, edges)
+        G.labels = original_G.labels
+        return G
+    G = nx.empty_graph(n)
+    G.add_edges_from(edges)
+    return G
+
+
+# 检查构造出的图的度序列是否和要求的度序列一致
+def is_degree_sequence_realised(G, degree_sequence):
+    return np.array_equal(degree_array(G), np.asarray(degree_sequence))
+
+
+# 度数最低的noise节点度数+1，度数不超过 max_degree（默认 n-1）
+def probing(dv, noise, max_degree=None):
     # increase only the degree of the lowest degree nodes, as suggested in the paper
-    n = len(dv)
+    max_degree = len(dv) - 1 if max_degree is None else max_degree
     for v in range(-noise, 0):
-        dv[v] = (np.min([dv[v][0] + 1, n - 1]), dv[v][1])
+        dv[v] = (np.min([dv[v][0] + 1, max_degree]), dv[v][1])
     return dv
 
 
+# 对 dv 排序后运行 DP，并将匿名化后的度序列中的每个值放回对应原始节点的位置
+def anonymise_dv(dv, k, with_deletions=False):
+    degree_sequence, permutation = sort_dv(dv)
+    anonymised_sequence = dp_degree_anonymiser(degree_sequence, k, with_deletions=with_deletions)
+    new_anonymised_sequence = [None] * len(degree_sequence)
+    for i in range(len(permutation)):
+        new_anonymised_sequence[permutation[i]] = anonymised_sequence[i]
+    return new_anonymised_sequence
+
+
+# 运行 fn 并把耗时累加到 stats[phase]，stats 为 None 时不计时
+def timed(stats, phase, fn, *args, **kwargs):
+    if stats is None:
+        return fn(*args, **kwargs)
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    stats[phase] = stats.get(phase, 0.0) + time.perf_counter() - start
+    return result
+
+
 # Anonymise G given a value of k using DP degree anonymiser, PRIORITY, and PROBING (edge removals: optional)
-def graph_anonymiser(G, k, noise=10, with_deletions=False):
+# construction 选择图的构造方法，见 CONSTRUCTION_ENGINES；seed 不为 None 时使用独立的随机数发生器
+# G 可以是 networkx.Graph 或 CompactGraph；compact=True 时内部转换成 CompactGraph 运行，返回 networkx.Graph
+# max_attempts 限制尝试次数，超过时返回 None；stats 为 dict 时记录 dp/construction/probing 各阶段耗时和尝试次数
+def graph_anonymiser(G, k, noise=10, with_deletions=False, construction='priority', seed=None, compact=False,
+                     max_attempts=None, stats=None):
+    if compact and not isinstance(G, CompactGraph):
+        Ga = graph_anonymiser(CompactGraph.from_networkx(G), k, noise, with_deletions, construction, seed,
+                              max_attempts=max_attempts, stats=stats)
+        return None if Ga is None else Ga.to_networkx()
+    construct = CONSTRUCTION_ENGINES[construction]
+    rng = rn if seed is None else rn.Random(seed)
     dv = [(d, v) for v, d in G.degree()]
-    degree_sequence, permutation = sort_dv(dv)
 
     attempt = 1
     print("Attempt number", attempt)
     # 获得调整代价最小的度序列
-    anonymised_sequence = dp_degree_anonymiser(degree_sequence, k, with_deletions=with_deletions)
-    # 将匿名化后的度序列中的每个值放回对应原始节点的位置
-    new_anonymised_sequence = [None] * len(degree_sequence)
-    for i in range(len(permutation)):
-        new_anonymised_sequence[permutation[i]] = anonymised_sequence[i]
-    anonymised_sequence = new_anonymised_sequence
+    anonymised_sequence = timed(stats, 'dp', anonymise_dv, dv, k, with_deletions=with_deletions)
     # 获得了最佳的度序列，根据优先级进行图的动态调整
-    Ga = priority(anonymised_sequence, G)
+    Ga = timed(stats, 'construction', construct, anonymised_sequence, G, rng)
 
     while Ga is None:
+        if max_attempts is not None and attempt >= max_attempts:
+            print("no realisable graph found in", max_attempts, "attempts")
+            break
         attempt = attempt + 1
         print("Attempt number", attempt)
 
-        dv = probing(dv, noise)
-        degree_sequence, permutation = sort_dv(dv)
-
-        anonymised_sequence = dp_degree_anonymiser(degree_sequence, k, with_deletions=with_deletions)
-
-        new_anonymised_sequence = [None] * len(degree_sequence)
-        for i in range(len(permutation)):
-            new_anonymised_sequence[permutation[i]] = anonymised_sequence[i]
-        anonymised_sequence = new_anonymised_sequence
+        dv = timed(stats, 'probing', probing, dv, noise)
+        anonymised_sequence = timed(stats, 'dp', anonymise_dv, dv, k, with_deletions=with_deletions)
         # 判断一个给定的度序列是否可以构成一个简单无向图
         if not nx.is_valid_degree_sequence_erdos_gallai(anonymised_sequence):
             continue
-        Ga = priority(anonymised_sequence, G)
+        Ga = timed(stats, 'construction', construct, anonymised_sequence, G, rng)
         if Ga is None:
             print("the sequence is valid but the graph construction failed")
+    if stats is not None:
+        stats['attempts'] = attempt
+    if Ga is None:
+        return None
+    # 构造出的图必须正好实现匿名度序列
+    if not is_degree_sequence_realised(Ga, anonymised_sequence):
+        raise ValueError("graph construction '%s' did not realise the anonymised degree sequence" % construction)
+    return Ga
+
+
+# Gale–Ryser 定理：左侧度序列 left 和右侧度序列 right 能否构成简单二部图
+# 左侧降序排列后，对每个 r 要求 sum(left[:r]) <= sum_j min(right[j], r)，右侧按度数计数后整体向量化，O(n + m)
+# exact=False 时 right 是右侧每个点的容量（度数上限），不要求两侧度数之和相等
+def is_bigraphic(left, right, exact=True):
+    a = np.sort(np.asarray(left, dtype=np.int64))[::-1]
+    b = np.asarray(right, dtype=np.int64)
+    if np.any(a < 0) or np.any(b < 0):
+        return False
+    if exact and a.sum() != b.sum():
+        return False
+    n = np.size(a)
+    if n == 0:
+        return True
+    # r <= n，所以 right 里大于 n 的值按 n 计数不影响 min(right[j], r)
+    counts = np.bincount(np.minimum(b, n), minlength=n + 1)
+    fewer = np.concatenate(([0], np.cumsum(counts)))      # fewer[r] = #{right[j] < r}
+    below = np.concatenate(([0], np.cumsum(counts * np.arange(n + 1))))  # below[r] = sum of right[j] < r
+    r = np.arange(1, n + 1)
+    return bool(np.all(np.cumsum(a) <= below[r] + r * (np.size(b) - fewer[r])))
+
+
+# 默认的候选 IP：和 v 共用 IP 的其他左侧点所连的右侧点（两跳邻居），共用次数多的优先
+def two_hop_candidates(original_G, n_left):
+    def candidates(v):
+        counts = {}
+        for u in original_G.neighbors(v):
+            for w in original_G.neighbors(u):
+                if w != v and w < n_left:
+                    for x in original_G.neighbors(w):
+                        counts[x] = counts.get(x, 0) + 1
+        return sorted(counts, key=counts.get, reverse=True)
+    return candidates
+
+
+# 二部图的构造：左侧 0..n_left-1（域名），右侧 n_left..n-1（IP），只会产生左-右的边
+# 左侧点 v 的度数降到 target[v] 时删掉连到度数最大的右侧点的边（这些 IP 被最多域名共用）；
+# 需要加边时按随机顺序处理左侧点，先从 candidates(v) 给出的候选右侧点里选，不够再按原图度数从小到大选，
+# 右侧点的新度数不超过 capacity（原来就超过的不再加边），凑不够边时返回 None
+def bipartite_priority(target, original_G, n_left, rng=None, candidates=None, capacity=None):
+    rng = rn if rng is None else rng
+    n = original_G.number_of_nodes()
+    capacity = n_left if capacity is None else capacity
+    candidates = two_hop_candidates(original_G, n_left) if candidates is None else candidates
+    right_degree = degree_array(original_G).copy()
+    adjacency = [set(u for u in original_G.neighbors(v) if u >= n_left) for v in range(n_left)]
+
+    for v in range(n_left):
+        surplus = len(adjacency[v]) - int(target[v])
+        if surplus > 0:
+            for u in sorted(adjacency[v], key=lambda u: right_degree[u], reverse=True)[:surplus]:
+                adjacency[v].discard(u)
+                right_degree[u] -= 1
+
+    fallback = sorted(range(n_left, n), key=lambda u: right_degree[u])
+    pending = [v for v in range(n_left) if len(adjacency[v]) < target[v]]
+    rng.shuffle(pending)
+    for v in pending:
+        need = int(target[v]) - len(adjacency[v])
+        for u in itertools.chain(candidates(v), fallback):
+            if need == 0:
+                break
+            if u in adjacency[v] or right_degree[u] >= capacity:
+                continue
+            adjacency[v].add(u)
+            right_degree[u] += 1
+            need -= 1
+        if need:
+            return None
+
+    return new_graph(original_G, n, [(v, u) for v in range(n_left) for u in adjacency[v]])
+
+
+# 二部图模式的 k-度匿名：只对左侧（域名）的度序列做 DP，图构造只添加/删除 域名-IP 边
+# G 的左侧为 0..n_left-1，右侧为 n_left..n-1；capacity 为每个 IP 最多连的域名数（默认 n_left）
+# DP 之后先用 Gale–Ryser 检查度序列在右侧容量下是否可实现，不可实现时直接 probing 进入下一次尝试
+def bipartite_graph_anonymiser(G, n_left, k, noise=10, with_deletions=False, seed=None, candidates=None,
+                               capacity=None, max_attempts=None, stats=None):
+    rng = rn if seed is None else rn.Random(seed)
+    degrees = degree_array(G)
+    n_right = np.size(degrees) - n_left
+    capacities = np.maximum(n_left if capacity is None else capacity, degrees[n_left:])
+    dv = [(d, v) for v, d in enumerate(degrees[:n_left].tolist())]
+    noise = min(noise, n_left)
+
+    attempt = 0
+    Ga = None
+    while Ga is None:
+        if max_attempts is not None and attempt >= max_attempts:
+            print("no realisable graph found in", max_attempts, "attempts")
+            break
+        if attempt:
+            dv = timed(stats, 'probing', probing, dv, noise, max_degree=n_right)
+        attempt = attempt + 1
+        print("Attempt number", attempt)
+        anonymised_sequence = timed(stats, 'dp', anonymise_dv, dv, k, with_deletions=with_deletions)
+        if not timed(stats, 'feasibility', is_bigraphic, anonymised_sequence, capacities, exact=False):
+            continue
+        Ga = timed(stats, 'construction', bipartite_priority, anonymised_sequence, G, n_left, rng, candidates,
+                   capacity)
+        if Ga is None:
+            print("the sequence is valid but the graph construction failed")
+    if stats is not None:
+        stats['attempts'] = attempt
+    if Ga is None:
+        return None
+    if not np.array_equal(degree_array(Ga)[:n_left], np.asarray(anonymised_sequence)):
+        raise ValueError("bipartite construction did not realise the anonymised degree sequence")
     return Ga
 
 
@@ -253,15 +532,8 @@ def generate_non_k_anonymous_graph(num_nodes=100, k=3):
         # 使用Erdős-Rényi模型生成随机图
         G = nx.erdos_renyi_graph(num_nodes, p=0.05)
         # 检查是否满足k-匿名性
-        degree_count = {}
-        for node, degree in G.degree():
-            if degree in degree_count:
-                degree_count[degree] += 1
-            else:
-                degree_count[degree] = 1
-
         # 如果存在任何一个度数出现次数小于k，则图不满足k-匿名性
-        if any(count < k for count in degree_count.values()):
+        if not is_k_anonymous(G, k):
             return G
 
 def print_G(G):
@@ -305,6 +577,7 @@ if __name__ == '__main__':
     Ga = graph_anonymiser(G, k, noise, with_deletions=True)
     print("匿名图：")
     print_G(Ga)
+    print_report(anonymity_report(Ga, k, G))
 
 
 
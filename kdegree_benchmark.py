@@ -0,0 +1,151 @@
+#  kdegree 匿名化的基准测试：在不同的图规模、k、密度、是否删边下计时
+#  图类型：er（Erdős-Rényi）、powerlaw（Barabási-Albert）、domain_ip（按 domain_ip_map.json 的度分布生成的二部图）
+#  每个用例在单独的子进程里运行，分别记录 DP、构造、probing 的耗时、尝试次数和峰值内存，结果写成 JSON
+#  用法: python kdegree_benchmark.py --sizes 100 1000 10000 --ks 5 10 --output kdegree_benchmark.json
+
+import argparse
+import collections
+import contextlib
+import io
+import itertools
+import multiprocessing
+import os
+import platform
+import resource
+import time
+
+import networkx as nx
+import numpy as np
+
+from kdegree import graph_anonymiser
+from kdegree_verify import anonymity_report
+from util.file_util import FileUtil
+
+DOMAIN_IP_MAP = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'domain_ip_map.json')
+
+
+def er_graph(n, avg_degree, seed):
+    return nx.fast_gnp_random_graph(n, min(1.0, avg_degree / max(n - 1, 1)), seed=seed)
+
+
+def powerlaw_graph(n, avg_degree, seed):
+    return nx.barabasi_albert_graph(n, max(1, min(int(avg_degree // 2), n - 1)), seed=seed)
+
+
+# 二部图：前一部分节点是域名，后一部分是 IP，两边的度数从真实的域名-IP 映射中抽样，avg_degree 不使用
+def domain_ip_graph(n, avg_degree, seed, path=DOMAIN_IP_MAP):
+    domain_ip_map = FileUtil.read_from_file(path)
+    domain_degrees = np.array([len(set(ips)) for ips in domain_ip_map.values() if ips])
+    ip_degrees = np.array(list(collections.Counter(ip for ips in domain_ip_map.values() for ip in set(ips)).values()))
+    rng = np.random.default_rng(seed)
+    n_domains = max(1, int(round(n * len(domain_degrees) / (len(domain_degrees) + len(ip_degrees)))))
+    n_ips = max(1, n - n_domains)
+    a = rng.choice(domain_degrees, n_domains)
+    b = rng.choice(ip_degrees, n_ips)
+    # 两边度数之和必须相等，差值随机补到较小的一边
+    diff = int(a.sum() - b.sum())
+    np.add.at(b if diff > 0 else a, rng.integers(0, n_ips if diff > 0 else n_domains, abs(diff)), 1)
+    G = nx.bipartite.configuration_model(a.tolist(), b.tolist(), create_using=nx.Graph(), seed=seed)
+    return nx.convert_node_labels_to_integers(G)
+
+
+GRAPH_GENERATORS = {
+    'er': er_graph,
+    'powerlaw': powerlaw_graph,
+    'domain_ip': domain_ip_graph,
+}
+
+
+def peak_rss_mb():
+    # Linux 上 ru_maxrss 的单位是 KB，macOS 上是字节
+    scale = 1 if platform.system() == 'Darwin' else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2 ** 20
+
+
+# 在子进程中运行一个用例，返回结果 dict
+def run_case(case):
+    base_rss = peak_rss_mb()
+    start = time.perf_counter()
+    G = GRAPH_GENERATORS[case['graph']](case['n'], case['avg_degree'], case['seed'])
+    generation_time = time.perf_counter() - start
+
+    stats = {}
+    start = time.perf_counter()
+    # graph_anonymiser 的每次尝试都会打印，基准测试里不需要
+    with contextlib.redirect_stdout(io.StringIO()):
+        Ga = graph_anonymiser(G, case['k'], case['noise'], with_deletions=case['with_deletions'],
+                              construction=case['construction'], seed=case['seed'], compact=case['compact'],
+                              max_attempts=case['max_attempts'], stats=stats)
+    total_time = time.perf_counter() - start
+
+    result = dict(case)
+    result.update({
+        'nodes': G.number_of_nodes(),
+        'edges': G.number_of_edges(),
+        'generation_time': generation_time,
+        'total_time': total_time,
+        'dp_time': stats.get('dp', 0.0),
+        'construction_time': stats.get('construction', 0.0),
+        'probing_time': stats.get('probing', 0.0),
+        'attempts': stats.get('attempts'),
+        'success': Ga is not None,
+        'peak_memory_mb': peak_rss_mb() - base_rss,
+    })
+    if Ga is not None:
+        report = anonymity_report(Ga, case['k'], G)
+        result.update({key: report[key] for key in ('is_k_anonymous', 'edit_distance', 'degree_l1_cost')})
+    return result
+
+
+def build_cases(args):
+    cases = []
+    for graph, n, k, avg_degree, with_deletions, repeat in itertools.product(
+            args.graphs, args.sizes, args.ks, args.densities, args.deletions, range(args.repeat)):
+        if k > n:
+            continue
+        # domain_ip 图的密度由真实数据决定，只跑一次
+        if graph == 'domain_ip':
+            if avg_degree != args.densities[0]:
+                continue
+            avg_degree = None
+        cases.append({
+            'graph': graph, 'n': n, 'k': k, 'avg_degree': avg_degree, 'with_deletions': with_deletions,
+            'construction': args.construction, 'compact': args.compact, 'noise': args.noise,
+            'max_attempts': args.max_attempts, 'seed': args.seed + repeat,
+        })
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the kdegree anonymiser')
+    parser.add_argument('--graphs', nargs='+', default=list(GRAPH_GENERATORS), choices=list(GRAPH_GENERATORS))
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 10000])
+    parser.add_argument('--ks', nargs='+', type=int, default=[5, 10])
+    parser.add_argument('--densities', nargs='+', type=float, default=[4.0, 10.0], help='average degree')
+    parser.add_argument('--deletions', nargs='+', type=int, default=[0, 1], choices=[0, 1])
+    parser.add_argument('--construction', default='fast', choices=['priority', 'fast'])
+    parser.add_argument('--compact', action='store_true', help='run on CompactGraph')
+    parser.add_argument('--noise', type=int, default=10)
+    parser.add_argument('--max-attempts', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='kdegree_benchmark.json')
+    args = parser.parse_args()
+    args.deletions = [bool(d) for d in args.deletions]
+
+    results = []
+    for case in build_cases(args):
+        # 每个用例一个新进程，峰值内存互不影响
+        with multiprocessing.Pool(1, maxtasksperchild=1) as pool:
+            result = pool.apply(run_case, (case,))
+        results.append(result)
+        print("{graph:>9} n={n:<8} k={k:<3} d={avg_degree!s:<5} deletions={with_deletions!s:<5} "
+              "dp={dp_time:.3f}s construction={construction_time:.3f}s probing={probing_time:.3f}s "
+              "attempts={attempts} memory={peak_memory_mb:.1f}MB success={success}".format(**result))
+
+    FileUtil.write_to_file({'python': platform.python_version(), 'results': results}, args.output)
+    print("results written to", args.output)
+
+
+if __name__ == '__main__':
+    main()
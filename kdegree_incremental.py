@@ -0,0 +1,183 @@
+#  增量 k-度匿名：域名-IP 映射刷新后，只修复不再满足 k-匿名的度数组
+#  输入上一次的匿名图和变化（增加/删除的边和节点），尽量少地修改边
+
+import networkx as nx
+import numpy as np
+
+from kdegree import dp_degree_anonymiser, graph_anonymiser, probing, sort_dv
+
+
+# 在匿名图的副本上应用变化，删除不存在的边时忽略
+def apply_delta(Ga, added_edges=(), removed_edges=(), added_nodes=(), removed_nodes=()):
+    G = Ga.copy()
+    G.remove_nodes_from(removed_nodes)
+    G.remove_edges_from(removed_edges)
+    G.add_nodes_from(added_nodes)
+    G.add_edges_from(added_edges)
+    return G
+
+
+# 度数出现次数小于 k 的节点
+def violating_vertices(G, k):
+    nodes = list(G.nodes())
+    degrees = np.array([G.degree(v) for v in nodes], dtype=np.int64)
+    if np.size(degrees) == 0:
+        return []
+    counts = np.bincount(degrees)
+    return [nodes[i] for i in np.flatnonzero(counts[degrees] < k)]
+
+
+# 为违反 k-匿名的节点计算目标度数
+# 两种方案取代价小的：1. 每个节点并入最近的满足 k-匿名的已有度数组 2. 在这些节点之间运行 DP 重新分组
+def repair_targets(G, dirty, k, with_deletions=False, noise=0):
+    degrees = np.array([d for _, d in G.degree()], dtype=np.int64)
+    counts = np.bincount(degrees)
+    compliant = np.flatnonzero(counts >= k)
+    dirty = list(dirty)
+    current = {v: G.degree(v) for v in dirty}
+
+    # 方案 1：并入已有的度数组，只加边时只能向上并入
+    snap_targets = {}
+    for v in dirty:
+        d = current[v]
+        idx = np.searchsorted(compliant, d)
+        options = list(compliant[idx:idx + 1])
+        if with_deletions and idx > 0:
+            options.append(compliant[idx - 1])
+        if not options:
+            snap_targets = None
+            break
+        snap_targets[v] = min(options, key=lambda c: (abs(c - d), -c))
+
+    # 方案 2：节点不足 k 个时，从最高的度数组开始把整组节点拉进来一起重新分组
+    members = list(dirty)
+    for d in compliant[::-1]:
+        if len(members) >= k:
+            break
+        members.extend(v for v in G.nodes() if G.degree(v) == d)
+    dp_targets = None
+    if len(members) >= k:
+        dv = [(G.degree(v), v) for v in members]
+        sort_dv(dv)
+        if noise:
+            dv = probing(dv, noise)
+        degree_sequence, permutation = sort_dv(dv)
+        anonymised_sequence = dp_degree_anonymiser(degree_sequence, k, with_deletions=with_deletions)
+        dp_targets = {permutation[i]: int(anonymised_sequence[i]) for i in range(len(permutation))}
+
+    def cost(targets):
+        return sum(abs(d - G.degree(v)) for v, d in targets.items())
+
+    candidates = [t for t in (snap_targets, dp_targets) if t is not None]
+    if not candidates:
+        return None
+    return min(candidates, key=cost)
+
+
+# 在 G 上直接修改边，使 targets 中的节点达到目标度数
+# 先在需要加边的节点之间加边，再在需要删边的节点之间删边，最后用 (u,w)->(v,w) 的换边抵消一加一减
+# 返回 (added, removed, need)，need 为仍未满足的度数差
+def realise_degree_changes(G, targets):
+    need = {v: int(d) - G.degree(v) for v, d in targets.items() if int(d) != G.degree(v)}
+    added, removed = [], []
+
+    plus = sorted((v for v in need if need[v] > 0), key=lambda v: need[v], reverse=True)
+    for v in plus:
+        for u in plus:
+            if need[v] == 0:
+                break
+            if u != v and need[u] > 0 and not G.has_edge(u, v):
+                G.add_edge(v, u)
+                added.append((v, u))
+                need[v] -= 1
+                need[u] -= 1
+
+    minus = sorted((v for v in need if need[v] < 0), key=lambda v: need[v])
+    for v in minus:
+        for u in minus:
+            if need[v] == 0:
+                break
+            if u != v and need[u] < 0 and G.has_edge(u, v):
+                G.remove_edge(v, u)
+                removed.append((v, u))
+                need[v] += 1
+                need[u] += 1
+
+    for v in plus:
+        for u in minus:
+            if need[v] == 0:
+                break
+            if need[u] == 0:
+                continue
+            for w in list(G.adj[u]):
+                if need[v] == 0 or need[u] == 0:
+                    break
+                if w != v and not G.has_edge(v, w):
+                    G.remove_edge(u, w)
+                    G.add_edge(v, w)
+                    removed.append((u, w))
+                    added.append((v, w))
+                    need[v] -= 1
+                    need[u] += 1
+    return added, removed, {v: d for v, d in need.items() if d != 0}
+
+
+# 剩下的度数差只能通过和其他节点连边/删边满足，优先选择所在度数组有富余(>k)的节点，
+# 这些节点度数变化后不会破坏原来的组，如果破坏了新的组，下一轮会继续修复
+def settle_residual(G, need, k):
+    degrees = np.array([d for _, d in G.degree()], dtype=np.int64)
+    counts = np.bincount(degrees, minlength=len(G) + 2)
+
+    def spare(w, step):
+        d = G.degree(w)
+        return counts[d] > k and d + step >= 0 and counts[d + step] >= k
+
+    for v, d in need.items():
+        step = 1 if d > 0 else -1
+        pool = [w for w in G.nodes() if w != v and (G.has_edge(v, w) if step < 0 else not G.has_edge(v, w))]
+        pool.sort(key=lambda w: not spare(w, step))
+        for w in pool[:abs(d)]:
+            counts[G.degree(w)] -= 1
+            counts[G.degree(w) + step] += 1
+            if step > 0:
+                G.add_edge(v, w)
+            else:
+                G.remove_edge(v, w)
+
+
+# 增量匿名化：Ga 为上一次的匿名图，返回应用变化并修复后的 k-度匿名图
+# 每一轮只修复违反 k-匿名的度数组，多次失败后对整张图重新运行 graph_anonymiser
+def incremental_graph_anonymiser(Ga, k, added_edges=(), removed_edges=(), added_nodes=(), removed_nodes=(),
+                                 with_deletions=False, noise=1, max_attempts=20):
+    G = apply_delta(Ga, added_edges, removed_edges, added_nodes, removed_nodes)
+    for attempt in range(max_attempts):
+        dirty = violating_vertices(G, k)
+        if not dirty:
+            return G
+        print("Attempt number", attempt + 1, ":", len(dirty), "vertices in non k-anonymous degree groups")
+        targets = repair_targets(G, dirty, k, with_deletions=with_deletions, noise=noise if attempt else 0)
+        if targets is None:
+            break
+        added, removed, need = realise_degree_changes(G, targets)
+        if need:
+            settle_residual(G, need, k)
+
+    print("incremental repair failed, anonymising the whole graph")
+    # graph_anonymiser 需要 0..n-1 的节点编号
+    H = nx.convert_node_labels_to_integers(G, label_attribute='label')
+    Ha = graph_anonymiser(H, k, noise, with_deletions=with_deletions)
+    return nx.relabel_nodes(Ha, {v: H.nodes[v]['label'] for v in H.nodes()})
+
+
+if __name__ == '__main__':
+    from kdegree import generate_non_k_anonymous_graph, print_G
+
+    k = 3
+    G = generate_non_k_anonymous_graph(k=k)
+    Ga = graph_anonymiser(G, k, noise=10, with_deletions=True)
+    # 模拟一次 DNS 刷新：删掉几条边，加入一个新节点
+    removed_edges = list(Ga.edges())[:3]
+    Gb = incremental_graph_anonymiser(Ga, k, removed_edges=removed_edges, added_nodes=[len(Ga)],
+                                      added_edges=[(len(Ga), 0), (len(Ga), 1)], with_deletions=True)
+    print("增量匿名图：")
+    print_G(Gb)
@@ -0,0 +1,89 @@
+#  并行版本的 graph_anonymiser：多个进程同时进行 probing/priority 尝试
+#  每次尝试 attempt 使用独立的随机种子 seed + attempt，结果可以复现
+
+import itertools
+import multiprocessing
+import random as rn
+
+import networkx as nx
+
+from kdegree import CONSTRUCTION_ENGINES, anonymise_dv, new_graph, probing, sort_dv, is_degree_sequence_realised
+
+# 子进程共享的原始图和参数，由 _init_worker 设置，避免每个任务都重新传一次图
+_worker_state = {}
+
+
+def _init_worker(G, k, noise, with_deletions, construction, seed):
+    _worker_state.update(G=G, k=k, noise=noise, with_deletions=with_deletions,
+                         construction=construction, seed=seed)
+
+
+# 第 attempt 次尝试：attempt 次 probing 之后运行 DP 和图构造
+# 返回 (attempt, 边列表, 编辑代价)，构造失败时边列表为 None
+def _anonymisation_attempt(attempt):
+    G = _worker_state['G']
+    dv = [(d, v) for v, d in G.degree()]
+    sort_dv(dv)
+    for _ in range(attempt):
+        dv = probing(dv, _worker_state['noise'])
+        sort_dv(dv)
+    anonymised_sequence = anonymise_dv(dv, _worker_state['k'], with_deletions=_worker_state['with_deletions'])
+    if not nx.is_valid_degree_sequence_erdos_gallai(anonymised_sequence):
+        return attempt, None, None
+    construct = CONSTRUCTION_ENGINES[_worker_state['construction']]
+    Ga = construct(anonymised_sequence, G, rn.Random(_worker_state['seed'] + attempt))
+    if Ga is None:
+        return attempt, None, None
+    if not is_degree_sequence_realised(Ga, anonymised_sequence):
+        raise ValueError("graph construction '%s' did not realise the anonymised degree sequence"
+                         % _worker_state['construction'])
+    return attempt, list(Ga.edges()), edit_cost(G, Ga)
+
+
+# 编辑代价：原图和匿名图的边的对称差（添加的边 + 删除的边）
+def edit_cost(G, Ga):
+    added = sum(1 for u, v in Ga.edges() if not G.has_edge(u, v))
+    removed = sum(1 for u, v in G.edges() if not Ga.has_edge(u, v))
+    return added + removed
+
+
+# 并行匿名化：每轮在进程池中运行 attempts 次独立尝试
+# mode='first' 返回最先成功的图，mode='best' 返回这一轮里编辑代价最小的图（代价相同时取 attempt 小的）
+# 得到结果后立即终止进程池，剩余的尝试被取消；一轮全部失败时继续下一轮
+# max_attempts 限制总的尝试次数，和 graph_anonymiser 一样，全部失败时返回 None
+def parallel_graph_anonymiser(G, k, noise=10, with_deletions=False, construction='priority',
+                              attempts=None, processes=None, seed=0, mode='first', max_attempts=None):
+    if mode not in ('first', 'best'):
+        raise ValueError("mode must be 'first' or 'best', got %r" % mode)
+    processes = processes or multiprocessing.cpu_count()
+    attempts = attempts or processes
+    initargs = (G, k, noise, with_deletions, construction, seed)
+    with multiprocessing.Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        for first_attempt in itertools.count(0, attempts):
+            if max_attempts is not None and first_attempt >= max_attempts:
+                print("no realisable graph found in", max_attempts, "attempts")
+                return None
+            best = None
+            last_attempt = first_attempt + attempts
+            tasks = range(first_attempt, last_attempt if max_attempts is None else min(last_attempt, max_attempts))
+            for attempt, edges, cost in pool.imap_unordered(_anonymisation_attempt, tasks):
+                if edges is None:
+                    print("Attempt number", attempt + 1, "failed")
+                    continue
+                if best is None or (cost, attempt) < (best[2], best[0]):
+                    best = (attempt, edges, cost)
+                if mode == 'first':
+                    break
+            if best is not None:
+                print("Attempt number", best[0] + 1, "succeeded with edit cost", best[2])
+                # 离开 with 语句时 pool.terminate() 会终止仍在运行的尝试
+                return new_graph(G, G.number_of_nodes(), best[1])
+
+
+if __name__ == '__main__':
+    from kdegree import generate_non_k_anonymous_graph, print_G
+
+    G = generate_non_k_anonymous_graph(num_nodes=1000)
+    Ga = parallel_graph_anonymiser(G, k=5, noise=10, with_deletions=True, construction='fast', mode='best')
+    print("匿名图：")
+    print_G(Ga)
@@ -0,0 +1,80 @@
+#  k-度匿名结果的检查和报告，全部基于 numpy 向量化计算，可以在每次匿名化之后调用
+#  报告内容：最小度数组大小、违反 k-匿名的度数、相对原图的加边/删边数、度序列 L1 代价
+
+import numpy as np
+
+from compact_graph import CompactGraph, degree_array
+
+
+# 度数直方图：histogram[d] 为度数为 d 的节点个数，nodes 给出时只统计这些节点（按 0..n-1 编号）
+def degree_histogram(G, nodes=None):
+    if nodes is not None:
+        return np.bincount(degree_array(G)[np.asarray(nodes, dtype=np.int64)])
+    if isinstance(G, CompactGraph):
+        return np.bincount(G.degrees)
+    return np.bincount(np.fromiter((d for _, d in G.degree()), dtype=np.int64, count=G.number_of_nodes()))
+
+
+# 判断 G 是否满足 k-度匿名：每个出现过的度数至少有 k 个节点
+def is_k_anonymous(G, k):
+    histogram = degree_histogram(G)
+    return bool(np.all(histogram[histogram > 0] >= k))
+
+
+# 边键数组 u * n + v (u < v)，index 为节点标签到 0..n-1 的映射
+def edge_keys(G, index, n):
+    edges = np.array([(index[u], index[v]) for u, v in G.edges()], dtype=np.int64).reshape(-1, 2)
+    low = np.minimum(edges[:, 0], edges[:, 1])
+    high = np.maximum(edges[:, 0], edges[:, 1])
+    return np.unique(low * n + high)
+
+
+# 把 G 和 Ga 放到同一组节点编号上，返回两个图的边键数组和度数组
+def aligned_arrays(G, Ga):
+    if isinstance(G, CompactGraph) and isinstance(Ga, CompactGraph) and G.n == Ga.n \
+            and G.labels is None and Ga.labels is None:
+        return G.keys, Ga.keys, G.degrees, Ga.degrees
+    labels = list(G.nodes())
+    seen = set(labels)
+    labels.extend(v for v in Ga.nodes() if v not in seen)
+    index = {v: i for i, v in enumerate(labels)}
+    n = len(labels)
+    degrees = []
+    for H in (G, Ga):
+        d = np.zeros(n, dtype=np.int64)
+        d[[index[v] for v, _ in H.degree()]] = [x for _, x in H.degree()]
+        degrees.append(d)
+    return edge_keys(G, index, n), edge_keys(Ga, index, n), degrees[0], degrees[1]
+
+
+# 匿名图 Ga 的检查报告，给出原图 G 时同时计算编辑距离和度序列 L1 代价
+# G 和 Ga 需要使用相同的节点标签；nodes 给出时只检查这些节点的 k-匿名（例如二部图的域名一侧）
+def anonymity_report(Ga, k, G=None, nodes=None):
+    histogram = degree_histogram(Ga, nodes)
+    present = np.flatnonzero(histogram)
+    report = {
+        'k': k,
+        'nodes': Ga.number_of_nodes(),
+        'edges': Ga.number_of_edges(),
+        'min_group_size': int(histogram[present].min()) if np.size(present) else 0,
+        'violating_degrees': present[histogram[present] < k].tolist(),
+    }
+    report['is_k_anonymous'] = not report['violating_degrees']
+    if G is None:
+        return report
+
+    original, anonymised, original_degrees, anonymised_degrees = aligned_arrays(G, Ga)
+    common = np.size(np.intersect1d(original, anonymised, assume_unique=True))
+    report['edges_added'] = int(np.size(anonymised) - common)
+    report['edges_removed'] = int(np.size(original) - common)
+    report['edit_distance'] = report['edges_added'] + report['edges_removed']
+    report['degree_l1_cost'] = int(np.abs(anonymised_degrees - original_degrees).sum())
+    return report
+
+
+def print_report(report):
+    print("k =", report['k'], "k-anonymous:", report['is_k_anonymous'],
+          "min group size:", report['min_group_size'], "violating degrees:", report['violating_degrees'])
+    if 'edit_distance' in report:
+        print("edges added:", report['edges_added'], "edges removed:", report['edges_removed'],
+              "edit distance:", report['edit_distance'], "degree L1 cost:", report['degree_l1_cost'])
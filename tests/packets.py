@@ -0,0 +1,26 @@
+# 构造测试用的以太网帧（IPv4/IPv6 + TCP/UDP 头部），配合 util.pcap_reader.write_pcap 生成抓包文件
+import socket
+import struct
+
+TCP = 6
+UDP = 17
+
+
+def transport(protocol, src_port, dst_port, payload=b''):
+    if protocol == UDP:
+        return struct.pack('!HHHH', src_port, dst_port, 8 + len(payload), 0) + payload
+    return struct.pack('!HHIIBBHHH', src_port, dst_port, 0, 0, 0x50, 0x18, 65535, 0, 0) + payload
+
+
+def ethernet(src, dst, src_port=40000, dst_port=443, protocol=TCP, payload=b''):
+    """src/dst 为 IPv4 或 IPv6 地址字符串，返回完整的以太网帧"""
+    segment = transport(protocol, src_port, dst_port, payload)
+    if ':' in src:
+        ip = struct.pack('!IHBB', 6 << 28, len(segment), protocol, 64) + \
+            socket.inet_pton(socket.AF_INET6, src) + socket.inet_pton(socket.AF_INET6, dst)
+        ethertype = 0x86DD
+    else:
+        ip = struct.pack('!BBHHHBBH', 0x45, 0, 20 + len(segment), 0, 0, 64, protocol, 0) + \
+            socket.inet_aton(src) + socket.inet_aton(dst)
+        ethertype = 0x0800
+    return b'\x00\x11\x22\x33\x44\x55' + b'\x66\x77\x88\x99\xaa\xbb' + struct.pack('!H', ethertype) + ip + segment
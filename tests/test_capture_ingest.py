@@ -0,0 +1,40 @@
+from capture_ingest import cached_ips, ingest_captures
+from packets import ethernet
+from util.pcap_reader import write_pcap
+
+
+def dual_stack_capture(path):
+    write_pcap(str(path), [
+        (1.0, ethernet('192.168.1.2', '93.184.216.34')),
+        (1.1, ethernet('93.184.216.34', '192.168.1.2', 443, 40000)),
+        (1.2, ethernet('2001:db8::2', '2606:2800:220:1::248')),
+    ])
+    return str(path)
+
+
+def test_cache_entry_records_ipv6_flag(tmp_path):
+    pcap_file = dual_stack_capture(tmp_path / 'output_0.pcap')
+    manifest = {pcap_file: 'https://example.com'}
+    cache = {}
+
+    ipv4_only = ingest_captures(manifest, cache, processes=1, ipv6=False)
+    assert ipv4_only == {'https://example.com': ['192.168.1.2', '93.184.216.34']}
+    assert cache[pcap_file]['ipv6'] is False
+    assert cached_ips(cache, pcap_file, ipv6=True) is None
+
+    # 之前不含 IPv6 的缓存不能被 --ipv6 的运行复用
+    with_ipv6 = ingest_captures(manifest, cache, processes=1, ipv6=True)
+    assert with_ipv6['https://example.com'] == sorted(
+        ['192.168.1.2', '93.184.216.34', '2001:db8::2', '2606:2800:220:1::248'])
+    assert cache[pcap_file]['ipv6'] is True
+    assert cached_ips(cache, pcap_file, ipv6=True) == with_ipv6['https://example.com']
+    assert cached_ips(cache, pcap_file, ipv6=False) is None
+
+
+def test_entry_without_flag_counts_as_ipv4_only(tmp_path):
+    pcap_file = dual_stack_capture(tmp_path / 'output_0.pcap')
+    cache = {}
+    ingest_captures({pcap_file: 'https://example.com'}, cache, processes=1)
+    del cache[pcap_file]['ipv6']
+    assert cached_ips(cache, pcap_file) == ['192.168.1.2', '93.184.216.34']
+    assert cached_ips(cache, pcap_file, ipv6=True) is None
@@ -0,0 +1,45 @@
+from capture_orchestrator import FakeDriver, serve_fake_sites, split_capture, visit
+from packets import UDP, ethernet
+from util.pcap_reader import ip_header, iter_packets, transport_ports, write_pcap
+
+
+def test_fake_driver_ports_belong_to_one_visit(tmp_path):
+    server, urls = serve_fake_sites(str(tmp_path), pages=2, resources=3, delay=0)
+    try:
+        driver = FakeDriver()
+        first = visit(driver, urls[0], timeout=5, idle=0.05)
+        second = visit(driver, urls[1], timeout=5, idle=0.05)
+    finally:
+        server.shutdown()
+    # 每个页面一个连接加上三个资源各一个连接
+    assert len(first['ports']) == 4
+    assert len(second['ports']) == 4
+    assert not first['ports'] & second['ports']
+
+
+def test_split_capture_by_ports_and_time(tmp_path):
+    shared_file = str(tmp_path / 'shared.pcap')
+    write_pcap(shared_file, [
+        (10.0, ethernet('192.168.1.2', '93.184.216.34', 40000, 443)),
+        (10.1, ethernet('93.184.216.34', '192.168.1.2', 443, 40000)),
+        (10.2, ethernet('192.168.1.2', '151.101.1.69', 40100, 443)),
+        (10.3, ethernet('192.168.1.2', '8.8.8.8', 50000, 53, protocol=UDP)),
+        (10.4, ethernet('151.101.1.69', '192.168.1.2', 443, 40100)),
+        # 超出第一次访问的时间窗口（end + grace）
+        (13.0, ethernet('192.168.1.2', '93.184.216.34', 40000, 443)),
+    ])
+    visits = [
+        {'start': 9.9, 'end': 11.0, 'ports': {40000}, 'output_file': str(tmp_path / 'a.pcap')},
+        {'start': 10.1, 'end': 11.0, 'ports': {40100}, 'output_file': str(tmp_path / 'b.pcap')},
+    ]
+    assert split_capture(shared_file, visits, grace=1.0) == [2, 2]
+
+    def flows(pcap_file):
+        result = []
+        for timestamp, linktype, data in iter_packets(pcap_file):
+            header = ip_header(linktype, data)
+            result.append((round(timestamp, 3),) + tuple(transport_ports(data, header)))
+        return result
+
+    assert flows(visits[0]['output_file']) == [(10.0, 40000, 443), (10.1, 443, 40000)]
+    assert flows(visits[1]['output_file']) == [(10.2, 40100, 443), (10.4, 443, 40100)]
@@ -0,0 +1,49 @@
+import random
+
+import networkx as nx
+import pytest
+
+from compact_graph import CompactGraph, degree_array
+from kdegree import graph_anonymiser
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_compact_graph_matches_networkx(seed):
+    G = nx.gnp_random_graph(50, 0.1, seed=seed)
+    C = CompactGraph.from_networkx(G)
+    assert C.labels is None
+    assert (C.number_of_nodes(), C.number_of_edges()) == (G.number_of_nodes(), G.number_of_edges())
+    assert degree_array(C).tolist() == degree_array(G).tolist() == [d for _, d in C.degree()]
+    for v in G:
+        assert C.neighbors(v) == sorted(G.neighbors(v))
+    assert {frozenset(e) for e in C.edges()} == {frozenset(e) for e in G.edges()}
+
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(50), rng.randrange(50)) for _ in range(500)]
+    expected = [G.has_edge(u, v) for u, v in pairs]
+    assert [bool(C.has_edge(u, v)) for u, v in pairs] == expected
+    assert C.has_edges(*zip(*pairs)).tolist() == expected
+    assert nx.utils.edges_equal(C.to_networkx().edges(), G.edges())
+
+
+def test_compact_graph_normalises_edges():
+    # 自环去掉，(u, v) 和 (v, u) 合并成一条边，孤立点保留
+    C = CompactGraph(5, [(0, 1), (1, 0), (2, 2), (3, 1), (1, 3)])
+    assert C.edges() == [(0, 1), (1, 3)]
+    assert C.degrees.tolist() == [1, 2, 0, 1, 0]
+    assert not C.has_edge(2, 2) and C.has_edges([2], [2]).tolist() == [False]
+    assert CompactGraph(3).has_edges([0], [1]).tolist() == [False]
+
+
+def test_labels_survive_the_compact_anonymiser():
+    G = nx.relabel_nodes(nx.gnp_random_graph(30, 0.2, seed=3), lambda v: 'node-%d' % v)
+    C = CompactGraph.from_networkx(G)
+    assert C.labels == list(G.nodes())
+    assert set(C.to_networkx().nodes()) == set(G.nodes())
+
+    Ga = graph_anonymiser(G, 3, noise=5, construction='fast', seed=1, compact=True, max_attempts=200)
+    assert set(Ga.nodes()) == set(G.nodes())
+    Gc = graph_anonymiser(C, 3, noise=5, construction='fast', seed=1, max_attempts=200)
+    assert isinstance(Gc, CompactGraph) and Gc.labels == C.labels
+    # 同一个种子在 networkx 和 CompactGraph 上的结果相同
+    assert nx.utils.edges_equal(Gc.to_networkx().edges(), Ga.edges())
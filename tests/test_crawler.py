@@ -0,0 +1,105 @@
+import http.server
+import threading
+import zlib
+
+import pytest
+
+from util.crawl_scheduler import CrawlScheduler
+from util.crawler import Crawler, extract_domains, extract_domains_bs4, iter_domains
+from util.http_cache import HTTPCache
+
+PAGES = {
+    '/': ('text/html; charset=utf-8', b'<a href="/logo.png">x</a><a href="/big">y</a><script src="https://cdn.example/a.js">'
+                                      b'</script>'),
+    '/logo.png': ('image/png', b'\x89PNG' + b'\x00' * 100),
+    '/big': ('text/html', b'<a href="https://big.example/">' + b' ' * 10000),
+}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self):
+        content_type, body = PAGES[self.path]
+        if self.headers.get('If-None-Match') == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+            self.close_connection = True
+            return
+        self.send_response(200)
+        self.send_header('ETag', '"v1"')
+        self.send_header('Content-Type', content_type)
+        # /big 不给 Content-Length，只能边读边检查大小
+        if self.path != '/big':
+            self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+        self.close_connection = True
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def site():
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield 'http://127.0.0.1:%d' % server.server_address[1]
+    server.shutdown()
+    server.server_close()
+
+
+def test_crawler_skips_non_html_and_oversized_pages(site):
+    crawler = Crawler(concurrency=1, per_host_interval=0, max_bytes=1000)
+    assert crawler.get_domains_from_url(site + '/') == {'cdn.example'}
+    assert crawler.get(site + '/logo.png') is None
+    assert crawler.get(site + '/big') is None
+
+
+def test_skipped_pages_are_not_cached(site, tmp_path):
+    with HTTPCache(str(tmp_path / 'cache.db')) as cache:
+        crawler = Crawler(concurrency=1, per_host_interval=0, max_bytes=1000, cache=cache)
+        for path in ('/', '/logo.png', '/big'):
+            crawler.get(site + path)
+        assert cache.stats()['entries'] == 1
+        assert crawler.get(site + '/').content == PAGES['/'][1]
+        assert cache.hits == 1
+
+
+def test_scheduler_skips_failed_pages(site):
+    scheduler = CrawlScheduler(Crawler(concurrency=2, per_host_interval=0, max_bytes=1000), max_depth=1)
+    scheduler.add_seeds([site + '/'])
+    result = scheduler.run()
+    assert scheduler.pages == 3
+    assert result == {site.split('//')[1]: ['cdn.example']}
+
+
+@pytest.mark.parametrize('max_age', [86400, 0])
+def test_cached_body_is_decompressed_once_per_get(site, tmp_path, monkeypatch, max_age):
+    with HTTPCache(str(tmp_path / 'cache.db'), max_age=max_age) as cache:
+        crawler = Crawler(concurrency=1, per_host_interval=0, cache=cache)
+        crawler.get(site + '/')
+        calls = []
+        decompress = zlib.decompress
+        monkeypatch.setattr(zlib, 'decompress', lambda data: calls.append(data) or decompress(data))
+        # max_age=0 时缓存总是过期，走 ETag 条件请求，服务器回 304
+        assert crawler.get(site + '/').content == PAGES['/'][1]
+        assert len(calls) == 1
+        assert (cache.hits, cache.revalidated) == ((1, 0) if max_age else (0, 1))
+
+
+RAW_TEXT_PAGE = ('<title>t <a href="https://title.example/">x</a></title>'
+                 '<style>a{} .x{background:url(y)} <a href="https://style.example/"></style>'
+                 '<textarea><a href="https://textarea.example/"></textarea>'
+                 '<SCRIPT src="https://js.example/a.js">var s = "<a href=\'https://script.example/\'>";</script>'
+                 '<!-- <a href="https://comment.example/"> -->'
+                 '<a href="https://link.example/">link</a><img src="//img.example/i.png">')
+
+
+def test_links_inside_raw_text_elements_are_ignored():
+    assert extract_domains(RAW_TEXT_PAGE) == {'js.example', 'link.example', 'img.example'}
+    chunks = [RAW_TEXT_PAGE[i:i + 7] for i in range(0, len(RAW_TEXT_PAGE), 7)]
+    assert set(iter_domains(chunks)) == extract_domains(RAW_TEXT_PAGE)
+
+
+def test_style_body_matches_bs4():
+    page = '<style>a{}</style><style><a href="https://style.example/"></style><a href="https://link.example/">x</a>'
+    assert extract_domains(page, include_src=False) == extract_domains_bs4(page) == {'link.example'}
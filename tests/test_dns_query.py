@@ -0,0 +1,105 @@
+import os
+import socket
+import struct
+import sys
+import threading
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'domain_to_ip'))
+
+import dns_query  # noqa: E402
+from dns_query import MalformedResponse, QueryTimeout, ServerError  # noqa: E402
+
+
+def header(query_id=7, flags=0x8180, qdcount=0, ancount=0):
+    return struct.pack('!HHHHHH', query_id, flags, qdcount, ancount, 0, 0)
+
+
+# 按查询报文构造 A 记录响应，truncated 时只回头部和问题并设置 TC 标志
+def a_response(query, ips, truncated=False, query_id=None):
+    question_end = 12
+    while query[question_end]:
+        question_end += 1 + query[question_end]
+    question_end += 5
+    qtype = struct.unpack_from('!H', query, question_end - 4)[0]
+    if qtype != dns_query.TYPE_A:
+        ips = []
+    query_id = struct.unpack_from('!H', query)[0] if query_id is None else query_id
+    flags = 0x8180 | (dns_query.FLAG_TC if truncated else 0)
+    answers = b'' if truncated else b''.join(
+        b'\xc0\x0c' + struct.pack('!HHIH', 1, 1, 300, 4) + socket.inet_aton(ip) for ip in ips)
+    return header(query_id, flags, 1, 0 if truncated else len(ips)) + query[12:question_end] + answers
+
+
+@pytest.fixture
+def stub_server():
+    """本机 UDP + TCP DNS 服务：UDP 先回一个 ID 不对的响应，再回被截断的响应，TCP 回完整答案"""
+    ips = ['192.0.2.%d' % i for i in range(1, 41)]
+    udp = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    udp.bind(('127.0.0.1', 0))
+    port = udp.getsockname()[1]
+    tcp = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    tcp.bind(('127.0.0.1', port))
+    tcp.listen()
+
+    def serve_udp():
+        while True:
+            try:
+                query, address = udp.recvfrom(512)
+            except OSError:
+                return
+            query_id = struct.unpack_from('!H', query)[0]
+            udp.sendto(a_response(query, ips, query_id=query_id ^ 1), address)
+            udp.sendto(a_response(query, ips, truncated=True), address)
+
+    def serve_tcp():
+        while True:
+            try:
+                connection, _ = tcp.accept()
+            except OSError:
+                return
+            with connection:
+                length = struct.unpack('!H', connection.recv(2))[0]
+                response = a_response(connection.recv(length), ips)
+                connection.sendall(struct.pack('!H', len(response)) + response)
+
+    for target in (serve_udp, serve_tcp):
+        threading.Thread(target=target, daemon=True).start()
+    yield ('127.0.0.1', port), ips
+    udp.close()
+    tcp.close()
+
+
+def test_truncated_udp_response_is_retried_over_tcp(stub_server):
+    server, ips = stub_server
+    assert dns_query.query_addresses('example.com', server, timeout=2.0) == dict.fromkeys(ips, 300)
+
+
+def test_silent_server_raises_query_timeout():
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as silent:
+        silent.bind(('127.0.0.1', 0))
+        with pytest.raises(QueryTimeout):
+            dns_query.query_addresses('example.com', silent.getsockname(), timeout=0.2)
+
+
+@pytest.mark.parametrize('message', [
+    # 压缩指针指向自己
+    header(ancount=1) + b'\xc0\x0c',
+    # 标签长度超出报文
+    header(qdcount=1) + b'\x05ab',
+    # 压缩指针只有一个字节
+    header(qdcount=1) + b'\xc0',
+    # 记录数据超出报文
+    header(ancount=1) + b'\x00' + struct.pack('!HHIH', 1, 1, 300, 40) + b'abc',
+    header()[:6],
+])
+def test_malformed_responses(message):
+    with pytest.raises(MalformedResponse):
+        dns_query.parse_response(message, 7)
+
+
+def test_server_error_carries_rcode():
+    with pytest.raises(ServerError) as error:
+        dns_query.parse_response(header(flags=0x8182), 7)
+    assert error.value.rcode == 2
@@ -0,0 +1,61 @@
+import sys
+
+import pytest
+
+import domain_ip_graph
+from domain_ip_graph import DomainIPGraph, anonymise_mapping, site_members
+
+DOMAIN_MAP = {
+    'a.com': ['cdn.shared', 'img.a.com', 'b.com'],
+    'b.com': ['cdn.shared', 'static.b.com'],
+    'c.com': ['static.c.com'],
+}
+
+
+def test_site_members_policies():
+    sites, members, shared = site_members(DOMAIN_MAP, 'first')
+    assert sites == ['a.com', 'b.com', 'c.com']
+    # 主域名总是归它自己的网站，其他共用域名归第一个列出它的网站
+    assert members == [['a.com', 'cdn.shared', 'img.a.com'], ['b.com', 'static.b.com'], ['c.com', 'static.c.com']]
+    assert sorted(shared) == ['b.com', 'cdn.shared']
+
+    _, members, _ = site_members(DOMAIN_MAP, 'drop')
+    assert members == [['a.com', 'img.a.com'], ['b.com', 'static.b.com'], ['c.com', 'static.c.com']]
+
+    with pytest.raises(ValueError, match='2 domains belong to more than one site'):
+        site_members(DOMAIN_MAP, 'error')
+
+
+def test_site_level_graph_counts_each_domain_once():
+    domain_ip_map = {'cdn.shared': ['1.1.1.1'], 'b.com': ['2.2.2.2'], 'static.b.com': ['3.3.3.3']}
+    graph = DomainIPGraph.from_maps(domain_ip_map, DOMAIN_MAP, 'site', shared='first')
+    assert [sorted(graph.label(u) for u in graph.graph.neighbors(v)) for v in range(3)] == [
+        ['1.1.1.1'], ['2.2.2.2', '3.3.3.3'], []]
+    assert len(graph.shared_domains) == 2
+
+
+def test_main_reports_shared_domain_error(tmp_path, monkeypatch, capsys):
+    domain_ip_file = tmp_path / 'domain_ip_map.json'
+    domain_map_file = tmp_path / 'domain_map.json'
+    report_file = tmp_path / 'report.json'
+    domain_ip_file.write_text('{"cdn.shared": ["1.1.1.1"]}')
+    domain_map_file.write_text('{"a.com": ["cdn.shared"], "b.com": ["cdn.shared"]}')
+    monkeypatch.setattr(sys, 'argv', ['domain_ip_graph.py', '--level', 'site', '--shared-domains', 'error',
+                                      '--domain-ip-map', str(domain_ip_file), '--domain-map', str(domain_map_file),
+                                      '--report', str(report_file), '--changes', str(tmp_path / 'changes.ndjson')])
+    with pytest.raises(SystemExit) as exit_info:
+        domain_ip_graph.main()
+    assert exit_info.value.code == 1
+    assert 'belong to more than one site' in capsys.readouterr().out
+    assert 'belong to more than one site' in report_file.read_text()
+
+
+@pytest.mark.parametrize('shared', ['first', 'drop'])
+def test_site_level_anonymisation_with_shared_domains(shared):
+    domain_map = {'site%d.com' % i: ['cdn.shared', 'img%d.com' % i] for i in range(6)}
+    domain_ip_map = {'cdn.shared': ['10.0.0.1', '10.0.0.2']}
+    for i in range(6):
+        domain_ip_map['img%d.com' % i] = ['10.0.%d.%d' % (i, j) for j in range(10, 10 + i)]
+    changes, report = anonymise_mapping(domain_ip_map, 3, domain_map, 'site', seed=1, max_attempts=50, shared=shared)
+    assert changes is not None, report.get('error')
+    assert report['is_k_anonymous'] and report['shared_domains'] == 1
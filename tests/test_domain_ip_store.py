@@ -0,0 +1,24 @@
+from util.domain_ip_store import DomainIPStore
+
+
+def test_zero_ttl_mappings_survive_the_run_that_recorded_them(tmp_path):
+    with DomainIPStore(str(tmp_path / 'store.db'), min_ttl=60) as store:
+        store.upsert_map({'cdn.example': {'1.1.1.1': 0, '2.2.2.2': 3600}, 'plain.example': ['3.3.3.3']}, now=1000.0)
+        assert store.evict(now=1000.0) == 0
+        assert store.to_map(now=1000.0) == {'cdn.example': ['1.1.1.1', '2.2.2.2'], 'plain.example': ['3.3.3.3']}
+        assert [row[3] for row in store.history('cdn.example')] == [60, 3600]
+
+        # 过了 min_ttl 之后 TTL 0 的映射才过期，没有 TTL 的映射一直保留到 max_age
+        assert store.evict(now=1061.0) == 1
+        assert store.to_map(now=1061.0) == {'cdn.example': ['2.2.2.2'], 'plain.example': ['3.3.3.3']}
+        assert store.evict(now=1061.0, max_age=30) == 2
+        assert store.to_map(now=1061.0) == {}
+
+
+def test_upsert_refreshes_last_seen(tmp_path):
+    with DomainIPStore(str(tmp_path / 'store.db'), min_ttl=60) as store:
+        store.upsert('a.example', {'1.1.1.1': 0}, now=1000.0)
+        store.upsert('a.example', {'1.1.1.1': 0}, now=1050.0)
+        assert store.history('a.example') == [('1.1.1.1', 1000.0, 1050.0, 60)]
+        assert store.current_ips('a.example', now=1100.0) == ['1.1.1.1']
+        assert store.domains_for_ip('1.1.1.1', now=1111.0) == []
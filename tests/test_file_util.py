@@ -0,0 +1,106 @@
+import json
+
+import pytest
+
+from util.compact_map import CompactMap, is_compact_map
+from util.file_util import FileUtil
+
+DOCUMENT = {
+    'example.com': ['93.184.216.34', '2606:2800:220:1::248'],
+    'ratio': 1.25,
+    'negative': -3e-7,
+    'big': 12345678901234567890,
+    'exp': 6.02E+23,
+    'zero': 0,
+    'flags': [True, False, None],
+    'nested': {'a': [1, 2.5, {'b': 'c'}], 'empty': {}},
+    'escaped': 'quote " backslash \\ tab \t',
+    'unicode': '网站 é',
+    'last': 42,
+}
+
+
+def write_json(path, document, **options):
+    path.write_text(json.dumps(document, ensure_ascii=False, **options), encoding='utf-8')
+    return str(path)
+
+
+@pytest.mark.parametrize('options', [{}, {'indent': 4}, {'separators': (',', ':')}])
+def test_iter_json_items_every_chunk_size(tmp_path, options):
+    path = write_json(tmp_path / 'map.json', DOCUMENT, **options)
+    text = open(path, encoding='utf-8').read()
+    # 每个块大小都会把某个数字、字符串或字面量切开
+    for chunk_size in range(1, len(text) + 1):
+        assert dict(FileUtil.iter_json_items(path, chunk_size)) == json.loads(text), chunk_size
+
+
+@pytest.mark.parametrize('text', ['{}', ' { } ', '{"a": 1}', '{"a":1.5,"b":-2}'])
+def test_iter_json_items_small_documents(tmp_path, text):
+    path = tmp_path / 'map.json'
+    path.write_text(text)
+    for chunk_size in range(1, len(text) + 1):
+        assert dict(FileUtil.iter_json_items(str(path), chunk_size)) == json.loads(text)
+
+
+@pytest.mark.parametrize('text', ['{"a": 1', '{"a": 1.}', '{"a" 1}', '{"a": 1,}'])
+def test_iter_json_items_rejects_invalid_json(tmp_path, text):
+    path = tmp_path / 'map.json'
+    path.write_text(text)
+    for chunk_size in (1, 2, 1 << 16):
+        with pytest.raises(json.JSONDecodeError):
+            list(FileUtil.iter_json_items(str(path), chunk_size))
+
+
+def test_ndjson_writer_commits_atomically_and_resumes(tmp_path):
+    output = str(tmp_path / 'changes.ndjson')
+    with pytest.raises(RuntimeError):
+        with FileUtil.open_ndjson_writer(output) as writer:
+            writer.write_item('a.com', ['1.1.1.1'])
+            raise RuntimeError
+    # 出错时不替换输出文件，.part 保留已写的记录；模拟最后一行只写了一半
+    assert not (tmp_path / 'changes.ndjson').exists()
+    with open(output + '.part', 'a', encoding='utf-8') as part:
+        part.write('{"b.com": ["2.2')
+    assert list(FileUtil.iter_map_items(output + '.part')) == [('a.com', ['1.1.1.1'])]
+
+    with FileUtil.open_ndjson_writer(output, resume=True) as writer:
+        writer.write_item('b.com', ['2.2.2.2'])
+    assert list(FileUtil.iter_map_items(output)) == [('a.com', ['1.1.1.1']), ('b.com', ['2.2.2.2'])]
+    assert not (tmp_path / 'changes.ndjson.part').exists()
+
+
+MAPS = {
+    'ip': {'b.com': ['93.184.216.34', '2606:2800:220:1::248'], 'a.com': ['10.0.0.1', '93.184.216.34'], 'c.com': []},
+    # 非规范写法的 IP 不能打包，整张表按字符串保存
+    'string': {'site.com': ['cdn.site.com', 'ads.example'], 'x.org': ['::FFFF:1.2.3.4'], '网站.cn': ['cdn.site.com']},
+    'empty': {},
+}
+
+
+@pytest.mark.parametrize('name', sorted(MAPS))
+def test_compact_map_round_trip(tmp_path, name):
+    source = MAPS[name]
+    json_file = write_json(tmp_path / 'map.json', source)
+    output = FileUtil.convert_to_compact(json_file)
+    assert output.endswith('.cmap') and is_compact_map(output)
+
+    compact = FileUtil.read_map(output)
+    assert isinstance(compact, CompactMap)
+    assert compact.to_dict() == source
+    assert list(compact) == list(source)
+    assert len(compact) == len(source)
+    for key, values in source.items():
+        assert key in compact and compact[key] == values
+    assert 'missing.com' not in compact and compact.index('missing.com') == -1
+    assert list(FileUtil.iter_map_items(output)) == list(source.items())
+
+
+@pytest.mark.parametrize('suffix', ['.json', '.txt'])
+def test_iter_map_items_matches_read_map(tmp_path, suffix):
+    source = MAPS['ip']
+    path = str(tmp_path / ('map' + suffix))
+    if suffix == '.txt':
+        FileUtil.write_kv_txt(source, path)
+    else:
+        write_json(tmp_path / ('map' + suffix), source)
+    assert dict(FileUtil.iter_map_items(path)) == dict(FileUtil.read_map(path)) == source
@@ -0,0 +1,54 @@
+import numpy as np
+
+from packets import ethernet
+from util.flow_stats import FlowTable, flow_stats
+from util.pcap_reader import write_pcap
+
+
+def exchange(local, remote, local_port, remote_port, count, start):
+    packets = []
+    for i in range(count):
+        packets.append((start + i * 0.01, ethernet(local, remote, local_port, remote_port)))
+        packets.append((start + i * 0.01 + 0.005, ethernet(remote, local, remote_port, local_port)))
+    return packets
+
+
+def test_local_addresses_detected_per_family(tmp_path):
+    # IPv4 走 NAT（私有地址），IPv6 是公网地址（不会被 is_reserved 当成本机），IPv6 的包只占一小部分
+    packets = exchange('192.168.1.2', '93.184.216.34', 40000, 443, 40, 0.0)
+    packets += exchange('2a01:4f8::2', '2606:2800:220:1::248', 40001, 443, 3, 1.0)
+    packets += exchange('2a01:4f8::2', '2a00:1450:4001::200e', 40002, 443, 2, 2.0)
+    pcap_file = str(tmp_path / 'dual.pcap')
+    write_pcap(pcap_file, packets)
+
+    table = flow_stats(pcap_file)
+    rows = dict(zip(table.remote_ips(), zip(table['local_port'].tolist(), table['packets_out'].tolist(),
+                                            table['packets_in'].tolist())))
+    assert rows == {
+        '93.184.216.34': (40000, 40, 40),
+        '2606:2800:220:1::248': (40001, 3, 3),
+        '2a00:1450:4001::200e': (40002, 2, 2),
+    }
+
+
+def test_single_remote_peer_is_not_taken_as_local(tmp_path):
+    # 本机是公网 IPv4 地址，只和一个对端通信时按服务端口区分两端
+    pcap_file = str(tmp_path / 'single.pcap')
+    write_pcap(pcap_file, exchange('85.214.132.117', '93.184.216.34', 51000, 443, 5, 0.0))
+
+    table = flow_stats(pcap_file)
+    assert table.remote_ips() == ['93.184.216.34']
+    assert table['remote_port'].tolist() == [443]
+    assert table['local_port'].tolist() == [51000]
+
+
+def test_remote_ip_column_is_packed(tmp_path):
+    table = FlowTable(['a'], {
+        'capture': [0, 0], 'remote_ip': ['10.0.0.0', '2001:db8::'], 'remote_port': [443, 443], 'local_port': [1, 2],
+        'protocol': [6, 6], 'packets_out': [1, 1], 'packets_in': [1, 1], 'bytes_out': [1, 1], 'bytes_in': [1, 1],
+        'first_seen': [0.0, 0.0], 'last_seen': [0.0, 0.0],
+    })
+    assert table['remote_ip'].dtype == np.dtype('V16')
+    output_file = str(tmp_path / 'flows.npz')
+    table.save(output_file)
+    assert FlowTable.load(output_file).remote_ips() == ['10.0.0.0', '2001:db8::']
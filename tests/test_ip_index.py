@@ -0,0 +1,41 @@
+import pytest
+
+from util.ip_index import IPIndex
+
+DOMAIN_IP_MAP = {
+    'a.com': ['111.62.75.1', '111.62.75.2', '2408:4001:f10::1'],
+    'b.com': ['111.62.75.2', '8.8.8.8'],
+    'c.com': ['2408:4001:f10::1', '2408:4001:f11::1'],
+}
+
+
+@pytest.fixture(params=['built', 'loaded'])
+def index(request, tmp_path):
+    index = IPIndex.build(DOMAIN_IP_MAP)
+    if request.param == 'loaded':
+        index.save(str(tmp_path / 'index.npz'))
+        index = IPIndex.load(str(tmp_path / 'index.npz'))
+    return index
+
+
+def test_lookup_matches_the_map(index):
+    expected = {}
+    for domain, ips in DOMAIN_IP_MAP.items():
+        for ip in ips:
+            expected.setdefault(ip, []).append(domain)
+    for ip, domains in expected.items():
+        assert sorted(index.lookup(ip)) == domains
+    # 非规范写法的 IPv6 打包之后和索引里的一样
+    assert sorted(index.lookup('2408:4001:0f10:0:0:0:0:1')) == ['a.com', 'c.com']
+    assert index.lookup('1.2.3.4') == () and index.lookup('::1') == ()
+    with pytest.raises(ValueError):
+        index.lookup('not-an-ip')
+
+
+def test_lookup_many_and_networks(index):
+    rows = index.lookup_many(['8.8.8.8', '1.2.3.4', '111.62.75.2'])
+    assert [sorted(index.domains_of(i)) for i in rows.tolist()] == [['b.com'], [], ['a.com', 'b.com']]
+    assert index.domains_in_network('111.62.75.0/24') == ['a.com', 'b.com']
+    assert index.domains_in_network('2408:4001:f10::/48') == ['a.com', 'c.com']
+    assert index.domains_in_network('2408:4001:f10::/40') == ['a.com', 'c.com']
+    assert index.lookup_network('10.0.0.0/8') == {}
@@ -0,0 +1,150 @@
+import random
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from compact_graph import CompactGraph, degree_array
+from kdegree import (CONSTRUCTION_ENGINES, anonymisation_cost_precomputation, anonymise_dv,
+                     assignment_cost_additions_deletions, assignment_cost_additions_only, dp_degree_anonymiser,
+                     graph_anonymiser, median)
+from kdegree_verify import is_k_anonymous
+
+
+def random_sequence(rng, n, max_degree=20):
+    return np.array(sorted((rng.randint(0, max_degree) for _ in range(n)), reverse=True))
+
+
+def group_cost(ds, i, j, with_deletions):
+    segment = ds[i:j + 1]
+    if with_deletions:
+        return assignment_cost_additions_deletions(segment)
+    return assignment_cost_additions_only(segment)
+
+
+def group_degree(ds, i, j, with_deletions):
+    return median(ds[i:j + 1]) if with_deletions else ds[i]
+
+
+def optimal_cost(ds, k, with_deletions):
+    """不限制组大小上限，O(n^2) 枚举最后一组的所有划分，得到真正的最优代价"""
+    n = len(ds)
+    best = [0] + [np.inf] * n
+    for m in range(k, n + 1):
+        best[m] = min(best[t] + group_cost(ds, t, m - 1, with_deletions) for t in range(0, m - k + 1))
+    return best[n]
+
+
+def reference_sequence(ds, k, with_deletions):
+    """原来递归版本的逐条移植（组大小 k..2k-1，第一个最小值，整体一组不更差时取整体），代价按组精确计算"""
+    n = len(ds)
+    cost = {}
+    sequence = {}
+    for m in range(1, n + 1):
+        all_in_one = group_cost(ds, 0, m - 1, with_deletions) if k <= m <= 2 * k else np.inf
+        all_in_one_sequence = [group_degree(ds, 0, m - 1, with_deletions)] * m
+        if m < 2 * k:
+            cost[m], sequence[m] = all_in_one, all_in_one_sequence
+            continue
+        min_cost, min_sequence = np.inf, None
+        for t in range(max(k - 1, m - 2 * k), m - k):
+            candidate = cost[t + 1] + group_cost(ds, t + 1, m - 1, with_deletions)
+            if candidate < min_cost:
+                min_cost = candidate
+                min_sequence = sequence[t + 1] + [group_degree(ds, t + 1, m - 1, with_deletions)] * (m - t - 1)
+        if min_cost < all_in_one:
+            cost[m], sequence[m] = min_cost, min_sequence
+        else:
+            cost[m], sequence[m] = all_in_one, all_in_one_sequence
+    return cost[n], sequence[n]
+
+
+def sequence_cost(ds, anonymised, with_deletions):
+    difference = np.asarray(anonymised) - ds
+    return np.abs(difference).sum() if with_deletions else difference.sum()
+
+
+@pytest.mark.parametrize('with_deletions', [False, True])
+def test_dp_degree_anonymiser_matches_reference(with_deletions):
+    rng = random.Random(2)
+    for _ in range(300):
+        k = rng.randint(1, 6)
+        ds = random_sequence(rng, rng.randint(k, 40))
+        anonymised = dp_degree_anonymiser(ds, k, with_deletions)
+        expected_cost, expected_sequence = reference_sequence(ds, k, with_deletions)
+        assert anonymised.tolist() == expected_sequence, (ds.tolist(), k)
+        assert sequence_cost(ds, anonymised, with_deletions) == expected_cost == optimal_cost(ds, k, with_deletions)
+        # 每个度数值至少出现 k 次
+        assert min(np.unique(anonymised, return_counts=True)[1]) >= k
+        if not with_deletions:
+            assert np.all(anonymised >= ds)
+
+
+def test_dp_degree_anonymiser_short_sequences():
+    # n < k 时只能整体一组
+    assert dp_degree_anonymiser(np.array([5, 3, 1]), 4).tolist() == [5, 5, 5]
+    assert dp_degree_anonymiser(np.array([5, 3, 1]), 4, with_deletions=True).tolist() == [3, 3, 3]
+    assert dp_degree_anonymiser(np.array([7]), 1).tolist() == [7]
+
+
+@pytest.mark.parametrize('with_deletions', [False, True])
+def test_banded_cost_matrix_matches_direct_costs(with_deletions):
+    rng = random.Random(1)
+    for _ in range(50):
+        k = rng.randint(1, 5)
+        ds = random_sequence(rng, rng.randint(1, 25))
+        n = len(ds)
+        C = anonymisation_cost_precomputation(ds, k, with_deletions)
+        for i in range(n):
+            for j in range(n):
+                # DP 只读 j in [i+k-1, i+2k) 这一条带，带外为 inf
+                expected = group_cost(ds, i, j, with_deletions) if i + k - 1 <= j < min(i + 2 * k, n) else np.inf
+                assert C[i, j] == expected, (ds.tolist(), k, i, j)
+        i, j = np.meshgrid(np.arange(n), np.arange(n), indexing='ij')
+        assert np.array_equal(C[i, j], np.array([[C[a, b] for b in range(n)] for a in range(n)]))
+
+
+def random_graphs(count, compact=False):
+    for seed in range(count):
+        rng = random.Random(seed)
+        G = nx.gnp_random_graph(rng.randint(10, 60), rng.uniform(0.05, 0.3), seed=seed)
+        yield rng, CompactGraph.from_networkx(G) if compact else G
+
+
+def edge_set(G):
+    return {tuple(sorted(e)) for e in G.edges()}
+
+
+@pytest.mark.parametrize('construction', sorted(CONSTRUCTION_ENGINES))
+@pytest.mark.parametrize('compact', [False, True])
+def test_construction_reproduces_the_original_graph(construction, compact):
+    # 目标度数就是原图度数时，只连原图的边就能实现，两种构造方法都应该原样重建原图
+    construct = CONSTRUCTION_ENGINES[construction]
+    for rng, G in random_graphs(30, compact):
+        Ga = construct(degree_array(G).tolist(), G, rng)
+        assert edge_set(Ga) == edge_set(G)
+        assert type(Ga) is type(G)
+
+
+@pytest.mark.parametrize('construction', sorted(CONSTRUCTION_ENGINES))
+@pytest.mark.parametrize('compact', [False, True])
+def test_construction_realises_anonymised_sequences(construction, compact):
+    construct = CONSTRUCTION_ENGINES[construction]
+    realised = 0
+    for rng, G in random_graphs(60, compact):
+        target = anonymise_dv([(d, v) for v, d in G.degree()], rng.randint(2, 5))
+        Ga = construct(target, G, rng)
+        if Ga is None:
+            continue
+        realised += 1
+        assert degree_array(Ga).tolist() == list(target)
+        assert all(u != v for u, v in Ga.edges())
+    # 奇数度数和的序列不可实现，其他大部分都能构造出来
+    assert realised >= 20
+
+
+@pytest.mark.parametrize('construction', sorted(CONSTRUCTION_ENGINES))
+def test_graph_anonymiser_engines(construction):
+    for seed, (_, G) in enumerate(random_graphs(10)):
+        Ga = graph_anonymiser(G, 3, noise=5, construction=construction, seed=seed, max_attempts=200)
+        assert Ga is not None and is_k_anonymous(Ga, 3)
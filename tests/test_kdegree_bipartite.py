@@ -0,0 +1,62 @@
+import itertools
+import random
+
+import numpy as np
+import pytest
+
+from compact_graph import CompactGraph, degree_array
+from kdegree import bipartite_graph_anonymiser, is_bigraphic
+from kdegree_verify import anonymity_report
+
+
+def realisable_degrees(n_left, n_right):
+    """枚举所有 n_left x n_right 的简单二部图，返回能实现的 (左侧度数, 右侧度数) 集合"""
+    pairs = list(itertools.product(range(n_left), range(n_right)))
+    result = set()
+    for mask in range(1 << len(pairs)):
+        left = [0] * n_left
+        right = [0] * n_right
+        for bit, (u, v) in enumerate(pairs):
+            if mask >> bit & 1:
+                left[u] += 1
+                right[v] += 1
+        result.add((tuple(left), tuple(right)))
+    return result
+
+
+@pytest.mark.parametrize('n_left, n_right', [(1, 3), (2, 2), (2, 3), (3, 3), (3, 2), (4, 2)])
+def test_is_bigraphic_matches_brute_force(n_left, n_right):
+    realisable = realisable_degrees(n_left, n_right)
+    for left in itertools.product(range(n_right + 2), repeat=n_left):
+        for right in itertools.product(range(n_left + 2), repeat=n_right):
+            assert is_bigraphic(left, right) == ((left, right) in realisable), (left, right)
+            # exact=False 时 right 是容量：存在右侧度数都不超过容量的实现
+            expected = any(l == left and all(d <= c for d, c in zip(r, right)) for l, r in realisable)
+            assert is_bigraphic(left, right, exact=False) == expected, (left, right)
+    assert not is_bigraphic([-1], [0]) and is_bigraphic([], [])
+
+
+def random_bipartite(seed, n_left=40, n_right=60):
+    rng = random.Random(seed)
+    edges = [(v, n_left + rng.randrange(n_right)) for v in range(n_left) for _ in range(rng.randint(1, 5))]
+    return CompactGraph(n_left + n_right, edges), n_left
+
+
+@pytest.mark.parametrize('with_deletions', [False, True])
+@pytest.mark.parametrize('capacity', [None, 6])
+def test_bipartite_anonymiser_only_edits_left_right_edges(with_deletions, capacity):
+    k = 4
+    for seed in range(8):
+        G, n_left = random_bipartite(seed)
+        Ga = bipartite_graph_anonymiser(G, n_left, k, noise=5, with_deletions=with_deletions, seed=seed,
+                                        capacity=capacity, max_attempts=100)
+        assert Ga is not None
+        assert anonymity_report(Ga, k, G, range(n_left))['is_k_anonymous']
+        edges = Ga.edge_array()
+        assert np.all((edges[:, 0] < n_left) & (edges[:, 1] >= n_left))
+        # 右侧点的度数不超过容量（原来就超过的不再增加）
+        limit = np.maximum(n_left if capacity is None else capacity, degree_array(G)[n_left:])
+        assert np.all(degree_array(Ga)[n_left:] <= limit)
+        if not with_deletions:
+            # 只加边时原来的 域名-IP 边全部保留
+            assert np.all(Ga.has_edges(*G.edge_array().T))
@@ -0,0 +1,60 @@
+import random
+
+import networkx as nx
+import pytest
+
+from kdegree import graph_anonymiser
+from kdegree_incremental import apply_delta, incremental_graph_anonymiser, violating_vertices
+from kdegree_verify import is_k_anonymous
+
+
+def anonymised_graph(seed, k):
+    G = nx.gnp_random_graph(40, 0.15, seed=seed)
+    return graph_anonymiser(G, k, noise=5, with_deletions=True, seed=seed, max_attempts=200)
+
+
+def random_delta(rng, Ga):
+    n = len(Ga)
+    removed = rng.sample(sorted(Ga.edges()), 3)
+    added = [(n, rng.randrange(n)), (n, rng.randrange(n))]
+    while True:
+        u, v = rng.sample(range(n), 2)
+        if not Ga.has_edge(u, v):
+            added.append((u, v))
+            break
+    return added, removed
+
+
+def test_violating_vertices():
+    G = nx.path_graph(4)
+    # 度数 1 的节点有 0 和 3，度数 2 的有 1 和 2
+    assert violating_vertices(G, 2) == []
+    G.add_edge(0, 2)
+    # 度数变成 [2, 2, 3, 1]
+    assert sorted(violating_vertices(G, 2)) == [2, 3]
+
+
+def test_unaffected_delta_is_applied_as_is():
+    Ga = nx.cycle_graph(6)
+    # 交换两条边的端点，度数全都不变，不需要修复
+    added, removed = [(0, 3), (1, 4)], [(0, 1), (3, 4)]
+    Gb = incremental_graph_anonymiser(Ga, 3, added_edges=added, removed_edges=removed)
+    assert nx.utils.edges_equal(Gb.edges(), apply_delta(Ga, added, removed).edges())
+    assert nx.utils.edges_equal(Ga.edges(), nx.cycle_graph(6).edges())
+
+
+@pytest.mark.parametrize('with_deletions', [False, True])
+def test_incremental_repair_is_k_anonymous(with_deletions):
+    k = 3
+    for seed in range(10):
+        rng = random.Random(seed)
+        Ga = anonymised_graph(seed, k)
+        assert is_k_anonymous(Ga, k)
+        added, removed = random_delta(rng, Ga)
+        Gb = incremental_graph_anonymiser(Ga, k, added_edges=added, removed_edges=removed, added_nodes=[len(Ga)],
+                                          with_deletions=with_deletions)
+        assert is_k_anonymous(Gb, k)
+        assert set(Gb.nodes()) == set(Ga.nodes()) | {len(Ga)}
+        # 修复只改动少量边，比整图重新匿名化的改动小得多
+        changed = set(map(frozenset, Gb.edges())) ^ set(map(frozenset, apply_delta(Ga, added, removed).edges()))
+        assert len(changed) < Ga.number_of_edges() // 2
@@ -0,0 +1,180 @@
+import bisect
+import collections.abc
+import mmap
+import socket
+import struct
+
+import numpy as np
+
+# 文件格式（小端，每段按 8 字节对齐）:
+#   头部: 魔数 b'CMAP', 版本, 值类型(0 字符串 / 1 IP), 键数, 值引用数, 值表大小 x2, 然后是各段的 (偏移, 字节数)
+#   key_offsets/key_blob   键字符串表（按原始顺序），key_order 为按键排序后的下标，用于二分查找
+#   value_offsets          每个键的值在 refs 里的起止位置
+#   refs                   值引用：字符串模式下是值字符串表下标；IP 模式下 >=0 为 IPv4 表下标，<0 为 IPv6 表下标 -ref-1
+#   string_offsets/blob    值字符串表（字符串模式，去重）
+#   v4 / v6                去重后的 IPv4（4 字节）/ IPv6（16 字节）地址，网络字节序
+MAGIC = b'CMAP'
+VERSION = 1
+VALUES_STR = 0
+VALUES_IP = 1
+SECTIONS = ('key_offsets', 'key_blob', 'key_order', 'value_offsets', 'refs', 'string_offsets', 'string_blob', 'v4', 'v6')
+HEADER = struct.Struct('<4sIIqqqq' + 'qq' * len(SECTIONS))
+DTYPES = {
+    'key_offsets': np.int64, 'key_blob': np.uint8, 'key_order': np.int32, 'value_offsets': np.int64,
+    'refs': np.int32, 'string_offsets': np.int64, 'string_blob': np.uint8, 'v4': np.uint8, 'v6': np.uint8,
+}
+
+
+def _canonical_ip(value):
+    """值是 IP 且文本形式是规范写法时返回打包后的字节，否则返回 None（保证转换无损）"""
+    family = socket.AF_INET6 if ':' in value else socket.AF_INET
+    try:
+        packed = socket.inet_pton(family, value)
+    except (OSError, TypeError):
+        return None
+    return packed if socket.inet_ntop(family, packed) == value else None
+
+
+def _string_table(strings):
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b''.join(encoded), dtype=np.uint8)
+
+
+def write_compact_map(kv_pairs, output_file):
+    """把 {键: 值列表} 写成紧凑二进制格式；所有值都是规范写法的 IP 时按 IP 打包，否则按字符串去重"""
+    keys = list(kv_pairs)
+    lists = [list(kv_pairs[key]) for key in keys]
+    packed = [[_canonical_ip(value) if isinstance(value, str) else None for value in values] for values in lists]
+    ip_mode = all(p is not None for values in packed for p in values)
+
+    key_offsets, key_blob = _string_table(keys)
+    key_order = np.array(sorted(range(len(keys)), key=keys.__getitem__), dtype=np.int32)
+    value_offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+    np.cumsum([len(values) for values in lists], out=value_offsets[1:])
+
+    interned = {}
+    refs = []
+    if ip_mode:
+        v4, v6 = {}, {}
+        for values in packed:
+            for address in values:
+                table = v4 if len(address) == 4 else v6
+                index = table.setdefault(address, len(table))
+                refs.append(index if table is v4 else -index - 1)
+        sections = {
+            'string_offsets': np.zeros(1, dtype=np.int64), 'string_blob': np.zeros(0, dtype=np.uint8),
+            'v4': np.frombuffer(b''.join(v4), dtype=np.uint8), 'v6': np.frombuffer(b''.join(v6), dtype=np.uint8),
+        }
+        sizes = (len(v4), len(v6))
+    else:
+        for values in lists:
+            for value in values:
+                refs.append(interned.setdefault(value, len(interned)))
+        string_offsets, string_blob = _string_table(list(interned))
+        sections = {
+            'string_offsets': string_offsets, 'string_blob': string_blob,
+            'v4': np.zeros(0, dtype=np.uint8), 'v6': np.zeros(0, dtype=np.uint8),
+        }
+        sizes = (len(interned), 0)
+    sections.update(key_offsets=key_offsets, key_blob=key_blob, key_order=key_order, value_offsets=value_offsets,
+                    refs=np.array(refs, dtype=np.int32))
+
+    layout = []
+    offset = HEADER.size
+    for name in SECTIONS:
+        offset = (offset + 7) & ~7
+        data = np.ascontiguousarray(sections[name], dtype=DTYPES[name]).astype('<' + np.dtype(DTYPES[name]).str[1:])
+        layout.append((name, offset, data))
+        offset += data.nbytes
+    with open(output_file, 'wb') as file:
+        file.write(HEADER.pack(MAGIC, VERSION, VALUES_IP if ip_mode else VALUES_STR, len(keys), len(refs), *sizes,
+                               *[v for _, offset, data in layout for v in (offset, data.nbytes)]))
+        for _, offset, data in layout:
+            file.write(b'\0' * (offset - file.tell()))
+            file.write(data.tobytes())
+
+
+def is_compact_map(path):
+    with open(path, 'rb') as file:
+        return file.read(4) == MAGIC
+
+
+class _SortedKeys(collections.abc.Sequence):
+    # 按排序后的顺序访问键，bisect 只解码 O(log n) 个键
+    def __init__(self, compact):
+        self.compact = compact
+
+    def __len__(self):
+        return len(self.compact.key_order)
+
+    def __getitem__(self, i):
+        return self.compact.key(int(self.compact.key_order[i]))
+
+
+class CompactMap(collections.abc.Mapping):
+    """只读的 {键: 值列表}，数据通过 mmap 直接映射成 numpy 数组，打开文件不解析内容，按需解码
+
+    可以直接替代 JSON 读出来的 dict 传给 WebsiteIdentifier、IPIndex.build 等。
+    """
+
+    def __init__(self, path):
+        with open(path, 'rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        header = HEADER.unpack_from(self._mmap, 0)
+        magic, version, self.value_type, self.n_keys, self.n_refs = header[:5]
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a compact map file")
+        positions = header[7:]
+        for i, name in enumerate(SECTIONS):
+            offset, nbytes = positions[2 * i], positions[2 * i + 1]
+            dtype = np.dtype(DTYPES[name]).newbyteorder('<')
+            setattr(self, name, np.frombuffer(self._mmap, dtype=dtype, count=nbytes // dtype.itemsize, offset=offset))
+        self.v6 = self.v6.reshape(-1, 16)
+        self.v4 = self.v4.reshape(-1, 4)
+        self._sorted_keys = _SortedKeys(self)
+
+    def key(self, i):
+        return self.key_blob[self.key_offsets[i]:self.key_offsets[i + 1]].tobytes().decode('utf-8')
+
+    def index(self, key):
+        """键的下标，不存在返回 -1"""
+        i = bisect.bisect_left(self._sorted_keys, key)
+        if i < self.n_keys and self._sorted_keys[i] == key:
+            return int(self.key_order[i])
+        return -1
+
+    def refs_of(self, i):
+        """第 i 个键的值引用（numpy 视图，不复制）"""
+        return self.refs[self.value_offsets[i]:self.value_offsets[i + 1]]
+
+    def value(self, ref):
+        if self.value_type == VALUES_IP:
+            if ref >= 0:
+                return socket.inet_ntop(socket.AF_INET, self.v4[ref].tobytes())
+            return socket.inet_ntop(socket.AF_INET6, self.v6[-ref - 1].tobytes())
+        return self.string_blob[self.string_offsets[ref]:self.string_offsets[ref + 1]].tobytes().decode('utf-8')
+
+    def __getitem__(self, key):
+        i = self.index(key)
+        if i < 0:
+            raise KeyError(key)
+        return [self.value(ref) for ref in self.refs_of(i).tolist()]
+
+    def __contains__(self, key):
+        return self.index(key) >= 0
+
+    def __iter__(self):
+        for i in range(self.n_keys):
+            yield self.key(i)
+
+    def __len__(self):
+        return self.n_keys
+
+    def items(self):
+        for i in range(self.n_keys):
+            yield self.key(i), [self.value(ref) for ref in self.refs_of(i).tolist()]
+
+    def to_dict(self):
+        return dict(self.items())
@@ -0,0 +1,178 @@
+import base64
+import concurrent.futures
+import hashlib
+import heapq
+import math
+import os
+import urllib.parse
+
+from util.crawler import Crawler, extract_domains, scan_links
+from util.file_util import FileUtil
+
+# 常见的二级后缀，注册域名要多取一级，例如 news.sina.com.cn -> sina.com.cn
+SECOND_LEVEL_SUFFIXES = {
+    'com.cn', 'net.cn', 'org.cn', 'gov.cn', 'edu.cn', 'ac.cn',
+    'com.hk', 'com.tw', 'co.uk', 'org.uk', 'ac.uk', 'co.jp', 'ne.jp', 'or.jp', 'co.kr', 'com.au', 'net.au',
+    'com.sg', 'com.br',
+}
+
+
+def registrable_domain(host):
+    """主机名对应的注册域名（近似的公共后缀规则，不依赖公共后缀列表）"""
+    host = host.rsplit('@', 1)[-1].split(':', 1)[0].lower().rstrip('.') if not host.startswith('[') else host
+    labels = host.split('.')
+    if len(labels) <= 2 or host.replace('.', '').isdigit():
+        return host
+    if '.'.join(labels[-2:]) in SECOND_LEVEL_SUFFIXES:
+        return '.'.join(labels[-3:])
+    return '.'.join(labels[-2:])
+
+
+class BloomFilter:
+    """布隆过滤器：固定内存记录访问过的 URL，可能误判为已访问（概率约 error_rate），不会漏判"""
+
+    def __init__(self, capacity=1000000, error_rate=0.001, bits=None, hashes=None):
+        self.size = bits or max(8, int(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = hashes or max(1, round(self.size / capacity * math.log(2)))
+        self.array = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item):
+        # 双重哈希：一次 blake2b 得到两个 64 位值，组合出 hashes 个位置
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        a, b = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return [(a + i * b) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self._positions(item):
+            self.array[position >> 3] |= 1 << (position & 7)
+
+    def __contains__(self, item):
+        return all(self.array[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
+
+    def to_dict(self):
+        return {'bits': self.size, 'hashes': self.hashes, 'array': base64.b64encode(bytes(self.array)).decode('ascii')}
+
+    @classmethod
+    def from_dict(cls, data):
+        bloom = cls(bits=data['bits'], hashes=data['hashes'])
+        bloom.array = bytearray(base64.b64decode(data['array']))
+        return bloom
+
+
+class CrawlScheduler:
+    """多层递归抓取：优先级队列按 (深度, 该注册域名已抓取的页数) 排序，先广度、再照顾抓得少的网站
+
+    - max_depth: 种子 URL 深度为 0，只跟随 <a href> 链接，超过 max_depth 的链接不再入队
+    - domain_budget: 每个注册域名最多抓取的页面数
+    - max_pages: 总页数上限
+    - bloom_capacity: 给出时用布隆过滤器代替集合记录见过的 URL
+    - checkpoint_file: 每抓 checkpoint_every 页把队列、已见 URL、计数和结果写到磁盘，resume 从这里继续
+    结果 domain_map 为 {页面主机: 页面里出现的域名集合}，格式和 domain_map.json 相同。
+    """
+
+    def __init__(self, crawler=None, max_depth=2, max_pages=1000, domain_budget=50, bloom_capacity=None,
+                 checkpoint_file=None, checkpoint_every=50):
+        self.crawler = crawler or Crawler()
+        self.max_depth = max_depth
+        self.max_pages = max_pages
+        self.domain_budget = domain_budget
+        self.checkpoint_file = checkpoint_file
+        self.checkpoint_every = checkpoint_every
+        self.seen = BloomFilter(bloom_capacity) if bloom_capacity else set()
+        self.frontier = []
+        self.sequence = 0
+        self.pages = 0
+        self.fetched = {}
+        self.domain_map = {}
+
+    def _push(self, url, depth):
+        if depth > self.max_depth or url in self.seen:
+            return
+        self.seen.add(url)
+        site = registrable_domain(urllib.parse.urlsplit(url).netloc)
+        heapq.heappush(self.frontier, (depth, self.fetched.get(site, 0), self.sequence, url))
+        self.sequence += 1
+
+    def add_seeds(self, urls):
+        for url in urls:
+            self._push(urllib.parse.urldefrag(url).url, 0)
+
+    def _next_batch(self, size):
+        # 取出下一批可抓取的 URL，超出预算的注册域名直接丢弃
+        batch = []
+        while self.frontier and len(batch) < size and self.pages + len(batch) < self.max_pages:
+            depth, _, _, url = heapq.heappop(self.frontier)
+            site = registrable_domain(urllib.parse.urlsplit(url).netloc)
+            if self.fetched.get(site, 0) >= self.domain_budget:
+                continue
+            self.fetched[site] = self.fetched.get(site, 0) + 1
+            batch.append((url, depth))
+        return batch
+
+    def _visit(self, job):
+        url, depth = job
+        response = self.crawler.get(url)
+        if response is None:
+            return url, depth, None, []
+        encoding = response.encoding or 'utf-8'
+        content = response.content
+        domains = extract_domains(content, self.crawler.include_src, encoding)
+        return url, depth, domains, list(scan_links(content, response.url, encoding))
+
+    def run(self):
+        """抓取直到队列为空或达到 max_pages，返回 {页面主机: 域名列表}"""
+        since_checkpoint = 0
+        with concurrent.futures.ThreadPoolExecutor(self.crawler.concurrency) as executor:
+            while True:
+                batch = self._next_batch(self.crawler.concurrency)
+                if not batch:
+                    break
+                for url, depth, domains, links in executor.map(self._visit, batch):
+                    self.pages += 1
+                    if domains is not None:
+                        self.domain_map.setdefault(urllib.parse.urlsplit(url).netloc, set()).update(domains)
+                    for link in links:
+                        self._push(link, depth + 1)
+                since_checkpoint += len(batch)
+                if self.checkpoint_file and since_checkpoint >= self.checkpoint_every:
+                    self.save_checkpoint()
+                    since_checkpoint = 0
+        if self.checkpoint_file:
+            self.save_checkpoint()
+        print(f"Crawled {self.pages} pages, {len(self.frontier)} urls left in frontier")
+        return self.result()
+
+    def result(self):
+        return {host: sorted(domains) for host, domains in self.domain_map.items()}
+
+    def all_domains(self):
+        return sorted(set(self.domain_map).union(*self.domain_map.values()))
+
+    def save_checkpoint(self, checkpoint_file=None):
+        """先写临时文件再替换，抓取中途崩溃也不会留下写了一半的检查点"""
+        checkpoint_file = checkpoint_file or self.checkpoint_file
+        state = {
+            'frontier': self.frontier,
+            'sequence': self.sequence,
+            'pages': self.pages,
+            'fetched': self.fetched,
+            'domain_map': self.result(),
+            'seen': self.seen.to_dict() if isinstance(self.seen, BloomFilter) else sorted(self.seen),
+        }
+        FileUtil.write_to_file(state, checkpoint_file + '.tmp')
+        os.replace(checkpoint_file + '.tmp', checkpoint_file)
+
+    @classmethod
+    def resume(cls, checkpoint_file, **kwargs):
+        """从检查点恢复，抓取参数（深度、预算等）由 kwargs 重新给出"""
+        scheduler = cls(checkpoint_file=checkpoint_file, **kwargs)
+        state = FileUtil.read_from_file(checkpoint_file)
+        scheduler.frontier = [tuple(item) for item in state['frontier']]
+        heapq.heapify(scheduler.frontier)
+        scheduler.sequence = state['sequence']
+        scheduler.pages = state['pages']
+        scheduler.fetched = state['fetched']
+        scheduler.domain_map = {host: set(domains) for host, domains in state['domain_map'].items()}
+        seen = state['seen']
+        scheduler.seen = BloomFilter.from_dict(seen) if isinstance(seen, dict) else set(seen)
+        return scheduler
@@ -0,0 +1,309 @@
+import concurrent.futures
+import html
+import html.parser
+import re
+import threading
+import time
+import urllib.parse
+
+import requests
+from bs4 import BeautifulSoup
+from requests.adapters import HTTPAdapter
+
+from util.http_cache import HTTP_CACHE_FILE, HTTPCache
+
+# 只解析 HTML 页面，图片、PDF、压缩包等直接跳过
+HTML_CONTENT_TYPES = ('text/html', 'application/xhtml+xml')
+MAX_PAGE_BYTES = 5 * 1024 * 1024
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/58.0.3029.110 Safari/537.3'
+}
+
+
+def process_url(url):
+    """处理单个URL，去除https://前缀和域名后面的斜杠及之后的部分"""
+    return urllib.parse.urlsplit(url).netloc or url
+
+
+def extract_domains_bs4(html_content):
+    """页面里所有 <a href> 链接的域名（BeautifulSoup 实现，保留作为对照）"""
+    soup = BeautifulSoup(html_content, 'html.parser')
+    domains = set()
+    for link in soup.find_all('a', href=True):
+        try:
+            domain = urllib.parse.urlparse(link['href']).netloc
+            if domain:
+                domains.add(domain)
+        except ValueError as e:
+            print(f"Error parsing URL {link['href']}: {e}")
+    return domains
+
+
+# 每种标签里取哪个属性：<a href> 是链接，<script>/<img>/<iframe> 的 src 是页面实际加载的托管资源
+LINK_ATTRIBUTES = {'a': 'href', 'script': 'src', 'img': 'src', 'iframe': 'src'}
+
+# 内容不是 HTML 标签的元素：<script>/<style> 是原始文本，<textarea>/<title> 是 RCDATA，里面的 <a href> 不是链接
+RAW_TEXT_ELEMENTS = (b'script', b'style', b'textarea', b'title')
+
+# 一次扫描依次匹配：注释（跳过）、原始文本元素的开始标签加内容（只看 <script> 开始标签的属性）、<a>/<img>/<iframe> 开始标签
+# 属性部分允许引号里出现 '>'
+_ATTRS = rb'''((?:"[^"]*"|'[^']*'|[^'">])*)'''
+_TAG_SCANNER = re.compile(rb'<!--.*?-->|<(' + b'|'.join(RAW_TEXT_ELEMENTS) + rb')(?=[\s/>])' + _ATTRS
+                          + rb'>.*?</\1\s*>|<(a|img|iframe)(?=[\s/>])' + _ATTRS + rb'>', re.I | re.S)
+_ATTRIBUTE = re.compile(rb'''([^\s=/>]+)(?:\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]*)))?''')
+# 和 urlparse 的规则一致：可选的 scheme 之后紧跟 // 才有域名，域名到 / ? # 为止
+_NETLOC = re.compile(r'(?:[A-Za-z][A-Za-z0-9+.\-]*:)?//([^/?#]*)')
+
+
+def url_netloc(url):
+    """等价于 urllib.parse.urlparse(url).netloc，省去完整解析"""
+    # urlparse 会去掉首尾空白和 URL 中间的制表符、换行
+    match = _NETLOC.match(url.strip().replace('\t', '').replace('\r', '').replace('\n', ''))
+    return match.group(1) if match else ''
+
+
+def _attribute(attrs, name):
+    # 同名属性出现多次时取最后一个，和 BeautifulSoup / HTMLParser 一致
+    value = None
+    for match in _ATTRIBUTE.finditer(attrs):
+        if match.group(1).lower() == name:
+            value = match.group(2) if match.group(2) is not None else (
+                match.group(3) if match.group(3) is not None else match.group(4) or b'')
+    return value
+
+
+def scan_attributes(content, include_src=True, encoding='utf-8'):
+    """正则扫描网页（bytes 或 str），逐个返回 (标签名, 链接属性值)，不构建 DOM 树"""
+    if isinstance(content, str):
+        content = content.encode(encoding, 'surrogateescape')
+    for match in _TAG_SCANNER.finditer(content):
+        tag = (match.group(1) or match.group(3))
+        if tag is None:
+            continue
+        tag = tag.lower().decode('ascii')
+        if tag not in LINK_ATTRIBUTES or (tag != 'a' and not include_src):
+            continue
+        value = _attribute(match.group(2) if match.group(1) else match.group(4), LINK_ATTRIBUTES[tag].encode())
+        if not value:
+            continue
+        value = value.decode(encoding, 'replace')
+        if '&' in value:
+            value = html.unescape(value)
+        yield tag, value
+
+
+def scan_domains(content, include_src=True, encoding='utf-8'):
+    """逐个返回页面里新出现的域名（去重）"""
+    seen = set()
+    for _, value in scan_attributes(content, include_src, encoding):
+        netloc = url_netloc(value)
+        if netloc and netloc not in seen:
+            seen.add(netloc)
+            yield netloc
+
+
+def scan_links(content, base_url, encoding='utf-8'):
+    """页面里 <a href> 指向的 http/https 网页，转换成绝对地址并去掉 #片段，去重"""
+    seen = set()
+    for _, value in scan_attributes(content, False, encoding):
+        try:
+            url = urllib.parse.urldefrag(urllib.parse.urljoin(base_url, value.strip())).url
+        except ValueError:
+            continue
+        if url.startswith(('http://', 'https://')) and url not in seen:
+            seen.add(url)
+            yield url
+
+
+def extract_domains(content, include_src=True, encoding='utf-8'):
+    """页面里链接和托管资源的域名集合，include_src=False 时只看 <a href>，结果和 extract_domains_bs4 相同"""
+    return set(scan_domains(content, include_src, encoding))
+
+
+class LinkDomainParser(html.parser.HTMLParser):
+    """基于 HTMLParser 的流式解析，可以分块 feed，新发现的域名追加到 pending，由调用方取走
+
+    HTMLParser 只把 <script>/<style> 当原始文本，<textarea>/<title> 里的标签由这里跳过，和 scan_attributes 一致。
+    """
+
+    def __init__(self, include_src=True):
+        super().__init__(convert_charrefs=True)
+        self.include_src = include_src
+        self.domains = set()
+        self.pending = []
+        self.rcdata = None
+
+    def handle_endtag(self, tag):
+        if tag == self.rcdata:
+            self.rcdata = None
+
+    def handle_starttag(self, tag, attrs):
+        if self.rcdata is not None:
+            return
+        if tag in ('textarea', 'title'):
+            self.rcdata = tag
+            return
+        name = LINK_ATTRIBUTES.get(tag)
+        if name is None or (tag != 'a' and not self.include_src):
+            return
+        value = dict(attrs).get(name)
+        netloc = url_netloc(value) if value else ''
+        if netloc and netloc not in self.domains:
+            self.domains.add(netloc)
+            self.pending.append(netloc)
+
+    def take(self):
+        pending, self.pending = self.pending, []
+        return pending
+
+
+def iter_domains(chunks, include_src=True):
+    """逐块解析网页文本（例如 response.iter_content(decode_unicode=True)），边解析边返回新域名"""
+    parser = LinkDomainParser(include_src)
+    for chunk in chunks:
+        parser.feed(chunk)
+        yield from parser.take()
+    parser.close()
+    yield from parser.take()
+
+
+class SkippedResponse(requests.RequestException):
+    """响应不是 HTML 或者超过大小上限，不解析"""
+
+
+def content_type(response):
+    return response.headers.get('Content-Type', '').split(';')[0].strip().lower()
+
+
+class HostRateLimiter:
+    """同一个主机的两次请求之间至少间隔 min_interval 秒，不同主机互不影响"""
+
+    def __init__(self, min_interval=0.2):
+        self.min_interval = min_interval
+        self.next_time = {}
+        self.lock = threading.Lock()
+
+    def wait(self, host):
+        with self.lock:
+            now = time.monotonic()
+            start = max(now, self.next_time.get(host, now))
+            self.next_time[host] = start + self.min_interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class Crawler:
+    """并发抓取网页：每个线程一个保持长连接的 requests.Session，线程数限制并发，按主机限速，所有请求带超时
+
+    给出 cache（util.http_cache.HTTPCache）时先查磁盘缓存，命中且未过期的页面不发请求。
+    响应体流式读取：Content-Type 不是 HTML 的响应不读响应体，超过 max_bytes 的页面读到上限就放弃，都算抓取失败。
+    """
+
+    def __init__(self, concurrency=8, timeout=10.0, per_host_interval=0.2, retries=1, headers=None, include_src=True,
+                 cache=None, max_bytes=MAX_PAGE_BYTES):
+        self.concurrency = concurrency
+        self.max_bytes = max_bytes
+        self.cache = cache
+        self.include_src = include_src
+        self.timeout = timeout
+        self.retries = retries
+        self.headers = headers or DEFAULT_HEADERS
+        self.limiter = HostRateLimiter(per_host_interval)
+        self.local = threading.local()
+
+    def session(self):
+        session = getattr(self.local, 'session', None)
+        if session is None:
+            session = requests.Session()
+            session.headers.update(self.headers)
+            adapter = HTTPAdapter(pool_connections=self.concurrency, pool_maxsize=self.concurrency,
+                                  max_retries=self.retries)
+            session.mount('http://', adapter)
+            session.mount('https://', adapter)
+            self.local.session = session
+        return session
+
+    def read_body(self, response):
+        """检查 Content-Type，按块读取响应体，超过 max_bytes 抛出 SkippedResponse；非 200 响应不读"""
+        if response.status_code != 200:
+            response.close()
+            return
+        if content_type(response) not in HTML_CONTENT_TYPES:
+            response.close()
+            raise SkippedResponse(f"not an HTML page ({content_type(response) or 'no Content-Type'})")
+        length = response.headers.get('Content-Length', '')
+        if length.isdigit() and int(length) > self.max_bytes:
+            response.close()
+            raise SkippedResponse(f"page larger than {self.max_bytes} bytes ({length})")
+        body = bytearray()
+        for chunk in response.iter_content(64 * 1024):
+            body += chunk
+            if len(body) > self.max_bytes:
+                response.close()
+                raise SkippedResponse(f"page larger than {self.max_bytes} bytes")
+        response._content = bytes(body)
+
+    def get(self, url):
+        """返回 requests 的 Response，失败、不是 HTML 或者超过大小上限返回 None"""
+        try:
+            if self.cache is not None:
+                # 只查询、解压一次缓存，未过期时直接用，过期时交给 cache.get 做条件请求
+                entry = self.cache.lookup(url)
+                cached = self.cache.fresh(url, entry)
+                if cached is not None:
+                    if content_type(cached) not in HTML_CONTENT_TYPES or len(cached.content) > self.max_bytes:
+                        raise SkippedResponse("cached page is not an HTML page within the size limit")
+                    return cached
+            self.limiter.wait(urllib.parse.urlsplit(url).netloc)
+            if self.cache is not None:
+                response = self.cache.get(self.session(), url, read_body=self.read_body, entry=entry,
+                                          timeout=self.timeout, stream=True)
+            else:
+                response = self.session().get(url, timeout=self.timeout, stream=True)
+                self.read_body(response)
+            response.raise_for_status()
+            return response
+        except requests.RequestException as e:
+            print(f"Error fetching URL {url}: {e}")
+            return None
+
+    def fetch(self, url):
+        """返回网页内容，失败返回 None"""
+        response = self.get(url)
+        return response.text if response is not None else None
+
+    def get_domains_from_url(self, url):
+        # 直接扫描原始字节，不解码整个页面
+        response = self.get(url)
+        if response is None:
+            return set()
+        return extract_domains(response.content, self.include_src, response.encoding or 'utf-8')
+
+    def crawl(self, urls):
+        """并发抓取所有 URL，返回 {URL: 域名集合}，顺序和 urls 相同"""
+        with concurrent.futures.ThreadPoolExecutor(self.concurrency) as executor:
+            return dict(zip(urls, executor.map(self.get_domains_from_url, urls)))
+
+    def crawl_domain_map(self, urls):
+        """一次抓取同时得到 domain_map（主域名 -> 托管的域名列表）和 all_domain（所有主域名和托管的域名）
+
+        同一个主域名下的多个页面，托管的域名合并。
+        """
+        domain_map = {}
+        all_domains = set()
+        for url, domains in self.crawl(urls).items():
+            main_domain = process_url(url)
+            domain_map.setdefault(main_domain, set()).update(domains)
+            all_domains.add(main_domain)
+            all_domains.update(domains)
+        return {domain: sorted(hosted) for domain, hosted in domain_map.items()}, sorted(all_domains)
+
+
+def get_domains_from_url(url, headers=None, timeout=10.0, include_src=True, cache_file=HTTP_CACHE_FILE):
+    """获取网页托管的域名（单个 URL），默认使用和其他脚本共用的磁盘缓存，cache_file=None 时不用缓存"""
+    if cache_file is None:
+        return Crawler(concurrency=1, timeout=timeout, headers=headers, include_src=include_src).get_domains_from_url(url)
+    with HTTPCache(cache_file) as cache:
+        crawler = Crawler(concurrency=1, timeout=timeout, headers=headers, include_src=include_src, cache=cache)
+        return crawler.get_domains_from_url(url)
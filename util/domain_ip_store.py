@@ -0,0 +1,105 @@
+import sqlite3
+import time
+
+from util.file_util import FileUtil
+
+
+class DomainIPStore:
+    """基于 SQLite 的域名-IP 映射表，记录每个 (域名, IP) 的首次/最近出现时间和 TTL，支持过期淘汰
+
+    写入的 TTL 不小于 min_ttl：CDN 轮换常用 TTL 0，不截断的话这些 IP 写进去的同一次运行里就被当成过期删掉了。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mappings (
+            domain TEXT NOT NULL,
+            ip TEXT NOT NULL,
+            first_seen REAL NOT NULL,
+            last_seen REAL NOT NULL,
+            ttl INTEGER,
+            PRIMARY KEY (domain, ip)
+        ) WITHOUT ROWID;
+        CREATE INDEX IF NOT EXISTS mappings_ip ON mappings (ip, domain);
+    """
+
+    # 映射未过期：没有 TTL，或者最近出现时间 + TTL 晚于当前时间
+    ALIVE = "(ttl IS NULL OR last_seen + ttl > ?)"
+
+    # 默认最小 TTL（秒）
+    MIN_TTL = 300
+
+    def __init__(self, path='domain_ip_store.db', min_ttl=MIN_TTL):
+        self.min_ttl = min_ttl
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    def upsert(self, domain, ips, ttl=None, now=None):
+        """记录一次解析结果，ips 为 IP 列表或 {IP: TTL}"""
+        self.upsert_map({domain: ips}, ttl, now)
+
+    def upsert_map(self, domain_ip_map, ttl=None, now=None):
+        """批量记录 {域名: IP 列表 或 {IP: TTL}}，在一个事务里完成，已有的行只更新 last_seen 和 ttl（不小于 min_ttl）"""
+        now = time.time() if now is None else now
+        rows = []
+        for domain, ips in domain_ip_map.items():
+            ttls = ips if isinstance(ips, dict) else dict.fromkeys(ips, ttl)
+            rows.extend((domain, ip, now, now, ip_ttl if ip_ttl is None else max(ip_ttl, self.min_ttl))
+                        for ip, ip_ttl in ttls.items())
+        with self.conn:
+            self.conn.executemany("""
+                INSERT INTO mappings (domain, ip, first_seen, last_seen, ttl) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (domain, ip) DO UPDATE SET last_seen = excluded.last_seen, ttl = excluded.ttl
+            """, rows)
+
+    def current_ips(self, domain, now=None):
+        """域名当前（未过期）的 IP 列表"""
+        now = time.time() if now is None else now
+        rows = self.conn.execute("SELECT ip FROM mappings WHERE domain = ? AND " + self.ALIVE + " ORDER BY ip",
+                                 (domain, now))
+        return [ip for ip, in rows]
+
+    def domains_for_ip(self, ip, now=None):
+        """当前映射到该 IP 的域名列表"""
+        now = time.time() if now is None else now
+        rows = self.conn.execute("SELECT domain FROM mappings WHERE ip = ? AND " + self.ALIVE + " ORDER BY domain",
+                                 (ip, now))
+        return [domain for domain, in rows]
+
+    def history(self, domain):
+        """域名所有记录过的映射：[(ip, first_seen, last_seen, ttl)]，包括已过期的"""
+        rows = self.conn.execute("SELECT ip, first_seen, last_seen, ttl FROM mappings WHERE domain = ? ORDER BY ip",
+                                 (domain,))
+        return rows.fetchall()
+
+    def evict(self, now=None, max_age=None):
+        """删除 TTL 已过期的映射；给出 max_age 时同时删除超过 max_age 秒没有再出现的映射，返回删除的行数"""
+        now = time.time() if now is None else now
+        with self.conn:
+            deleted = self.conn.execute("DELETE FROM mappings WHERE NOT " + self.ALIVE, (now,)).rowcount
+            if max_age is not None:
+                deleted += self.conn.execute("DELETE FROM mappings WHERE last_seen < ?", (now - max_age,)).rowcount
+        return deleted
+
+    def to_map(self, now=None):
+        """导出当前未过期的映射，格式和 domain_ip_map.json 相同"""
+        now = time.time() if now is None else now
+        domain_ip_map = {}
+        rows = self.conn.execute("SELECT domain, ip FROM mappings WHERE " + self.ALIVE + " ORDER BY domain, ip",
+                                 (now,))
+        for domain, ip in rows:
+            domain_ip_map.setdefault(domain, []).append(ip)
+        return domain_ip_map
+
+    def import_json(self, input_file, ttl=None, now=None):
+        """从 domain_ip_map.json 导入"""
+        self.upsert_map(FileUtil.read_from_file(input_file), ttl, now)
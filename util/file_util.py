@@ -1,4 +1,108 @@
 import json
+import os
+import re
+
+from util.compact_map import CompactMap, is_compact_map, write_compact_map
+
+
+class NDJSONWriter:
+    """追加写 NDJSON（每行一个 JSON），先写到 output_file + '.part'，每条记录写完立即 flush
+
+    commit() 时原子地重命名为 output_file，读者不会看到写了一半的文件；
+    中途崩溃时 .part 里保留已经写完的记录，resume=True 时在它后面继续追加。
+    """
+
+    def __init__(self, output_file, resume=False, flush_every=1):
+        self.output_file = output_file
+        self.part_file = output_file + '.part'
+        self.flush_every = flush_every
+        self.count = 0
+        if resume and os.path.exists(self.part_file):
+            self._truncate_partial_line()
+        self.file = open(self.part_file, 'a' if resume else 'w', encoding='utf-8')
+
+    def _truncate_partial_line(self):
+        # 崩溃时最后一行可能只写了一半，截掉最后一个换行符之后的内容
+        with open(self.part_file, 'rb+') as file:
+            data = file.read()
+            file.truncate(data.rfind(b'\n') + 1)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.commit()
+        else:
+            self.file.close()
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        self.count += 1
+        if self.count % self.flush_every == 0:
+            self.file.flush()
+
+    def write_item(self, key, value):
+        """写一个键值对，一行 {key: value}，FileUtil.iter_map_items 可以逐个读回"""
+        self.write({key: value})
+
+    def commit(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.part_file, self.output_file)
+
+
+_NUMBER_CHARS = frozenset('0123456789.eE+-')
+
+
+class _JSONStream:
+    # 按块读取的 JSON 词法辅助：缓冲区里数据不够时继续读文件
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.decoder = json.JSONDecoder()
+        self.buffer = ''
+        self.position = 0
+        self.eof = False
+
+    def _fill(self):
+        chunk = self.file.read(self.chunk_size)
+        self.eof = not chunk
+        self.buffer = self.buffer[self.position:] + chunk
+        self.position = 0
+
+    def peek(self):
+        while True:
+            self.position = json.decoder.WHITESPACE.match(self.buffer, self.position).end()
+            if self.position < len(self.buffer):
+                return self.buffer[self.position]
+            if self.eof:
+                raise json.JSONDecodeError("unexpected end of data", self.buffer, self.position)
+            self._fill()
+
+    def expect(self, characters):
+        char = self.peek()
+        if char not in characters:
+            raise json.JSONDecodeError(f"expected one of {characters!r}", self.buffer, self.position)
+        self.position += 1
+        return char
+
+    def value(self):
+        # 数字可能被块边界截断（'1.' | '25'，raw_decode 会返回 1），所以值后面必须已经读到一个不属于数字的字符，
+        # 或者已经读到文件末尾，否则再读一块重试
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.position)
+                if self.eof or (end < len(self.buffer) and self.buffer[end] not in _NUMBER_CHARS):
+                    self.position = end
+                    return value
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+            self._fill()
+
 
 class FileUtil:
     @staticmethod
@@ -21,16 +125,119 @@ class FileUtil:
             print(f"Error reading from file: {e}")
             return {}
 
+    @staticmethod
+    def iter_list_from_file(file_path):
+        """逐行读取 URL 列表，跳过空行，不把整个文件读进内存"""
+        with open(file_path, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    yield line
+
     @staticmethod
     def read_list_from_file(file_path):
         """从文件中读取 URL 列表，每行一个 URL"""
-        with open(file_path, 'r', encoding='utf-8') as file:
-            domains = [line.strip() for line in file if line.strip()]
-        return domains
+        return list(FileUtil.iter_list_from_file(file_path))
 
     @staticmethod
     def write_list_to_file(domains, file_path):
         """将 URL 列表写入文件，每行一个 URL"""
         with open(file_path, 'w', encoding='utf-8') as file:
             for domain in domains:
-                file.write(f"{domain}\n")
\ No newline at end of file
+                file.write(f"{domain}\n")
+
+    @staticmethod
+    def iter_kv_txt(input_file):
+        """逐行读取 key:v1,v2 格式的文本（domain_ip_map.txt、output.txt），键里的 :// 不作为分隔符"""
+        with open(input_file, 'r', encoding='utf-8') as file:
+            for line in file:
+                line = line.rstrip('\n')
+                if not line.strip():
+                    continue
+                match = re.match(r'(.*?):(?!//)(.*)$', line)
+                key, value = match.groups() if match else (line, '')
+                yield key, value.split(',') if value else []
+
+    @staticmethod
+    def read_kv_txt(input_file):
+        """读取 key:v1,v2 格式的文本"""
+        return dict(FileUtil.iter_kv_txt(input_file))
+
+    @staticmethod
+    def write_kv_txt(kv_pairs, output_file):
+        """将键值对写成 key:v1,v2 格式的文本"""
+        with open(output_file, 'w', encoding='utf-8') as file:
+            for key, value in kv_pairs.items():
+                file.write(f"{key}:{','.join(value)}\n")
+
+    @staticmethod
+    def write_compact(kv_pairs, output_file):
+        """将 {键: 值列表} 写成紧凑二进制格式（字符串去重，IP 打包成 4/16 字节，见 util/compact_map.py）"""
+        write_compact_map(kv_pairs, output_file)
+
+    @staticmethod
+    def read_compact(input_file):
+        """mmap 打开紧凑格式文件，返回只读的 CompactMap，不需要解析"""
+        return CompactMap(input_file)
+
+    @staticmethod
+    def read_map(input_file):
+        """按文件内容自动识别紧凑格式、key:v1,v2 文本或 JSON"""
+        if is_compact_map(input_file):
+            return CompactMap(input_file)
+        if input_file.endswith('.txt'):
+            return FileUtil.read_kv_txt(input_file)
+        return FileUtil.read_from_file(input_file)
+
+    @staticmethod
+    def convert_to_compact(input_file, output_file=None):
+        """把 JSON 或 key:v1,v2 文本转换成紧凑格式，默认输出为同名 .cmap 文件，返回输出路径"""
+        output_file = output_file or os.path.splitext(input_file)[0] + '.cmap'
+        write_compact_map(FileUtil.read_map(input_file), output_file)
+        return output_file
+
+    @staticmethod
+    def iter_json_items(input_file, chunk_size=1 << 16):
+        """逐个返回 JSON 顶层对象的 (键, 值)，按块读取，同一时间只有一个值在内存里"""
+        with open(input_file, 'r', encoding='utf-8') as file:
+            stream = _JSONStream(file, chunk_size)
+            stream.expect('{')
+            if stream.peek() == '}':
+                return
+            while True:
+                key = stream.value()
+                stream.expect(':')
+                yield key, stream.value()
+                if stream.expect(',}') == '}':
+                    return
+
+    @staticmethod
+    def iter_ndjson(input_file):
+        """逐行读取 NDJSON，最后一行不完整（写入时崩溃）时忽略"""
+        with open(input_file, 'r', encoding='utf-8') as file:
+            for line in file:
+                if not line.strip():
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    if line.endswith('\n'):
+                        raise
+
+    @staticmethod
+    def iter_map_items(input_file):
+        """按格式流式读取 {键: 值列表}：NDJSON 每行一个 {key: value}，紧凑格式，key:v1,v2 文本或 JSON"""
+        if input_file.endswith(('.ndjson', '.jsonl', '.part')):
+            for record in FileUtil.iter_ndjson(input_file):
+                yield from record.items()
+        elif is_compact_map(input_file):
+            yield from CompactMap(input_file).items()
+        elif input_file.endswith('.txt'):
+            yield from FileUtil.iter_kv_txt(input_file)
+        else:
+            yield from FileUtil.iter_json_items(input_file)
+
+    @staticmethod
+    def open_ndjson_writer(output_file, resume=False):
+        """返回 NDJSONWriter，用 with 语句使用，正常结束时原子地替换 output_file"""
+        return NDJSONWriter(output_file, resume)
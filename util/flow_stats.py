@@ -0,0 +1,223 @@
+import collections
+import ipaddress
+
+import numpy as np
+
+from util.pcap_reader import ip_header, ip_to_str, iter_packets, transport_ports
+
+PROTO_TCP = 6
+PROTO_UDP = 17
+# 小于这个端口的是服务端口，本机一侧通常是临时端口
+SERVICE_PORTS = 1024
+# IPv4 地址存成 IPv4 映射的 IPv6 地址 ::ffff:a.b.c.d，两个地址族共用 16 字节的列
+V4_MAPPED_PREFIX = b'\x00' * 10 + b'\xff\xff'
+
+# 列名和类型，所有列长度相同，每一行是一个 (抓包, 远端 IP, 远端端口, 协议) 的流
+# remote_ip 为 16 字节的原始地址（V16，不会像 S16 那样去掉末尾的 0 字节），用 FlowTable.remote_ips() 转成字符串
+COLUMNS = {
+    'capture': np.int32,
+    'remote_ip': 'V16',
+    'remote_port': np.uint16,
+    'local_port': np.uint16,
+    'protocol': np.uint8,
+    'packets_out': np.uint32,
+    'packets_in': np.uint32,
+    'bytes_out': np.uint64,
+    'bytes_in': np.uint64,
+    'first_seen': np.float64,
+    'last_seen': np.float64,
+}
+
+
+def is_reserved(address):
+    """私有、回环、链路本地、组播地址不会是网站的 IP"""
+    ip = ipaddress.ip_address(address)
+    return ip.is_private or ip.is_loopback or ip.is_link_local or ip.is_multicast or ip.is_unspecified
+
+
+def pack_ip(address):
+    """IP（字符串或 4/16 字节）转成 16 字节，IPv4 用 IPv4 映射地址"""
+    if isinstance(address, str):
+        address = ipaddress.ip_address(address).packed
+    return V4_MAPPED_PREFIX + address if len(address) == 4 else address
+
+
+def unpack_ip(packed):
+    return ip_to_str(packed[12:] if packed[:12] == V4_MAPPED_PREFIX else packed)
+
+
+def detect_local_addresses(flows, share=0.9):
+    """本机地址，IPv4 和 IPv6 分别判断
+
+    flows 为 {(源地址, 目的地址, 协议, 源端口, 目的端口): [包数, ...]}，地址为原始字节。
+    保留地址（私有、链路本地等）都算本机。每个地址族里不经过保留地址的包中，出现在至少 share 比例的包里的地址
+    是候选（抓包只抓本机流量，本机的公网地址出现在几乎每个包里）；只访问一个服务器时服务器也满足这个条件，
+    所以只取一个候选：通信对端最多的，对端数相同时取用服务端口（< 1024）的包最少的。
+    """
+    local = set()
+    families = collections.defaultdict(lambda: {'total': 0, 'packets': collections.Counter(),
+                                                'peers': collections.defaultdict(set),
+                                                'service': collections.Counter()})
+    for (src, dst, _, src_port, dst_port), flow in flows.items():
+        reserved = [address for address in (src, dst) if is_reserved(ip_to_str(address))]
+        if reserved:
+            local.update(reserved)
+            continue
+        family = families[len(src)]
+        family['total'] += flow[0]
+        for address, peer, port in ((src, dst, src_port), (dst, src, dst_port)):
+            family['packets'][address] += flow[0]
+            family['peers'][address].add(peer)
+            if 0 < port < SERVICE_PORTS:
+                family['service'][address] += flow[0]
+    for family in families.values():
+        candidates = [address for address, count in family['packets'].items() if count >= share * family['total']]
+        if candidates:
+            local.add(max(candidates, key=lambda a: (len(family['peers'][a]), -family['service'][a])))
+    return local
+
+
+class FlowTable:
+    """按列存储的流统计表，每列是一个 numpy 数组，可以把很多次抓包的结果拼在一起保存成 .npz
+
+    names[i] 是 capture == i 的那次抓包的名字（URL 或抓包文件名）。
+    """
+
+    def __init__(self, names, columns):
+        self.names = list(names)
+        columns = dict(columns)
+        # 兼容按字符串保存 remote_ip 的旧 .npz
+        if np.asarray(columns['remote_ip']).dtype.kind == 'U':
+            columns['remote_ip'] = [pack_ip(ip) for ip in np.asarray(columns['remote_ip']).tolist()]
+        self.columns = {name: np.asarray(columns[name], dtype=dtype) for name, dtype in COLUMNS.items()}
+
+    def __len__(self):
+        return len(self.columns['capture'])
+
+    def __getitem__(self, column):
+        return self.columns[column]
+
+    @classmethod
+    def empty(cls):
+        return cls([], {name: [] for name in COLUMNS})
+
+    @classmethod
+    def concat(cls, tables):
+        """拼接多张表，capture 编号依次平移"""
+        names, parts, shift = [], [], 0
+        for table in tables:
+            columns = dict(table.columns)
+            columns['capture'] = columns['capture'] + shift
+            parts.append(columns)
+            names.extend(table.names)
+            shift += len(table.names)
+        if not parts:
+            return cls.empty()
+        return cls(names, {name: np.concatenate([part[name] for part in parts]) for name in COLUMNS})
+
+    def select(self, mask):
+        return FlowTable(self.names, {name: values[mask] for name, values in self.columns.items()})
+
+    def remote_ips(self):
+        """remote_ip 列转成字符串列表，相同的地址只转换一次"""
+        packed = self.columns['remote_ip']
+        unique, inverse = np.unique(packed, return_inverse=True)
+        text = [unpack_ip(address) for address in unique.tolist()]
+        return [text[i] for i in inverse.ravel().tolist()]
+
+    def capture_ips(self, min_packets=1):
+        """{抓包名: 远端 IP 列表}，和 capture_ip_map.json 格式相同，可以直接交给 WebsiteIdentifier"""
+        packets = self.columns['packets_out'].astype(np.int64) + self.columns['packets_in']
+        table = self.select(packets >= min_packets)
+        result = {name: set() for name in self.names}
+        for capture, ip in zip(table['capture'].tolist(), table.remote_ips()):
+            result[self.names[capture]].add(ip)
+        return {name: sorted(ips) for name, ips in result.items()}
+
+    def ip_totals(self, capture):
+        """某次抓包里每个远端 IP 的 (包数, 字节数)，多个端口合并"""
+        table = self.select(self.columns['capture'] == capture)
+        totals = collections.defaultdict(lambda: [0, 0])
+        for ip, packets_out, packets_in, bytes_out, bytes_in in zip(
+                table.remote_ips(), table['packets_out'].tolist(), table['packets_in'].tolist(),
+                table['bytes_out'].tolist(), table['bytes_in'].tolist()):
+            totals[ip][0] += packets_out + packets_in
+            totals[ip][1] += bytes_out + bytes_in
+        return {ip: tuple(total) for ip, total in totals.items()}
+
+    def save(self, output_file):
+        np.savez_compressed(output_file, names=np.array(self.names, dtype=str), **self.columns)
+
+    @classmethod
+    def load(cls, input_file):
+        with np.load(input_file) as data:
+            return cls(data['names'].tolist(), {name: data[name] for name in COLUMNS})
+
+
+def flow_stats(pcap_file, name=None, local_addresses=None, ipv6=True):
+    """解析一次抓包，按 (远端 IP, 远端端口, 本地端口, 协议) 聚合包数、字节数（IP 层长度）、首次/最后出现时间（相对抓包开始的秒数）
+
+    local_addresses 为本机 IP 字符串集合，不给时按地址族自动识别（detect_local_addresses）；两端都不是本机的包丢弃。
+    """
+    # 先按原始字节聚合有方向的流，扫完一遍之后再判断哪一端是本机
+    flows = {}
+    start = None
+    for timestamp, linktype, data in iter_packets(pcap_file):
+        header = ip_header(linktype, data)
+        if header is None or (header[0] == 6 and not ipv6):
+            continue
+        _, src, dst, protocol, _, length = header
+        timestamp = timestamp or 0.0
+        if start is None:
+            start = timestamp
+        src_port, dst_port = transport_ports(data, header)
+        key = (src, dst, protocol, src_port, dst_port)
+        flow = flows.get(key)
+        if flow is None:
+            flows[key] = [1, length, timestamp, timestamp]
+        else:
+            flow[0] += 1
+            flow[1] += length
+            flow[3] = timestamp
+
+    if local_addresses is None:
+        local = detect_local_addresses(flows)
+    else:
+        local = {ipaddress.ip_address(address).packed for address in local_addresses}
+
+    merged = {}
+    for (src, dst, protocol, src_port, dst_port), (packets, length, first, last) in flows.items():
+        if src in local and dst not in local:
+            key, outgoing = (dst, dst_port, src_port, protocol), True
+        elif dst in local and src not in local:
+            key, outgoing = (src, src_port, dst_port, protocol), False
+        else:
+            continue
+        row = merged.get(key)
+        if row is None:
+            row = merged[key] = [0, 0, 0, 0, first, last]
+        if outgoing:
+            row[0] += packets
+            row[2] += length
+        else:
+            row[1] += packets
+            row[3] += length
+        row[4] = min(row[4], first)
+        row[5] = max(row[5], last)
+
+    start = start or 0.0
+    rows = sorted(merged.items(), key=lambda item: item[1][4])
+    columns = {
+        'capture': [0] * len(rows),
+        'remote_ip': [pack_ip(key[0]) for key, _ in rows],
+        'remote_port': [key[1] for key, _ in rows],
+        'local_port': [key[2] for key, _ in rows],
+        'protocol': [key[3] for key, _ in rows],
+        'packets_out': [row[0] for _, row in rows],
+        'packets_in': [row[1] for _, row in rows],
+        'bytes_out': [row[2] for _, row in rows],
+        'bytes_in': [row[3] for _, row in rows],
+        'first_seen': [row[4] - start for _, row in rows],
+        'last_seen': [row[5] - start for _, row in rows],
+    }
+    return FlowTable([name if name is not None else pcap_file], columns)
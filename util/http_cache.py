@@ -0,0 +1,160 @@
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+HTTP_CACHE_FILE = 'http_cache.db'
+
+
+class HTTPCache:
+    """网页内容的磁盘缓存（SQLite），按 URL 存压缩后的响应体和 ETag / Last-Modified
+
+    - 缓存时间不超过 max_age 秒的条目直接返回，不发请求
+    - 更早的条目发条件请求（If-None-Match / If-Modified-Since），服务器返回 304 时继续使用缓存
+    - 总大小（压缩后）超过 max_bytes 时按最近访问时间淘汰（LRU）
+    多个线程可以共用一个实例。
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            url TEXT PRIMARY KEY,
+            final_url TEXT NOT NULL,
+            headers TEXT NOT NULL,
+            encoding TEXT,
+            etag TEXT,
+            last_modified TEXT,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            stored REAL NOT NULL,
+            accessed REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed);
+    """
+
+    def __init__(self, path=HTTP_CACHE_FILE, max_bytes=256 * 1024 * 1024, max_age=86400):
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(self.SCHEMA)
+        self.hits = self.revalidated = self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def lookup(self, url):
+        """返回 (缓存的 Response, 是否需要重新验证)，没有缓存返回 (None, True)"""
+        with self.lock:
+            row = self.conn.execute("SELECT final_url, headers, encoding, body, stored FROM responses WHERE url = ?",
+                                    (url,)).fetchone()
+        if row is None:
+            return None, True
+        final_url, headers, encoding, body, stored = row
+        response = requests.Response()
+        response.status_code = 200
+        response.url = final_url
+        response.headers = CaseInsensitiveDict(json.loads(headers))
+        response.encoding = encoding
+        response._content = zlib.decompress(body)
+        stale = self.max_age is None or time.time() - stored >= self.max_age
+        return response, stale
+
+    @staticmethod
+    def conditional_headers(cached):
+        # 缓存的响应头里保留了 ETag 和 Last-Modified，不用再查一次数据库
+        headers = {}
+        if cached.headers.get('ETag'):
+            headers['If-None-Match'] = cached.headers['ETag']
+        if cached.headers.get('Last-Modified'):
+            headers['If-Modified-Since'] = cached.headers['Last-Modified']
+        return headers
+
+    def touch(self, url, refreshed=False):
+        """记录一次访问；refreshed=True 表示服务器确认内容未变，重新计算 max_age"""
+        now = time.time()
+        with self.lock, self.conn:
+            if refreshed:
+                self.conn.execute("UPDATE responses SET accessed = ?, stored = ? WHERE url = ?", (now, now, url))
+            else:
+                self.conn.execute("UPDATE responses SET accessed = ? WHERE url = ?", (now, url))
+
+    def store(self, url, response):
+        body = zlib.compress(response.content, 6)
+        now = time.time()
+        headers = {key: value for key, value in response.headers.items()
+                   if key.lower() in ('content-type', 'etag', 'last-modified', 'cache-control')}
+        with self.lock, self.conn:
+            self.conn.execute("""
+                INSERT OR REPLACE INTO responses
+                (url, final_url, headers, encoding, etag, last_modified, body, size, stored, accessed)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (url, response.url, json.dumps(headers), response.encoding, response.headers.get('ETag'),
+                  response.headers.get('Last-Modified'), body, len(body), now, now))
+            self._evict()
+
+    def _evict(self):
+        # 从最久没有访问的条目开始删，直到总大小不超过 max_bytes
+        total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for url, size in self.conn.execute("SELECT url, size FROM responses ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            victims.append((url,))
+            total -= size
+        self.conn.executemany("DELETE FROM responses WHERE url = ?", victims)
+
+    def fresh(self, url, entry=None):
+        """未过期的缓存直接返回，否则返回 None；entry 为已经查到的 lookup(url) 结果，给出时不再查询和解压"""
+        cached, stale = entry or self.lookup(url)
+        if cached is None or stale:
+            return None
+        self.touch(url)
+        self.hits += 1
+        return cached
+
+    def get(self, session, url, read_body=None, entry=None, **kwargs):
+        """带缓存的 session.get，只缓存 200 响应，其他状态码原样返回
+
+        read_body(response) 在缓存新响应之前调用，配合 stream=True 检查响应头、限量读取响应体，抛出异常时不缓存。
+        entry 和 fresh 相同，调用方已经 lookup 过时传入，每次请求只解压一次缓存。
+        """
+        cached, stale = entry or self.lookup(url)
+        if cached is not None and not stale:
+            self.touch(url)
+            self.hits += 1
+            return cached
+        headers = dict(kwargs.pop('headers', None) or {})
+        if cached is not None:
+            headers.update(self.conditional_headers(cached))
+        response = session.get(url, headers=headers, **kwargs)
+        if cached is not None and response.status_code == 304:
+            response.close()
+            self.touch(url, refreshed=True)
+            self.revalidated += 1
+            return cached
+        self.misses += 1
+        if read_body is not None:
+            read_body(response)
+        if response.status_code == 200:
+            self.store(url, response)
+        return response
+
+    def stats(self):
+        with self.lock:
+            entries, size = self.conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits, 'revalidated': self.revalidated,
+                'misses': self.misses}
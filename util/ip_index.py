@@ -0,0 +1,174 @@
+import socket
+
+import numpy as np
+
+from util.file_util import FileUtil
+
+
+# IP 字符串转成整数：IPv4 为 32 位，IPv6 拆成高 64 位和低 64 位
+def pack_ipv4(ip):
+    return int.from_bytes(socket.inet_aton(ip), 'big')
+
+
+def pack_ipv6(ip):
+    value = int.from_bytes(socket.inet_pton(socket.AF_INET6, ip), 'big')
+    return value >> 64, value & 0xFFFFFFFFFFFFFFFF
+
+
+def unpack_ipv4(value):
+    return socket.inet_ntoa(int(value).to_bytes(4, 'big'))
+
+
+def unpack_ipv6(hi, lo):
+    return socket.inet_ntop(socket.AF_INET6, ((int(hi) << 64) | int(lo)).to_bytes(16, 'big'))
+
+
+# 解析 CIDR，返回 (是否 IPv6, 起始整数, 结束整数)，IPv6 的起止为 (hi, lo) 元组
+def parse_network(network):
+    address, _, prefix = network.partition('/')
+    if ':' in address:
+        prefix = int(prefix) if prefix else 128
+        hi, lo = pack_ipv6(address)
+        value = (hi << 64) | lo
+        mask = ((1 << 128) - 1) ^ ((1 << (128 - prefix)) - 1)
+        first, last = value & mask, (value & mask) | ((1 << (128 - prefix)) - 1)
+        return True, divmod(first, 1 << 64), divmod(last, 1 << 64)
+    prefix = int(prefix) if prefix else 32
+    mask = 0xFFFFFFFF ^ ((1 << (32 - prefix)) - 1)
+    first = pack_ipv4(address) & mask
+    return False, first, first | ((1 << (32 - prefix)) - 1)
+
+
+class IPIndex:
+    """IP -> 域名 的倒排索引，IP 打包成整数存在排好序的数组里，支持精确查询和 CIDR 前缀查询
+
+    每个 IP 对应 postings[offsets[i]:offsets[i+1]] 里的域名编号，域名字符串存在 domains 表里。
+    可以保存成 .npz 二进制快照，加载时不需要重新解析 JSON。
+    """
+
+    def __init__(self, domains, v4_keys, v4_offsets, v6_hi, v6_lo, v6_offsets, postings):
+        self.domains = domains
+        self.v4_keys = v4_keys
+        self.v4_offsets = v4_offsets
+        self.v6_hi = v6_hi
+        self.v6_lo = v6_lo
+        self.v6_offsets = v6_offsets
+        self.postings = postings
+        # CIDR 查询取域名时用 Python 列表切片，比 numpy 单元素调用的开销小
+        self._v4_offsets = v4_offsets.tolist()
+        self._v6_offsets = v6_offsets.tolist()
+        self._postings = postings.tolist()
+        # 单个 IP 查询用的哈希表 {打包后的 IP: 域名元组}，第一次 lookup 时构建
+        self._rows = None
+
+    @classmethod
+    def build(cls, domain_ip_map):
+        """从 {域名: IP 列表} 构建索引"""
+        domains = list(domain_ip_map)
+        v4, v6 = {}, {}
+        for domain_id, domain in enumerate(domains):
+            for ip in set(domain_ip_map[domain]):
+                if ':' in ip:
+                    v6.setdefault(pack_ipv6(ip), []).append(domain_id)
+                else:
+                    v4.setdefault(pack_ipv4(ip), []).append(domain_id)
+        v4_keys = sorted(v4)
+        v6_keys = sorted(v6)
+        lists = [v4[key] for key in v4_keys] + [v6[key] for key in v6_keys]
+        lengths = np.array([len(ids) for ids in lists], dtype=np.int64)
+        offsets = np.concatenate(([0], np.cumsum(lengths)))
+        postings = np.array([i for ids in lists for i in ids], dtype=np.int32)
+        return cls(domains,
+                   np.array(v4_keys, dtype=np.uint32), offsets[:len(v4_keys) + 1],
+                   np.array([hi for hi, _ in v6_keys], dtype=np.uint64),
+                   np.array([lo for _, lo in v6_keys], dtype=np.uint64),
+                   offsets[len(v4_keys):],
+                   postings)
+
+    @classmethod
+    def from_json(cls, input_file):
+        return cls.build(FileUtil.read_from_file(input_file))
+
+    def _domains_at(self, offsets, i):
+        return [self.domains[d] for d in self._postings[offsets[i]:offsets[i + 1]]]
+
+    def _build_rows(self):
+        v4 = self.v4_keys.astype('>u4').tobytes()
+        v6 = np.stack((self.v6_hi, self.v6_lo), axis=1).astype('>u8').tobytes()
+        rows = {}
+        for i in range(len(self.v4_keys)):
+            rows[v4[4 * i:4 * i + 4]] = tuple(self._domains_at(self._v4_offsets, i))
+        for i in range(len(self.v6_hi)):
+            rows[v6[16 * i:16 * i + 16]] = tuple(self._domains_at(self._v6_offsets, i))
+        return rows
+
+    def lookup(self, ip):
+        """精确查询：映射到该 IP 的域名元组（不存在为空元组）
+
+        打包 IP 后查一次哈希表，不做二分，也不复制域名列表，返回的元组由所有调用方共享。
+        """
+        if self._rows is None:
+            self._rows = self._build_rows()
+        try:
+            key = socket.inet_pton(socket.AF_INET6 if ':' in ip else socket.AF_INET, ip)
+        except OSError:
+            raise ValueError(f"invalid IP address {ip!r}") from None
+        return self._rows.get(key, ())
+
+    def lookup_many(self, ips):
+        """批量精确查询 IPv4 地址，返回每个 IP 的索引下标（不存在为 -1），用 domains_of 取域名"""
+        keys = np.frombuffer(b''.join(map(socket.inet_aton, ips)), dtype='>u4').astype(np.uint32)
+        if np.size(self.v4_keys) == 0:
+            return np.full(np.size(keys), -1)
+        i = np.minimum(np.searchsorted(self.v4_keys, keys), np.size(self.v4_keys) - 1)
+        return np.where(self.v4_keys[i] == keys, i, -1)
+
+    def domains_of(self, index):
+        return self._domains_at(self._v4_offsets, index) if index >= 0 else []
+
+    def _v6_range(self, first, last):
+        # 先按高 64 位定位，再在边界上按低 64 位收缩
+        start = np.searchsorted(self.v6_hi, np.uint64(first[0]), 'left')
+        end = np.searchsorted(self.v6_hi, np.uint64(last[0]), 'right')
+        head = np.searchsorted(self.v6_hi, np.uint64(first[0]), 'right')
+        start = start + np.searchsorted(self.v6_lo[start:head], np.uint64(first[1]), 'left')
+        tail = np.searchsorted(self.v6_hi, np.uint64(last[0]), 'left')
+        end = tail + np.searchsorted(self.v6_lo[tail:end], np.uint64(last[1]), 'right')
+        return int(start), int(max(start, end))
+
+    def lookup_network(self, network):
+        """CIDR 查询，例如 '2408:4001:f10::/48' 或 '111.62.75.0/24'，返回 {IP: 域名列表}"""
+        is_v6, first, last = parse_network(network)
+        result = {}
+        if is_v6:
+            start, end = self._v6_range(first, last)
+            for i in range(start, end):
+                result[unpack_ipv6(self.v6_hi[i], self.v6_lo[i])] = self._domains_at(self._v6_offsets, i)
+        else:
+            start = np.searchsorted(self.v4_keys, np.uint32(first), 'left')
+            end = np.searchsorted(self.v4_keys, np.uint32(last), 'right')
+            for i in range(start, end):
+                result[unpack_ipv4(self.v4_keys[i])] = self._domains_at(self._v4_offsets, i)
+        return result
+
+    def domains_in_network(self, network):
+        """CIDR 内所有 IP 对应的域名（去重）"""
+        return sorted({domain for domains in self.lookup_network(network).values() for domain in domains})
+
+    def save(self, output_file):
+        """保存二进制快照（.npz），域名表存成一个 UTF-8 字节块加偏移数组"""
+        encoded = [domain.encode('utf-8') for domain in self.domains]
+        domain_offsets = np.concatenate(([0], np.cumsum([len(d) for d in encoded]))).astype(np.int64)
+        np.savez(output_file, domain_blob=np.frombuffer(b''.join(encoded), dtype=np.uint8),
+                 domain_offsets=domain_offsets, v4_keys=self.v4_keys, v4_offsets=self.v4_offsets,
+                 v6_hi=self.v6_hi, v6_lo=self.v6_lo, v6_offsets=self.v6_offsets, postings=self.postings)
+
+    @classmethod
+    def load(cls, input_file):
+        with np.load(input_file) as data:
+            blob = data['domain_blob'].tobytes()
+            offsets = data['domain_offsets']
+            domains = [blob[offsets[i]:offsets[i + 1]].decode('utf-8') for i in range(len(offsets) - 1)]
+            return cls(domains, data['v4_keys'], data['v4_offsets'], data['v6_hi'], data['v6_lo'],
+                       data['v6_offsets'], data['postings'])
+
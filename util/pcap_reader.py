@@ -0,0 +1,204 @@
+import collections
+import mmap
+import socket
+import struct
+
+# 链路层类型
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_RAW_OLD = 12
+LINKTYPE_LOOP = 108
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_LINUX_SLL2 = 276
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+ETHERTYPE_VLAN = (0x8100, 0x88A8, 0x9100)
+
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_IDB = 1
+PCAPNG_PB = 2
+PCAPNG_SPB = 3
+PCAPNG_EPB = 6
+
+
+class PcapError(Exception):
+    pass
+
+
+def _iter_pcap(buf):
+    """经典 pcap 格式：24 字节文件头，之后每个包 16 字节包头"""
+    magic = buf[:4]
+    if magic in (b'\xd4\xc3\xb2\xa1', b'\x4d\x3c\xb2\xa1'):
+        endian = '<'
+    else:
+        endian = '>'
+    nano = magic in (b'\x4d\x3c\xb2\xa1', b'\xa1\xb2\x3c\x4d')
+    linktype = struct.unpack_from(endian + 'I', buf, 20)[0] & 0x0FFFFFFF
+    record = struct.Struct(endian + 'IIII')
+    offset = 24
+    end = len(buf)
+    while offset + 16 <= end:
+        seconds, fraction, caplen, _ = record.unpack_from(buf, offset)
+        offset += 16
+        yield seconds + fraction / (1e9 if nano else 1e6), linktype, buf[offset:offset + caplen]
+        offset += caplen
+
+
+def _iter_pcapng(buf):
+    """pcapng 格式：按块读取，记录每个接口的链路层类型和时间戳精度"""
+    end = len(buf)
+    offset = 0
+    endian = '<'
+    interfaces = []
+    while offset + 12 <= end:
+        block_type = struct.unpack_from(endian + 'I', buf, offset)[0]
+        if block_type == PCAPNG_SHB:
+            # 每个 Section Header Block 重新确定字节序，接口列表清空
+            endian = '<' if buf[offset + 8:offset + 12] == b'\x4d\x3c\x2b\x1a' else '>'
+            interfaces = []
+        block_length = struct.unpack_from(endian + 'I', buf, offset + 4)[0]
+        if block_length < 12 or offset + block_length > end:
+            break
+        body = offset + 8
+        if block_type == PCAPNG_IDB:
+            linktype, _, snaplen = struct.unpack_from(endian + 'HHI', buf, body)
+            interfaces.append((linktype, _if_tsresol(buf, body + 8, offset + block_length - 4, endian)))
+        elif block_type == PCAPNG_EPB:
+            interface, high, low, caplen = struct.unpack_from(endian + 'IIII', buf, body)
+            linktype, resolution = interfaces[interface]
+            yield ((high << 32) | low) / resolution, linktype, buf[body + 20:body + 20 + caplen]
+        elif block_type == PCAPNG_SPB:
+            linktype, _ = interfaces[0]
+            caplen = block_length - 16
+            yield None, linktype, buf[body + 4:body + 4 + caplen]
+        elif block_type == PCAPNG_PB:
+            interface, _, high, low, caplen = struct.unpack_from(endian + 'HHIII', buf, body)
+            linktype, resolution = interfaces[interface]
+            yield ((high << 32) | low) / resolution, linktype, buf[body + 20:body + 20 + caplen]
+        offset += block_length
+
+
+def _if_tsresol(buf, offset, end, endian):
+    """从 IDB 的选项里读取 if_tsresol，默认是微秒"""
+    while offset + 4 <= end:
+        code, length = struct.unpack_from(endian + 'HH', buf, offset)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = buf[offset + 4]
+            return 2 ** (value & 0x7F) if value & 0x80 else 10 ** value
+        offset += 4 + ((length + 3) & ~3)
+    return 10 ** 6
+
+
+def iter_packets(pcap_file):
+    """逐个返回 (时间戳, 链路层类型, 包数据)，支持 pcap 和 pcapng，文件通过 mmap 读取不整体载入内存"""
+    with open(pcap_file, 'rb') as file:
+        if file.seek(0, 2) == 0:
+            return
+        # 对 mmap 切片得到的是单个包的 bytes，不会长期占用映射
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            magic = struct.unpack_from('>I', buf, 0)[0]
+            if magic == PCAPNG_SHB:
+                yield from _iter_pcapng(buf)
+            elif magic in (0xA1B2C3D4, 0xD4C3B2A1, 0xA1B23C4D, 0x4D3CB2A1):
+                yield from _iter_pcap(buf)
+            else:
+                raise PcapError(f"{pcap_file} is not a pcap or pcapng file")
+
+
+def network_layer(linktype, data):
+    """跳过链路层头部，返回 (以太网类型, 网络层起始偏移)，无法识别时返回 (None, None)"""
+    if linktype == LINKTYPE_ETHERNET:
+        if len(data) < 14:
+            return None, None
+        ethertype = struct.unpack_from('!H', data, 12)[0]
+        offset = 14
+        while ethertype in ETHERTYPE_VLAN and len(data) >= offset + 4:
+            ethertype = struct.unpack_from('!H', data, offset + 2)[0]
+            offset += 4
+        return ethertype, offset
+    if linktype in (LINKTYPE_RAW, LINKTYPE_RAW_OLD):
+        if not len(data):
+            return None, None
+        version = data[0] >> 4
+        return (ETHERTYPE_IPV4 if version == 4 else ETHERTYPE_IPV6 if version == 6 else None), 0
+    if linktype in (LINKTYPE_NULL, LINKTYPE_LOOP):
+        if len(data) < 4:
+            return None, None
+        version = data[4] >> 4 if len(data) > 4 else 0
+        return (ETHERTYPE_IPV4 if version == 4 else ETHERTYPE_IPV6 if version == 6 else None), 4
+    if linktype == LINKTYPE_LINUX_SLL and len(data) >= 16:
+        return struct.unpack_from('!H', data, 14)[0], 16
+    if linktype == LINKTYPE_LINUX_SLL2 and len(data) >= 20:
+        return struct.unpack_from('!H', data, 0)[0], 20
+    return None, None
+
+
+def ip_header(linktype, data):
+    """解析 IP 头部，返回 (版本, 源地址字节, 目的地址字节, 协议号, 传输层偏移, IP 包长度)，非 IP 包返回 None"""
+    ethertype, offset = network_layer(linktype, data)
+    if ethertype == ETHERTYPE_IPV4 and len(data) >= offset + 20:
+        header_length = (data[offset] & 0x0F) * 4
+        total_length = struct.unpack_from('!H', data, offset + 2)[0]
+        return (4, data[offset + 12:offset + 16], data[offset + 16:offset + 20],
+                data[offset + 9], offset + header_length, total_length)
+    if ethertype == ETHERTYPE_IPV6 and len(data) >= offset + 40:
+        payload_length = struct.unpack_from('!H', data, offset + 4)[0]
+        return (6, data[offset + 8:offset + 24], data[offset + 24:offset + 40],
+                data[offset + 6], offset + 40, payload_length + 40)
+    return None
+
+
+def ip_to_str(address):
+    return socket.inet_ntop(socket.AF_INET if len(address) == 4 else socket.AF_INET6, address)
+
+
+def count_ips(pcap_file, ipv6=True):
+    """统计每个 IP（源和目的）出现的包数，按原始字节计数，最后才转换成字符串"""
+    counter = collections.Counter()
+    for _, linktype, data in iter_packets(pcap_file):
+        header = ip_header(linktype, data)
+        if header is None or (header[0] == 6 and not ipv6):
+            continue
+        counter[header[1]] += 1
+        counter[header[2]] += 1
+    return {ip_to_str(address): count for address, count in counter.items()}
+
+
+def extract_ips(pcap_file, ipv6=True):
+    """抓包文件中出现过的所有 IP（源和目的，去重）"""
+    addresses = set()
+    for _, linktype, data in iter_packets(pcap_file):
+        header = ip_header(linktype, data)
+        if header is None or (header[0] == 6 and not ipv6):
+            continue
+        addresses.add(header[1])
+        addresses.add(header[2])
+    return {ip_to_str(address) for address in addresses}
+
+
+def transport_ports(data, header):
+    """TCP/UDP 的 (源端口, 目的端口)，其他协议返回 (0, 0)"""
+    protocol, offset = header[3], header[4]
+    if protocol in (6, 17) and len(data) >= offset + 4:
+        return struct.unpack_from('!HH', data, offset)
+    return 0, 0
+
+
+def write_pcap(pcap_file, packets, linktype=LINKTYPE_ETHERNET, snaplen=262144):
+    """把 [(时间戳, 包数据)] 写成经典 pcap 格式（微秒精度），返回写入的包数"""
+    count = 0
+    with open(pcap_file, 'wb') as file:
+        file.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, snaplen, linktype))
+        for timestamp, data in packets:
+            seconds = int(timestamp or 0)
+            micros = int(round(((timestamp or 0) - seconds) * 1e6))
+            if micros >= 1000000:
+                seconds, micros = seconds + 1, micros - 1000000
+            file.write(struct.pack('<IIII', seconds, micros, len(data), len(data)))
+            file.write(data)
+            count += 1
+    return count